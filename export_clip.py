@@ -19,7 +19,9 @@ from qgis.core import (
     QgsVectorLayerSimpleLabeling,
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
-    QgsProject
+    QgsProject,
+    QgsMessageLog,
+    Qgis
 
 )
 import processing
@@ -31,12 +33,100 @@ import subprocess
 import shutil
 import json
 from . import export_rename_tiles as tiles
+from .export_progress import ExportProgress
+from .export_report import ExportRunReport
+from .errors import get_error_message
+
+
+class ExportAborted(Exception):
+    """Raised when a failure is recorded and the run is not allowed to continue."""
+
+
+class ExportCancelled(ExportAborted):
+    """Raised when the user cancels the export through the processing feedback."""
+
+
+def raise_if_cancelled(feedback):
+    """Cooperative cancellation point, checked between grid cells and between stages."""
+    if feedback is not None and feedback.isCanceled():
+        raise ExportCancelled("Export cancelled by user.")
+
+
+class ExportFailureLog:
+    """
+    Collects per-cell failures of an export run instead of stopping on a message box.
+
+    Every failure is logged, emitted through ``failure_signal`` (if given) and kept so
+    that a summary can be shown once the run is over.  When ``continue_on_error`` is
+    False the first failure aborts the run with ``ExportAborted``.
+    """
+
+    def __init__(self, failure_signal=None, continue_on_error=True):
+        self.failure_signal = failure_signal
+        self.continue_on_error = continue_on_error
+        self.failures = []
+
+    def record(self, grid_cell_id, stage, error_key, layer_name=None, **kwargs):
+        message = get_error_message(error_key, grid_cell_id=grid_cell_id, layer_name=layer_name, **kwargs)
+        failure = {
+            "grid": f"grid_{grid_cell_id}",
+            "stage": stage,
+            "layer": layer_name,
+            "message": message
+        }
+        self.failures.append(failure)
+        QgsMessageLog.logMessage(message, 'AMRUT_Export', Qgis.Warning)
+        if self.failure_signal is not None:
+            self.failure_signal.emit(failure)
+        if not self.continue_on_error:
+            raise ExportAborted(message)
 
+    def __len__(self):
+        return len(self.failures)
 
 
-def clip_layers_to_grid(grid_layer, layers, output_base_dir, progress_signal):
-    """Clip all layers by grid cells -> clip, merge and archive."""
-    feedback = QgsProcessingFeedback()
+def summarise_failures(failures):
+    """Build a short, human readable summary of the failures of an export run."""
+    if not failures:
+        return "All grid cells were exported successfully."
+
+    failed_grids = sorted({failure["grid"] for failure in failures})
+    lines = [f"{len(failures)} failure(s) in {len(failed_grids)} grid cell(s):"]
+    for failure in failures:
+        lines.append(f"{failure['grid']} [{failure['stage']}] {failure['message']}")
+    return "\n".join(lines)
+
+
+def layer_stage(layer):
+    """Export stage of a layer, see ExportProgress: vector layers are clipped, raster layers tiled."""
+    if layer.type() == QgsVectorLayer.VectorLayer:
+        return "clip"
+    if layer.type() == QgsRasterLayer.RasterLayer:
+        return "tile"
+    return None
+
+
+def clip_layers_to_grid(grid_layer, layers, output_base_dir, progress_signal, failure_signal=None, continue_on_error=True,
+                        feedback=None):
+    """
+    Clip all layers by grid cells -> clip, merge and archive.
+
+    Failures of a single cell are collected into an ExportFailureLog and the run moves on
+    to the next cell, unless continue_on_error is False.  Returns the list of failures.
+
+    The run stops with ExportCancelled as soon as ``feedback`` is cancelled.  The
+    processing algorithms share the same feedback, so a running stage is interrupted as
+    well.  The directory of the interrupted cell is removed, completed cells keep their
+    .amrut archive and their row in grid_data.csv.
+
+    progress_signal receives (percent, message) for the whole run, see ExportProgress.
+    Stage timings, bytes written and feature counts are saved to export_report.json
+    next to grid_data.csv, whatever the outcome of the run.
+    """
+    if feedback is None:
+        feedback = QgsProcessingFeedback()
+    failure_log = ExportFailureLog(failure_signal, continue_on_error)
+    progress = ExportProgress(grid_layer.featureCount(), [layer_stage(layer) for layer in layers], progress_signal.emit)
 
     # Define the output directory inside the selected directory
     output_base_dir = os.path.join(output_base_dir, "Grid Output")
@@ -91,136 +181,220 @@ def clip_layers_to_grid(grid_layer, layers, output_base_dir, progress_signal):
             layer.commitChanges()
 
 
-    for i, feature in enumerate(grid_layer.getFeatures()):
-        current_step = i
-
-        layers_name = []
-        grid_cell_geom = feature.geometry()
-        grid_cell_id = feature["id"]
+    report = ExportRunReport(output_base_dir, grid_layer, layers)
+    status = "failed"
 
-        if not grid_cell_geom or not grid_cell_geom.isGeosValid():
-            QMessageBox.warning(None, "Invalid Geometry", f"Skipping grid cell {grid_cell_id} due to invalid geometry.")
-            continue
+    # Percentages reported by the running algorithm move the bar within the current stage
+    feedback.progressChanged.connect(progress.on_feedback_progress)
+    try:
+        for i, feature in enumerate(grid_layer.getFeatures()):
+            grid_cell_id = feature["id"]
+            raise_if_cancelled(feedback)
+            progress.start_cell(i)
+            report.start_cell(grid_cell_id)
+            try:
+                clip_grid_cell(feature, grid_layer, layers, output_base_dir, csv_file_path, feedback, failure_log, progress,
+                               report)
+            except ExportCancelled:
+                # Leave only complete cells behind
+                shutil.rmtree(os.path.join(output_base_dir, f"grid_{grid_cell_id}"), ignore_errors=True)
+                QgsMessageLog.logMessage(f"Export cancelled while processing grid_{grid_cell_id}", 'AMRUT_Export', Qgis.Info)
+                raise
+            except ExportAborted:
+                raise
+            except Exception as e:
+                failure_log.record(grid_cell_id, "grid_cell", 'CLIPPING_ERROR', error=e)
+
+            report.finish_cell(os.path.join(output_base_dir, f"grid_{grid_cell_id}", f"grid_{grid_cell_id}.amrut"))
+            progress.finish_cell()
+        status = "completed"
+    except ExportCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        feedback.progressChanged.disconnect(progress.on_feedback_progress)
+        try:
+            report.write(status, failure_log.failures)
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Could not write the export report: {e}", 'AMRUT_Export', Qgis.Warning)
+
+    if failure_log.failures:
+        QgsMessageLog.logMessage(summarise_failures(failure_log.failures), 'AMRUT_Export', Qgis.Warning)
+    return failure_log.failures
+
+
+def clip_grid_cell(feature, grid_layer, layers, output_base_dir, csv_file_path, feedback, failure_log, progress, report):
+    """Clip, merge and archive the layers for a single grid cell, recording failures in failure_log."""
+    layers_name = []
+    grid_cell_geom = feature.geometry()
+    grid_cell_id = feature["id"]
+
+    if not grid_cell_geom or not grid_cell_geom.isGeosValid():
+        failure_log.record(grid_cell_id, "validate", 'INVALID_GEOMETRY')
+        return
 
-        grid_dir = os.path.join(output_base_dir, f"grid_{grid_cell_id}")
-        if not os.path.exists(grid_dir):
-            os.makedirs(grid_dir)
+    grid_dir = os.path.join(output_base_dir, f"grid_{grid_cell_id}")
+    if not os.path.exists(grid_dir):
+        os.makedirs(grid_dir)
 
-        temp_layer = QgsVectorLayer(
-            "Polygon?crs={}".format(grid_layer.crs().authid()), 
-            f"grid_cell_{grid_cell_id}", "memory"
-        )
-        temp_layer_data = temp_layer.dataProvider()
-        temp_layer_data.addAttributes(grid_layer.fields())
-        temp_layer.updateFields()
-
-        temp_feature = QgsFeature()
-        temp_feature.setGeometry(grid_cell_geom)
-        temp_feature.setAttributes(feature.attributes())
-        temp_layer_data.addFeatures([temp_feature])
-        temp_layer.updateExtents()
-        create_html_file(temp_layer,grid_dir, grid_layer.crs())
-        create_kml_file(temp_layer,grid_dir, grid_layer.crs())
-        clipped_layers = {
-            "Point": [],
-            "Line": [],
-            "Polygon": []
-        }
+    temp_layer = QgsVectorLayer(
+        "Polygon?crs={}".format(grid_layer.crs().authid()), 
+        f"grid_cell_{grid_cell_id}", "memory"
+    )
+    temp_layer_data = temp_layer.dataProvider()
+    temp_layer_data.addAttributes(grid_layer.fields())
+    temp_layer.updateFields()
+
+    temp_feature = QgsFeature()
+    temp_feature.setGeometry(grid_cell_geom)
+    temp_feature.setAttributes(feature.attributes())
+    temp_layer_data.addFeatures([temp_feature])
+    temp_layer.updateExtents()
+    create_html_file(temp_layer,grid_dir, grid_layer.crs())
+    create_kml_file(temp_layer,grid_dir, grid_layer.crs())
+    clipped_layers = {
+        "Point": [],
+        "Line": [],
+        "Polygon": []
+    }
 
-        for layer in layers:
-            if layer.type() == QgsVectorLayer.VectorLayer:  # Handle vector layers
-                geometry_type = QgsWkbTypes.flatType(layer.wkbType())
-                output_path = os.path.join(grid_dir, f"{layer.name()}.geojson")
-                clip_params = {
-                    'INPUT': layer,
-                    'OVERLAY': temp_layer,
-                    'OUTPUT': output_path
-                }
-                try:
-                    processing.run("qgis:clip", clip_params, feedback=feedback)
-                    if geometry_type == QgsWkbTypes.MultiPoint or geometry_type == QgsWkbTypes.Point:
-                        clipped_layers["Point"].append(output_path)
-                        layers_name.append(f"{{{layer.name()} : Point}}")
-                    elif geometry_type == QgsWkbTypes.MultiLineString or geometry_type == QgsWkbTypes.LineString:
-                        clipped_layers["Line"].append(output_path)
-                        layers_name.append(f"{{{layer.name()} : Line}}")
-                    elif geometry_type == QgsWkbTypes.MultiPolygon or geometry_type == QgsWkbTypes.Polygon:
-                        clipped_layers["Polygon"].append(output_path)
-                        layers_name.append(f"{{{layer.name()} : Polygon}}")
-                except Exception as e:
-                    QMessageBox.warning(None, "Error", f"Error clipping vector layer '{layer.name()}' with grid cell {grid_cell_id}: {e}")
-        
-            elif layer.type() == QgsRasterLayer.RasterLayer:  # Handle raster layers
-                output_path = os.path.join(grid_dir, f"{layer.name()}_clipped.tif")
-                tile_output_dir = os.path.join(grid_dir, "tiles")
-                reprojected_raster = os.path.join(grid_dir, f"{layer.name()}_reproject.tif")
-
-                clip_params = {
-                    'INPUT': layer.source(),
-                    'MASK': temp_layer,
-                    'OUTPUT': output_path,
-                    'NODATA': -9999  # Define nodata value if needed
-                }
-                try:
+    for index, layer in enumerate(layers):
+        raise_if_cancelled(feedback)
+        if layer.type() == QgsVectorLayer.VectorLayer:  # Handle vector layers
+            progress.start_layer(index)
+            geometry_type = QgsWkbTypes.flatType(layer.wkbType())
+            output_path = os.path.join(grid_dir, f"{layer.name()}.geojson")
+            clip_params = {
+                'INPUT': layer,
+                'OVERLAY': temp_layer,
+                'OUTPUT': 'memory:'
+            }
+            try:
+                with report.stage("qgis:clip", layer.name(), output_path) as stage:
+                    clipped_layer = processing.run("qgis:clip", clip_params, feedback=feedback)['OUTPUT']
+                    # Counted on the clip result, the written GeoJSON is not opened again
+                    stage["features"] = clipped_layer.featureCount()
+                    options = QgsVectorFileWriter.SaveVectorOptions()
+                    options.driverName = "GeoJSON"
+                    options.fileEncoding = "UTF-8"
+                    error = QgsVectorFileWriter.writeAsVectorFormatV2(
+                        clipped_layer, output_path, QgsProject.instance().transformContext(), options)
+                    if error[0] != QgsVectorFileWriter.NoError:
+                        raise RuntimeError(error[1])
+                    del clipped_layer
+                if geometry_type == QgsWkbTypes.MultiPoint or geometry_type == QgsWkbTypes.Point:
+                    clipped_layers["Point"].append(output_path)
+                    layers_name.append(f"{{{layer.name()} : Point}}")
+                elif geometry_type == QgsWkbTypes.MultiLineString or geometry_type == QgsWkbTypes.LineString:
+                    clipped_layers["Line"].append(output_path)
+                    layers_name.append(f"{{{layer.name()} : Line}}")
+                elif geometry_type == QgsWkbTypes.MultiPolygon or geometry_type == QgsWkbTypes.Polygon:
+                    clipped_layers["Polygon"].append(output_path)
+                    layers_name.append(f"{{{layer.name()} : Polygon}}")
+            except Exception as e:
+                raise_if_cancelled(feedback)
+                failure_log.record(grid_cell_id, "vector_clip", 'VECTOR_CLIP_ERROR', layer_name=layer.name(), error=e)
+    
+        elif layer.type() == QgsRasterLayer.RasterLayer:  # Handle raster layers
+            output_path = os.path.join(grid_dir, f"{layer.name()}_clipped.tif")
+            tile_output_dir = os.path.join(grid_dir, "tiles")
+            reprojected_raster = os.path.join(grid_dir, f"{layer.name()}_reproject.tif")
+
+            clip_params = {
+                'INPUT': layer.source(),
+                'MASK': temp_layer,
+                'OUTPUT': output_path,
+                'NODATA': -9999  # Define nodata value if needed
+            }
+            try:
+                # The slot of the raster is split between its algorithms
+                progress.start_layer(index, 0.0, 0.1)
+                with report.stage("gdal:cliprasterbymasklayer", layer.name(), output_path):
                     processing.run("gdal:cliprasterbymasklayer", clip_params, feedback=feedback)
-                    if not os.path.exists(tile_output_dir):
-                        os.makedirs(tile_output_dir)
-                    params = {
-                        'INPUT': output_path,
-                        'TARGET_CRS': 'EPSG:3857',
-                        'RESOLUTION': 0.0001,
-                        'OUTPUT': reprojected_raster
-                    }
+                raise_if_cancelled(feedback)
+                if not os.path.exists(tile_output_dir):
+                    os.makedirs(tile_output_dir)
+                params = {
+                    'INPUT': output_path,
+                    'TARGET_CRS': 'EPSG:3857',
+                    'RESOLUTION': 0.0001,
+                    'OUTPUT': reprojected_raster
+                }
+                progress.start_layer(index, 0.1, 0.35)
+                with report.stage("gdal:warpreproject", layer.name(), reprojected_raster):
                     processing.run("gdal:warpreproject", params, feedback = feedback)
-                    params = {
-                        'INPUT': reprojected_raster,  # Input raster file path
-                        'OUTPUT': tile_output_dir,  # Output tile directory
-                        'ZOOM' : '16-22',
-                        'TILE_FORMAT': 'png',  # Adjust format if needed
-                        'RESAMPLING': 0,  # Default is nearest neighbor (adjust if needed)
-                        'TMS_CONVENTION': True,  # Use TMS-compatible tiles (flipped Y-coordinate)
-                        'PROFILE': 0,  # Mercator profile
-                        'WEB_VIEWER': 'none',  # Generates OpenLayers web viewer files
-                    }
+                raise_if_cancelled(feedback)
+                params = {
+                    'INPUT': reprojected_raster,  # Input raster file path
+                    'OUTPUT': tile_output_dir,  # Output tile directory
+                    'ZOOM' : '16-22',
+                    'TILE_FORMAT': 'png',  # Adjust format if needed
+                    'RESAMPLING': 0,  # Default is nearest neighbor (adjust if needed)
+                    'TMS_CONVENTION': True,  # Use TMS-compatible tiles (flipped Y-coordinate)
+                    'PROFILE': 0,  # Mercator profile
+                    'WEB_VIEWER': 'none',  # Generates OpenLayers web viewer files
+                }
 
+                progress.start_layer(index, 0.35, 0.95)
+                with report.stage("gdal:gdal2tiles", layer.name()):
                     processing.run("gdal:gdal2tiles", params, feedback=feedback)
+                raise_if_cancelled(feedback)
 
+                progress.start_layer(index, 0.95, 1.0)
+                with report.stage("rename_tiles", layer.name(), tile_output_dir):
                     tiles.rename_tiles(tile_output_dir)
-                    remove_files([output_path, reprojected_raster])
-                except Exception as e:
-                    QMessageBox.warning(None, "Error", f"Error clipping raster layer '{layer.name()}' with grid cell {grid_cell_id}: {e}")
-
-        #Merging Geometries
-        geometry_output_files = {
-            "Point": os.path.join(grid_dir, "point.geojson"),
-            "Line": os.path.join(grid_dir, "line.geojson"),
-            "Polygon": os.path.join(grid_dir, "polygon.geojson")
-        }
-        for geometry_type, layer_paths in clipped_layers.items():
-            if layer_paths :
-                merge_clipped_layers(layer_paths, geometry_output_files[geometry_type], geometry_type, "EPSG:4326", grid_cell_id)
-
-        for geometry_type, layer_paths in clipped_layers.items() :
-            remove_files(layer_paths)
-
-        with open(csv_file_path, mode='a', newline='', encoding='utf-8') as csv_file:
-            csv_writer = csv.writer(csv_file)
-            csv_writer.writerow([
-                f"grid_{grid_cell_id}",
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "",  # Assigned to surveyor (empty)
-                ""  # Submission date (empty)
-            ])
+                remove_files([output_path, reprojected_raster])
+            except Exception as e:
+                raise_if_cancelled(feedback)
+                failure_log.record(grid_cell_id, "raster_clip", 'RASTER_CLIP_ERROR', layer_name=layer.name(), error=e)
+
+    #Merging Geometries
+    raise_if_cancelled(feedback)
+    geometry_output_files = {
+        "Point": os.path.join(grid_dir, "point.geojson"),
+        "Line": os.path.join(grid_dir, "line.geojson"),
+        "Polygon": os.path.join(grid_dir, "polygon.geojson")
+    }
+    merge_types = [geometry_type for geometry_type, layer_paths in clipped_layers.items() if layer_paths]
+    for geometry_type, layer_paths in clipped_layers.items():
+        if layer_paths :
+            index = merge_types.index(geometry_type)
+            progress.start_stage("merge", index / len(merge_types), (index + 1) / len(merge_types))
+            try:
+                with report.stage("merge", geometry_type, geometry_output_files[geometry_type]):
+                    merge_clipped_layers(layer_paths, geometry_output_files[geometry_type], geometry_type, "EPSG:4326",
+                                         grid_cell_id, feedback=feedback)
+            except Exception as e:
+                raise_if_cancelled(feedback)
+                failure_log.record(grid_cell_id, "merge", 'MERGE_LAYERS_ERROR', geometry_type=geometry_type, error=e)
 
+    for geometry_type, layer_paths in clipped_layers.items() :
+        remove_files(layer_paths)
 
-        create_metadata(grid_name=f"grid_{grid_cell_id}", grid_layer=temp_layer, grid_dir=grid_dir,
-                        layers_name=layers_name, crs=grid_layer.crs())
-        #Archiving
-        archive_name = os.path.join(grid_dir, f"grid_{grid_cell_id}")
-        create_archive(grid_dir,archive_name)
+    # Last cancellation point, a cell with its row in grid_data.csv is archived
+    raise_if_cancelled(feedback)
+    with open(csv_file_path, mode='a', newline='', encoding='utf-8') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow([
+            f"grid_{grid_cell_id}",
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "",  # Assigned to surveyor (empty)
+            ""  # Submission date (empty)
+        ])
+
+
+    create_metadata(grid_name=f"grid_{grid_cell_id}", grid_layer=temp_layer, grid_dir=grid_dir,
+                    layers_name=layers_name, crs=grid_layer.crs())
+    #Archiving
+    progress.start_stage("archive")
+    archive_name = os.path.join(grid_dir, f"grid_{grid_cell_id}")
+    try:
+        with report.stage("create_archive", output=f"{archive_name}.amrut"):
+            create_archive(grid_dir,archive_name)
+    except Exception as e:
+        failure_log.record(grid_cell_id, "archive", 'ARCHIVE_CREATION_ERROR', error=e)
 
-        progress_signal.emit(current_step)
-        del temp_layer
+    del temp_layer
 
 def create_kml_file(layer, grid_dir, crs) :
     kml_file_path = os.path.join(grid_dir, f"location.kml")
@@ -323,8 +497,9 @@ def create_metadata(grid_name,grid_layer, grid_dir, layers_name, crs) :
         json.dump(metadata, json_file, indent=4)
         
 
-def merge_clipped_layers (layers_path, merged_layer_path, geometry_type,crs, grid_cell_id) :
-    feedback = QgsProcessingFeedback()
+def merge_clipped_layers (layers_path, merged_layer_path, geometry_type,crs, grid_cell_id, feedback=None) :
+    if feedback is None:
+        feedback = QgsProcessingFeedback()
     valid_layers = []
     for path in layers_path:
         layer = QgsVectorLayer(path, "temp_layer", "ogr")
@@ -342,10 +517,7 @@ def merge_clipped_layers (layers_path, merged_layer_path, geometry_type,crs, gri
             'CRS': crs,
             'OUTPUT': merged_layer_path
     }
-    try:
-            processing.run("qgis:mergevectorlayers", merge_params, feedback = feedback)
-    except Exception as e:
-            QMessageBox.warning(None, "Error", f"Error merging {geometry_type} layers: {e}")
+    processing.run("qgis:mergevectorlayers", merge_params, feedback = feedback)
 
 def close_files (file_paths) :
     for file_path in file_paths :
@@ -395,6 +567,8 @@ def check_geometries_and_extents(layers):
     return combined_extent
 
 def create_archive (grid_dir, archive_name) :
+    """Archive the grid directory into <archive_name>.amrut. Errors are raised to the caller."""
+    temp_archive_dir = os.path.join(grid_dir, f"temp_archive")
     try :
         files_to_compress = []
         tiles_dir = None
@@ -405,7 +579,6 @@ def create_archive (grid_dir, archive_name) :
             if "tiles" in dirs:
                 tiles_dir = os.path.join(root, "tiles")
             # Create a temporary directory for archiving
-        temp_archive_dir = os.path.join(grid_dir, f"temp_archive")
         if not os.path.exists(temp_archive_dir):
             os.makedirs(temp_archive_dir)
 
@@ -432,6 +605,9 @@ def create_archive (grid_dir, archive_name) :
         if tiles_dir and os.path.exists(tiles_dir):
             shutil.rmtree(tiles_dir)
 
-    except Exception as e:
-        QMessageBox.warning(None, "Error", f"Error creating .amrut archive for grid : {e}")
+    except Exception:
+        # Do not leave a half-built archive directory behind for the next run
+        if os.path.exists(temp_archive_dir):
+            shutil.rmtree(temp_archive_dir, ignore_errors=True)
+        raise
 
@@ -0,0 +1,169 @@
+import time
+from collections import deque
+
+# Share of a grid cell's work done by each stage. Stages that do not run
+# (no raster layer selected -> no tiles) are left out and the rest rescaled.
+# The clip and tile shares are divided between the vector and raster layers.
+STAGE_WEIGHTS = {
+    "clip": 0.25,
+    "tile": 0.55,
+    "merge": 0.1,
+    "archive": 0.1
+}
+
+STAGE_LABELS = {
+    "clip": "Clipping vector layers",
+    "tile": "Creating raster tiles",
+    "merge": "Merging geometries",
+    "archive": "Archiving"
+}
+
+
+class ExportProgress:
+    """
+    Weighted progress model for clip_layers_to_grid.
+
+    Every grid cell is split into slots: one per layer, clipped ("clip") or tiled ("tile"),
+    followed by the merge and archive stages. ``layer_stages`` gives the stage of each
+    layer in the order the layers are processed (None for layers that are skipped), the
+    slots are laid out in that order up front so the bar never moves back when vector and
+    raster layers are mixed. A slot can be narrowed to a span so that the percentage
+    reported by QgsProcessingFeedback for the algorithm currently running (warp,
+    gdal2tiles, ...) moves the bar within that span. Updates are throttled before being
+    handed to ``emit(percent, message)`` so that the GUI thread is not flooded, and the
+    ETA is computed from a rolling window of samples.
+    """
+
+    def __init__(self, total_cells, layer_stages, emit, min_interval=0.25, eta_window=60.0):
+        self.total_cells = max(total_cells, 1)
+        self.emit = emit
+        self.min_interval = min_interval
+        self.eta_window = eta_window
+
+        layer_stages = list(layer_stages)
+        stages = [stage for stage in STAGE_WEIGHTS if stage in layer_stages or stage in ("merge", "archive")]
+        total_weight = sum(STAGE_WEIGHTS[stage] for stage in stages)
+        # Slots are the layer indices followed by the merge and archive stages
+        slots = [(index, stage) for index, stage in enumerate(layer_stages) if stage in STAGE_WEIGHTS]
+        slots += [("merge", "merge"), ("archive", "archive")]
+        self.slot_stages = {}
+        self.weights = {}
+        self.offsets = {}
+        offset = 0.0
+        for slot, stage in slots:
+            layer_count = layer_stages.count(stage) if isinstance(slot, int) else 1
+            self.slot_stages[slot] = stage
+            self.weights[slot] = STAGE_WEIGHTS[stage] / total_weight / layer_count
+            self.offsets[slot] = offset
+            offset += self.weights[slot]
+
+        self.cell_index = 0
+        self.slot = None
+        self.stage = None
+        self.span = (0.0, 1.0)
+        self.stage_fraction = 0.0
+
+        self.samples = deque()  # (time, fraction) pairs used for the rolling ETA
+        self.last_emit_time = 0.0
+        self.last_percent = -1
+        self.last_stage = None
+
+    def start_cell(self, index):
+        self.cell_index = index
+        self.slot = None
+        self.stage = None
+        self.stage_fraction = 0.0
+        self.update()
+
+    def start_slot(self, slot, start=0.0, end=1.0):
+        if slot not in self.weights:
+            return
+        self.slot = slot
+        self.stage = self.slot_stages[slot]
+        self.span = (start, end)
+        self.stage_fraction = start
+        self.update()
+
+    def start_layer(self, index, start=0.0, end=1.0):
+        """Enter the slot (or the [start, end] part of it) of the layer at index in layer_stages."""
+        self.start_slot(index, start, end)
+
+    def start_stage(self, stage, start=0.0, end=1.0):
+        """Enter the merge or archive stage (or the [start, end] part of it) of the current grid cell."""
+        self.start_slot(stage, start, end)
+
+    def set_fraction(self, fraction):
+        """Progress within the current span, between 0 and 1."""
+        start, end = self.span
+        fraction = min(max(fraction, 0.0), 1.0)
+        # Stages running several algorithms (merge) see the feedback start again from 0
+        self.stage_fraction = max(self.stage_fraction, start + (end - start) * fraction)
+        self.update()
+
+    def on_feedback_progress(self, percent):
+        """Slot for QgsProcessingFeedback.progressChanged."""
+        self.set_fraction(percent / 100.0)
+
+    def finish_cell(self):
+        self.cell_index += 1
+        self.slot = None
+        self.stage = None
+        self.stage_fraction = 0.0
+        self.update(force=True)
+
+    def fraction(self):
+        within_cell = 0.0
+        if self.slot is not None:
+            within_cell = self.offsets[self.slot] + self.weights[self.slot] * self.stage_fraction
+        return min((self.cell_index + within_cell) / self.total_cells, 1.0)
+
+    def eta_seconds(self):
+        """Remaining time from the progress rate over the last eta_window seconds, None if unknown."""
+        if len(self.samples) < 2:
+            return None
+        first_time, first_fraction = self.samples[0]
+        last_time, last_fraction = self.samples[-1]
+        if last_time <= first_time or last_fraction <= first_fraction:
+            return None
+        rate = (last_fraction - first_fraction) / (last_time - first_time)
+        return (1.0 - last_fraction) / rate
+
+    def describe(self):
+        cell = min(self.cell_index + 1, self.total_cells)
+        message = f"Grid cell {cell}/{self.total_cells}"
+        if self.stage is not None:
+            message += f" - {STAGE_LABELS[self.stage]}"
+        eta = self.eta_seconds()
+        if eta is not None:
+            message += f" - ETA {format_duration(eta)}"
+        return message
+
+    def update(self, force=False):
+        now = time.monotonic()
+        fraction = self.fraction()
+
+        if not self.samples or now - self.samples[-1][0] >= 0.5:
+            self.samples.append((now, fraction))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.eta_window:
+            self.samples.popleft()
+
+        percent = int(fraction * 100)
+        changed = percent != self.last_percent or self.stage != self.last_stage
+        elapsed = now - self.last_emit_time
+        # Emit at most every min_interval, and at least once a second to keep the ETA fresh
+        if force or (changed and elapsed >= self.min_interval) or elapsed >= 1.0:
+            self.last_emit_time = now
+            self.last_percent = percent
+            self.last_stage = self.stage
+            self.emit(percent, self.describe())
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
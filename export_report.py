@@ -0,0 +1,134 @@
+import configparser
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_FILE_NAME = "export_report.json"
+
+
+def plugin_version():
+    """Version from metadata.txt, so that reports of different releases can be compared."""
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(os.path.join(os.path.dirname(__file__), "metadata.txt"), encoding="utf-8")
+        return parser.get("general", "version")
+    except (configparser.Error, OSError):
+        return "unknown"
+
+
+def path_size(path):
+    """Size in bytes of a file, or of all files below a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+class ExportRunReport:
+    """
+    Timing and output statistics of one clip_layers_to_grid run.
+
+    Stages are timed with ``stage()``; each cell records its wall time, the seconds,
+    bytes written and feature counts of its stages.  ``write()`` saves everything as
+    export_report.json next to grid_data.csv.
+    """
+
+    def __init__(self, output_dir, grid_layer, layers):
+        self.output_dir = output_dir
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+        self.grid_count = grid_layer.featureCount()
+        self.layers = [layer.name() for layer in layers]
+        self.cells = []
+        self.cell = None
+        self.cell_start_time = None
+        self.stage_totals = {}
+
+    def start_cell(self, grid_cell_id):
+        self.cell = {
+            "grid": f"grid_{grid_cell_id}",
+            "wall_time": None,
+            "bytes_written": 0,
+            "features": {},
+            "stages": []
+        }
+        self.cells.append(self.cell)
+        self.cell_start_time = time.perf_counter()
+
+    def finish_cell(self, archive_path=None):
+        if self.cell is None:
+            return
+        self.cell["wall_time"] = round(time.perf_counter() - self.cell_start_time, 3)
+        if archive_path and os.path.exists(archive_path):
+            self.cell["archive_bytes"] = os.path.getsize(archive_path)
+        self.cell = None
+
+    @contextmanager
+    def stage(self, name, layer_name=None, output=None):
+        """
+        Time the block as stage ``name`` of the current cell.
+
+        The yielded dict can be extended by the caller (e.g. with "features").  When
+        ``output`` is given, its size is recorded once the block has finished.
+        """
+        entry = {"stage": name}
+        if layer_name is not None:
+            entry["layer"] = layer_name
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+            if output is not None and os.path.exists(output):
+                entry["bytes_written"] = path_size(output)
+            self.add_stage(entry)
+
+    def add_stage(self, entry):
+        totals = self.stage_totals.setdefault(entry["stage"], {"seconds": 0.0, "runs": 0, "bytes_written": 0})
+        totals["seconds"] += entry["seconds"]
+        totals["runs"] += 1
+        totals["bytes_written"] += entry.get("bytes_written", 0)
+
+        if self.cell is None:
+            return
+        self.cell["stages"].append(entry)
+        self.cell["bytes_written"] += entry.get("bytes_written", 0)
+        if "features" in entry and "layer" in entry:
+            self.cell["features"][entry["layer"]] = entry["features"]
+
+    def to_dict(self, status, failures=()):
+        failed_grids = {failure["grid"] for failure in failures}
+        for cell in self.cells:
+            if cell["wall_time"] is None:
+                cell["status"] = "incomplete"
+            else:
+                cell["status"] = "failed" if cell["grid"] in failed_grids else "completed"
+
+        for totals in self.stage_totals.values():
+            totals["seconds"] = round(totals["seconds"], 3)
+
+        return {
+            "plugin_version": plugin_version(),
+            "started_at": self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            "status": status,
+            "wall_time": round(time.perf_counter() - self.start_time, 3),
+            "grid_count": self.grid_count,
+            "layers": self.layers,
+            "stage_totals": self.stage_totals,
+            "cells": self.cells,
+            "failures": list(failures)
+        }
+
+    def write(self, status, failures=()):
+        report_path = os.path.join(self.output_dir, REPORT_FILE_NAME)
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.to_dict(status, failures), report_file, indent=4)
+        return report_path
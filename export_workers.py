@@ -1,7 +1,7 @@
 from PyQt5.QtCore import QRunnable, QThreadPool, pyqtSignal, QObject
 from . import export_geometry as geometry, export_clip as clip, export_grid as grid
 from qgis.core import QgsMessageLog, Qgis
-from qgis.core import QgsVectorLayer
+from qgis.core import QgsVectorLayer, QgsProcessingFeedback
 
 class LayerValidationWorker(QObject):
     """Worker to validate geometries and extents in a background thread."""
@@ -77,24 +77,40 @@ class ClippingWorker(QObject):
 
     success_signal = pyqtSignal(bool)  # Signal to send results back
     error_signal = pyqtSignal(str)
-    progress_signal = pyqtSignal(int)
+    progress_signal = pyqtSignal(int, str)  # Overall percent and stage / ETA description
+    failure_signal = pyqtSignal(object)  # One dict per failed grid cell stage, emitted as it happens
+    failures_signal = pyqtSignal(object)  # Complete failure list, emitted once the run is over
+    cancelled_signal = pyqtSignal()
     finished = pyqtSignal()
     
-    def __init__(self, gridLayer, selectedLayers, output_dir):
+    def __init__(self, gridLayer, selectedLayers, output_dir, continue_on_error=True):
         super().__init__()
         self.gridLayer = gridLayer
         self.selectedLayers = selectedLayers
         self.output_dir = output_dir
+        self.continue_on_error = continue_on_error
+        # Shared with every processing.run call, doubles as the cancellation token
+        self.feedback = QgsProcessingFeedback()
+
+    def cancel(self):
+        """Request cancellation, called directly from the GUI thread since run() blocks the worker thread."""
+        self.feedback.cancel()
 
     def run(self):
         try:
             # Example: Validate layers (replace with your own validation code)
             QgsMessageLog.logMessage('Creating Grid Layer', 'AMRUT_Export', Qgis.Info)  # Check if the task is started
-            clip.clip_layers_to_grid(grid_layer= self.gridLayer, layers= self.selectedLayers, progress_signal= self.progress_signal, output_base_dir=self.output_dir)
+            failures = clip.clip_layers_to_grid(grid_layer= self.gridLayer, layers= self.selectedLayers, progress_signal= self.progress_signal,
+                                                output_base_dir=self.output_dir, failure_signal=self.failure_signal,
+                                                continue_on_error=self.continue_on_error, feedback=self.feedback)
+            self.failures_signal.emit(failures)
             self.success_signal.emit(True) 
             self.finished.emit() # Emit result back to the main thread
+        except clip.ExportCancelled:
+            QgsMessageLog.logMessage('Export cancelled', 'AMRUT_Export', Qgis.Info)
+            self.cancelled_signal.emit()
+            self.finished.emit()
         except Exception as e:
             print(f"Error during validation: {e}")
             self.error_signal.emit(str(e))
             self.finished.emit() # Emit error message
-
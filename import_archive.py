@@ -0,0 +1,240 @@
+from qgis.core import QgsVectorLayer
+from collections import OrderedDict
+import copy
+import json
+import os
+import struct
+import threading
+import zipfile
+
+METADATA_FILE_NAME = "metadata.json"
+# Archives kept open by get_archive(), the least recently used one is closed first
+MAX_OPEN_ARCHIVES = 16
+
+# Layout of a zip local file header, see APPNOTE.TXT 4.3.7
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+LOCAL_HEADER_SIZE = 30
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+DATA_DESCRIPTOR_FLAG = 0x08
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def vsizip_path(archive_path, member):
+    """
+    GDAL virtual file system path of a member of an .amrut archive.
+
+    The curly braces delimit the archive, GDAL would otherwise only recognise it by a .zip extension.
+    """
+    archive_path = os.path.abspath(archive_path).replace("\\", "/")
+    return f"/vsizip/{{{archive_path}}}/{member}"
+
+
+def open_archive_layer(archive_path, member, layer_name):
+    """Open a GeoJSON member of an archive in place, without extracting it. The layer is read only."""
+    return QgsVectorLayer(vsizip_path(archive_path, member), layer_name, "ogr")
+
+
+def archive_signature(archive_path):
+    """(size, mtime in ns) of a file, a rewritten archive changes at least one of them."""
+    stat = os.stat(archive_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class AmrutArchive:
+    """
+    Read access to one .amrut file, shared by the dialogs and workers through get_archive().
+
+    The central directory is read once when the archive is opened and metadata.json is parsed on
+    first use, both are kept for as long as the file on disk does not change. Reads are serialised
+    on the archive, so one instance can be used from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.size, self.mtime = archive_signature(self.path)
+        self.lock = threading.RLock()
+        self.zip_file = zipfile.ZipFile(self.path, "r")
+        self.members = [info.filename for info in self.zip_file.infolist()]
+        self.member_set = set(self.members)
+        self._metadata = None
+
+    def is_current(self):
+        """Whether the file on disk is still the one that was read."""
+        try:
+            return archive_signature(self.path) == (self.size, self.mtime)
+        except OSError:
+            return False
+
+    def has_member(self, name):
+        return name in self.member_set
+
+    def layer_names(self):
+        """Names of the layers surveyed in the archive, one <layer>.geojson at its root each."""
+        return [name[:-len(".geojson")] for name in self.members
+                if name.endswith(".geojson") and "/" not in name]
+
+    def read(self, name):
+        """Bytes of a member, the handle is opened again if it was closed by the cache."""
+        with self.lock:
+            if self.zip_file is None:
+                self.zip_file = zipfile.ZipFile(self.path, "r")
+            return self.zip_file.read(name)
+
+    def metadata(self):
+        """
+        Parsed metadata.json. Callers get their own copy and may modify it.
+
+        Raises KeyError if the archive has no metadata.json and ValueError if it is not valid JSON.
+        """
+        with self.lock:
+            if self._metadata is None:
+                if not self.has_member(METADATA_FILE_NAME):
+                    raise KeyError(f"{METADATA_FILE_NAME} not found in {os.path.basename(self.path)}")
+                self._metadata = json.loads(self.read(METADATA_FILE_NAME))
+            return copy.deepcopy(self._metadata)
+
+    def extractall(self, directory):
+        with self.lock:
+            if self.zip_file is None:
+                self.zip_file = zipfile.ZipFile(self.path, "r")
+            self.zip_file.extractall(directory)
+
+    def close(self):
+        """Release the file handle, the parsed listing and metadata stay usable."""
+        with self.lock:
+            if self.zip_file is not None:
+                self.zip_file.close()
+                self.zip_file = None
+
+
+_archives = OrderedDict()
+_archives_lock = threading.Lock()
+
+
+def get_archive(archive_path):
+    """
+    Shared AmrutArchive of archive_path, opened again if the file changed since it was cached.
+
+    Raises the errors of zipfile.ZipFile (OSError, zipfile.BadZipFile) for unreadable files.
+    """
+    key = os.path.abspath(archive_path)
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is not None:
+            if archive.is_current():
+                _archives.move_to_end(key)
+                return archive
+            del _archives[key]
+            archive.close()
+
+    # Opened outside the lock, the validation reads many archives in parallel
+    archive = AmrutArchive(key)
+    with _archives_lock:
+        _archives[key] = archive
+        _archives.move_to_end(key)
+        while len(_archives) > MAX_OPEN_ARCHIVES:
+            _, evicted = _archives.popitem(last=False)
+            evicted.close()
+    return archive
+
+
+def invalidate(archive_path):
+    """
+    Drop the cached archive of archive_path and close its handle.
+
+    Call it before rewriting, renaming or replacing an archive, Windows does not allow replacing
+    a file that is still open.
+    """
+    with _archives_lock:
+        archive = _archives.pop(os.path.abspath(archive_path), None)
+    if archive is not None:
+        archive.close()
+
+
+def _copy_raw_member(source, info, zip_out):
+    """
+    Append a member of the source archive to zip_out as it is stored, without decompressing it.
+
+    The local header, compressed data and data descriptor are copied byte for byte, only the
+    offset recorded for the central directory changes.
+    """
+    source.seek(info.header_offset)
+    header = source.read(LOCAL_HEADER_SIZE)
+    if len(header) != LOCAL_HEADER_SIZE or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header of {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    length = LOCAL_HEADER_SIZE + name_length + extra_length + info.compress_size
+
+    if info.flag_bits & DATA_DESCRIPTOR_FLAG:
+        # CRC and sizes follow the data, with an optional signature and 8 byte sizes for ZIP64
+        source.seek(info.header_offset + length)
+        zip64 = info.compress_size >= zipfile.ZIP64_LIMIT or info.file_size >= zipfile.ZIP64_LIMIT
+        length += (20 if zip64 else 12) + (4 if source.read(4) == DATA_DESCRIPTOR_SIGNATURE else 0)
+
+    copied_info = copy.copy(info)
+    copied_info.header_offset = zip_out.fp.tell()
+    source.seek(info.header_offset)
+    while length > 0:
+        chunk = source.read(min(length, COPY_BUFFER_SIZE))
+        if not chunk:
+            raise zipfile.BadZipFile(f"{info.filename} is truncated")
+        zip_out.fp.write(chunk)
+        length -= len(chunk)
+
+    zip_out.filelist.append(copied_info)
+    zip_out.NameToInfo[copied_info.filename] = copied_info
+    zip_out.start_dir = zip_out.fp.tell()
+    # Members written directly to the file are otherwise not counted as a change by ZipFile.close()
+    zip_out._didModify = True
+
+
+def _sync_directory(directory):
+    """Flush a rename in directory to disk, directories cannot be opened for that on Windows."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def rewrite_archive(archive_path, replacements, output_path=None):
+    """
+    Rewrite an archive with some of its members replaced.
+
+    replacements maps a member name to its new bytes, None removes the member and names that are
+    not in the archive are added. All the other members are copied raw in their compressed form,
+    so the cost of a rewrite follows the size of the archive on disk, not the work of
+    recompressing it. The result is written next to output_path (archive_path by default),
+    flushed to disk and moved over it atomically: a crash leaves either the old or the new
+    archive, never a partial one.
+    """
+    output_path = output_path or archive_path
+    temp_path = output_path + ".tmp"
+    invalidate(archive_path)
+    invalidate(output_path)
+    try:
+        with open(archive_path, "rb") as source, zipfile.ZipFile(source, "r") as zip_in, \
+                zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as zip_out:
+            for info in zip_in.infolist():
+                if info.filename not in replacements:
+                    _copy_raw_member(source, info, zip_out)
+            for name, data in replacements.items():
+                if data is not None:
+                    zip_out.writestr(name, data)
+
+        with open(temp_path, "rb+") as temp_file:
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, output_path)
+        _sync_directory(os.path.dirname(os.path.abspath(output_path)))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def update_metadata(archive_path, metadata, output_path=None):
+    """Replace metadata.json of an archive, every other member is copied raw."""
+    data = json.dumps(metadata, indent=4).encode("utf-8")
+    rewrite_archive(archive_path, {METADATA_FILE_NAME: data}, output_path)
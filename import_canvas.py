@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+from qgis.core import QgsCategorizedSymbolRenderer, QgsFeature, QgsField, QgsFields, QgsMemoryProviderUtils
+from PyQt5.QtCore import QTimer, QVariant
+from . import import_feature_index as feature_index
+
+# Extent changes closer together than this are applied to the linked canvases once
+SYNC_DELAY_MS = 150
+# Overlay field holding the fid of the copied feature in the layer, the overlay gives copies new fids
+SOURCE_FID_FIELD = "_source_fid"
+# Expressions of the feature id, renderers classifying on them classify the overlay on SOURCE_FID_FIELD
+FEATURE_ID_EXPRESSIONS = ("$id", "@id", "id()")
+
+
+def configure_canvas(canvas):
+    """
+    Render settings of the QC canvases: layers are rendered in parallel. Caching is on by default,
+    each layer keeps its rendered image and a repaint of the highlighted features does not render
+    the raster backdrop again.
+    """
+    canvas.setParallelRenderingEnabled(True)
+
+
+class FeatureHighlighter:
+    """
+    Shows only the features under review of a layer on a QC canvas.
+
+    The canvas draws a memory layer holding copies of the current features, drawn with the
+    renderer of the layer, instead of the layer itself filtered by a subset string. Moving to the
+    next feature replaces the features of the memory layer: the provider of the layer is not
+    reloaded, its feature_id lookup stays valid and the background layers of the canvas keep
+    their rendered image.
+
+    The copies get new fids in the memory layer, the fid in the layer is kept in SOURCE_FID_FIELD.
+    Renderers categorised on the feature id (apply_colour of ReconstructFeatures) are classified
+    on that field instead, so each copy gets the colour of its original feature.
+    """
+
+    def __init__(self, canvas, layer, background_layers=()):
+        self.canvas = canvas
+        self.layer = layer
+        fields = QgsFields(layer.fields())
+        fields.append(QgsField(SOURCE_FID_FIELD, QVariant.LongLong))
+        self.overlay = QgsMemoryProviderUtils.createMemoryLayer(
+            f"{layer.name()}_highlight", fields, layer.wkbType(), layer.crs())
+        self.sync_renderer()
+        canvas.setLayers([self.overlay] + [background for background in background_layers if background])
+
+    def sync_renderer(self):
+        """Draw the features like the layer, its symbols may have changed since (opacity)."""
+        if self.layer.renderer():
+            renderer = self.layer.renderer().clone()
+            if (isinstance(renderer, QgsCategorizedSymbolRenderer) and
+                    renderer.classAttribute().strip().lower() in FEATURE_ID_EXPRESSIONS):
+                renderer.setClassAttribute(SOURCE_FID_FIELD)
+            self.overlay.setRenderer(renderer)
+
+    def show_features(self, features):
+        provider = self.overlay.dataProvider()
+        provider.truncate()
+        copies = []
+        for feature in features:
+            copy = QgsFeature(self.overlay.fields())
+            copy.setGeometry(feature.geometry())
+            copy.setAttributes(list(feature.attributes()) + [feature.id()])
+            copies.append(copy)
+        provider.addFeatures(copies)
+        self.overlay.updateExtents()
+        self.sync_renderer()
+        self.overlay.triggerRepaint()
+
+    def show_feature_ids(self, feature_ids):
+        """Show the features of the layer with any of these feature_ids, read by fid."""
+        lookup = feature_index.feature_lookup(self.layer)
+        features = []
+        for feature_id in feature_ids:
+            features.extend(lookup.features(feature_id))
+        self.show_features(features)
+
+
+class LinkedCanvasController:
+    """
+    Keeps the extent of several canvases the same.
+
+    Each extentsChanged of a canvas restarts a single shot timer, the other canvases follow the
+    last canvas that moved once the timer fires. A wheel zoom or a series of pans therefore
+    redraws the linked canvases once instead of once per step, and canvases already showing the
+    extent are not redrawn at all. Zooms setting the extent of every canvas themselves (to the
+    next feature) run inside paused().
+    """
+
+    def __init__(self, canvases, delay=SYNC_DELAY_MS):
+        self.canvases = [canvas for canvas in canvases if canvas]
+        self.source = None
+        self.synchronizing = False
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.synchronize)
+        self.slots = []
+        for canvas in self.canvases:
+            slot = lambda canvas=canvas: self.schedule(canvas)
+            canvas.extentsChanged.connect(slot)
+            self.slots.append((canvas, slot))
+
+    def schedule(self, canvas):
+        if self.synchronizing:
+            return  # Caused by synchronize() itself or a paused() zoom
+        self.source = canvas
+        self.timer.start()
+
+    def synchronize(self):
+        if self.source is None:
+            return
+        extent = self.source.extent()
+        self.synchronizing = True
+        try:
+            for canvas in self.canvases:
+                if canvas is not self.source and canvas.extent() != extent:
+                    canvas.setExtent(extent)
+                    canvas.refresh()
+        finally:
+            self.synchronizing = False
+
+    @contextmanager
+    def paused(self):
+        """Extent changes inside the block are not propagated, a pending synchronisation is dropped."""
+        synchronizing = self.synchronizing
+        self.synchronizing = True
+        try:
+            yield
+        finally:
+            self.synchronizing = synchronizing
+            self.timer.stop()
+
+    def close(self):
+        self.timer.stop()
+        for canvas, slot in self.slots:
+            try:
+                canvas.extentsChanged.disconnect(slot)
+            except (TypeError, RuntimeError):
+                pass  # Canvas already deleted with its dialog
+        self.slots = []
@@ -0,0 +1,190 @@
+from qgis.core import QgsWkbTypes
+
+# Fields that identify a feature or its source rather than describe it
+IGNORED_FIELDS = ("fid", "feature_id", "delete", "layer", "path")
+# Points moved by up to this distance (layer units) are not reported as changed
+POINT_TOLERANCE = 1
+# Changes up to this distance (map units) are ignored, per geometry type. 0 asks for topological equality
+DEFAULT_TOLERANCES = {
+    QgsWkbTypes.PointGeometry: POINT_TOLERANCE,
+    QgsWkbTypes.LineGeometry: 0,
+    QgsWkbTypes.PolygonGeometry: 0,
+}
+# Grid the coordinates are snapped to before hashing, about a millimetre in degrees
+HASH_PRECISION = 1e-8
+
+
+class ChangeSet:
+    """Differences between an original layer and its surveyed copy, by feature_id."""
+
+    def __init__(self):
+        self.new = set()  # Only in the surveyed layer
+        self.deleted = set()  # Marked with the 'delete' attribute in the surveyed layer
+        self.removed = set()  # Only in the original layer
+        self.geometry_changed = set()
+        self.attribute_changed = set()
+        self.split = {}  # feature_id -> surveyed features sharing it with differing attributes
+        self.comparisons = {}  # Geometry pairs decided by each tier of the GeometryComparator
+
+    def summary(self):
+        return (f"new: {len(self.new)}, deleted: {len(self.deleted)}, removed: {len(self.removed)}, "
+                f"geometry changed: {len(self.geometry_changed)}, attribute changed: {len(self.attribute_changed)}, "
+                f"split: {len(self.split)}, comparisons: {self.comparisons}")
+
+
+class GeometryComparator:
+    """
+    Decides whether a surveyed geometry changed, with the cheapest test that can tell.
+
+    Most features come back from the field unchanged, so a full GEOS comparison per pair is
+    wasted work. The tiers are:
+
+    1. bounding box edges further apart than the tolerance: changed.
+    2. same vertex count and same hash of the WKB, snapped to precision and normalised: unchanged.
+    3. GEOS: distance() for points, isGeosEqual() for other geometries with a tolerance of 0 and
+       hausdorffDistance() otherwise. equals() is not used, it compares vertex order and would
+       report a ring surveyed from another starting vertex as changed, unlike the hash tier.
+
+    tolerances maps a QgsWkbTypes geometry type to the distance in map units up to which a
+    change is ignored, missing types use DEFAULT_TOLERANCES.
+    """
+
+    def __init__(self, tolerances=None, precision=HASH_PRECISION):
+        self.tolerances = dict(DEFAULT_TOLERANCES)
+        self.tolerances.update(tolerances or {})
+        self.precision = precision
+        self.stats = {"bbox": 0, "hash": 0, "geos": 0}
+
+    def fingerprint(self, geometry):
+        """(vertex count, hash of the snapped and normalised WKB) of a geometry."""
+        snapped = geometry.snappedToGrid(self.precision, self.precision)
+        if snapped.isNull():
+            # Collapsed by the snapping, only GEOS can compare it
+            return geometry.constGet().nCoordinates(), None
+        # Layers saved with forceMulti hold the same shapes as multi part geometries
+        snapped.convertToMultiType()
+        if hasattr(snapped, "normalize"):  # QGIS >= 3.20
+            snapped.normalize()
+        return geometry.constGet().nCoordinates(), hash(bytes(snapped.asWkb()))
+
+    def changed(self, original_geometry, temporary_geometry):
+        geometry_type = QgsWkbTypes.geometryType(original_geometry.wkbType())
+        tolerance = self.tolerances.get(geometry_type, 0)
+
+        # The distance between multipoints is the one of their closest parts, boxes cannot bound it
+        multipoint = geometry_type == QgsWkbTypes.PointGeometry and QgsWkbTypes.isMultiType(original_geometry.wkbType())
+        original_box = original_geometry.boundingBox()
+        temporary_box = temporary_geometry.boundingBox()
+        if not multipoint and (abs(original_box.xMinimum() - temporary_box.xMinimum()) > tolerance or
+                abs(original_box.yMinimum() - temporary_box.yMinimum()) > tolerance or
+                abs(original_box.xMaximum() - temporary_box.xMaximum()) > tolerance or
+                abs(original_box.yMaximum() - temporary_box.yMaximum()) > tolerance):
+            self.stats["bbox"] += 1
+            return True
+
+        original_fingerprint = self.fingerprint(original_geometry)
+        if original_fingerprint[1] is not None and original_fingerprint == self.fingerprint(temporary_geometry):
+            self.stats["hash"] += 1
+            return False
+
+        self.stats["geos"] += 1
+        if geometry_type == QgsWkbTypes.PointGeometry:
+            return original_geometry.distance(temporary_geometry) > tolerance
+        if tolerance == 0:
+            return not original_geometry.isGeosEqual(temporary_geometry)
+        return original_geometry.hausdorffDistance(temporary_geometry) > tolerance
+
+
+def group_by_feature_id(layer, request=None):
+    """Read the layer once, returns feature_id -> list of features."""
+    feature_map = {}
+    features = layer.getFeatures(request) if request is not None else layer.getFeatures()
+    for feature in features:
+        feature_map.setdefault(feature["feature_id"], []).append(feature)
+    return feature_map
+
+
+def compared_field_names(original_layer, temporary_layer):
+    """Fields present in both layers, the ones identifying a feature are left out."""
+    temporary_fields = set(temporary_layer.fields().names())
+    return [name for name in original_layer.fields().names()
+            if name in temporary_fields and name.lower() not in IGNORED_FIELDS]
+
+
+def split_features(feature_map, field_names):
+    """Groups of features sharing a feature_id whose attributes differ."""
+    split = {}
+    for feature_id, features in feature_map.items():
+        if len(features) > 1:
+            unique_values = {tuple(feature[name] for name in field_names) for feature in features}
+            if len(unique_values) > 1:
+                split[feature_id] = features
+    return split
+
+
+def is_within(extent, inner_extent):
+    return (extent.xMinimum() <= inner_extent.xMinimum() and
+            extent.yMinimum() <= inner_extent.yMinimum() and
+            extent.xMaximum() >= inner_extent.xMaximum() and
+            extent.yMaximum() >= inner_extent.yMaximum())
+
+
+def geometry_changed(original_geometry, temporary_geometry, inward_extent=None, comparator=None):
+    """
+    Whether the surveyed geometry differs from the original one.
+
+    Points count as changed once they moved more than their tolerance. Other geometries count
+    when they changed and, given inward_extent, the surveyed one lies within it: features
+    crossing the grid border are clipped differently on both sides and are not compared.
+    """
+    if not original_geometry or not temporary_geometry or original_geometry.isNull() or temporary_geometry.isNull():
+        return False
+    comparator = comparator or GeometryComparator()
+    if not comparator.changed(original_geometry, temporary_geometry):
+        return False
+    if QgsWkbTypes.geometryType(original_geometry.wkbType()) == QgsWkbTypes.PointGeometry:
+        return True
+    return inward_extent is None or is_within(inward_extent, temporary_geometry.boundingBox())
+
+
+def detect_changes(original_layer, temporary_layer, inward_extent=None, tolerances=None):
+    """
+    Compare the surveyed layer with the original one in a single pass over each.
+
+    Both layers are read once into feature_id -> features maps and joined on them, instead of
+    looking up every original feature in the surveyed layer with an expression. The first
+    surveyed feature of a feature_id is the one compared, as before. tolerances is passed to
+    the GeometryComparator. Returns a ChangeSet.
+    """
+    changes = ChangeSet()
+    comparator = GeometryComparator(tolerances)
+    original_map = group_by_feature_id(original_layer)
+    temporary_map = group_by_feature_id(temporary_layer)
+    field_names = compared_field_names(original_layer, temporary_layer)
+    has_delete_field = "delete" in temporary_layer.fields().names()
+
+    for feature_id, temporary_features in temporary_map.items():
+        if feature_id not in original_map:
+            changes.new.add(feature_id)
+        if has_delete_field and feature_id is not None and any(
+                feature["delete"] is True for feature in temporary_features):
+            changes.deleted.add(feature_id)
+
+    for feature_id, original_features in original_map.items():
+        temporary_features = temporary_map.get(feature_id)
+        if not temporary_features:
+            changes.removed.add(feature_id)
+            continue
+        temporary_feature = temporary_features[0]
+        temporary_geometry = temporary_feature.geometry()
+        if any(geometry_changed(feature.geometry(), temporary_geometry, inward_extent, comparator)
+               for feature in original_features):
+            changes.geometry_changed.add(feature_id)
+        original_feature = original_features[0]
+        if any(original_feature[name] != temporary_feature[name] for name in field_names):
+            changes.attribute_changed.add(feature_id)
+
+    changes.comparisons = dict(comparator.stats)
+    changes.split = split_features(temporary_map, [
+        field.name() for field in temporary_layer.fields() if field.name() not in ["fid", "feature_id"]])
+    return changes
@@ -1,97 +1,257 @@
 from qgis.core import (
-    QgsVectorFileWriter,
-    QgsVectorLayer,
     QgsProject,
-    QgsFeature,
-    QgsGeometry,
-    QgsFields,
-    QgsField,
-    QgsWkbTypes,
-    QgsCoordinateReferenceSystem
+    QgsWkbTypes
 )
-from PyQt5.QtCore import QVariant
+from osgeo import ogr, osr
 import os
-import zipfile
-import json
-import tempfile
-import processing
+from . import import_archive as archive
 
-merged_layer = None
+# Features written per GeoPackage transaction, bounds the memory used by a construction
+BATCH_SIZE = 5000
 
-def construct_layer(directory, amrut_files, layer_name):
-    global merged_layer
-    init_merged_layer(layer_name)
-    layers_to_merge = []
 
-    for amrut_file in amrut_files:
+class LayerBuilder:
+    """
+    Builds the merged layer of one surveyed layer from the .amrut files.
+
+    All the state of a construction lives on the builder, so several layers can be built
+    concurrently in worker threads. Create builders on the GUI thread with for_project_layer(),
+    which reads everything needed from the project, then begin(), append() the layers read from
+    the archives and finish() in the worker. Only the saved path and feature count leave the
+    worker, the layer is added to the project on the GUI thread.
+
+    Features are streamed from each archive straight into <layer>_vetted.gpkg through OGR, in
+    transactions of batch_size features, so memory use does not grow with the number of
+    features. The output matches native:mergevectorlayers: the union of the source fields plus
+    'layer' and 'path' fields naming the source, geometries in EPSG:4326 forced to multi.
+    """
+
+    def __init__(self, layer_name, wkb_type, output_dir, batch_size=BATCH_SIZE):
+        self.layer_name = layer_name
+        self.wkb_type = wkb_type
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.path = None
+        self.feature_count = 0
+        self.dataset = None
+        self.layer = None
+        self.pending = 0  # Features written in the current transaction
+
+    @classmethod
+    def for_project_layer(cls, layer_name):
+        """Builder for the project layer named layer_name, must be called on the GUI thread."""
+        project = QgsProject.instance()
+        active_layers = project.mapLayersByName(layer_name)
+        if not active_layers:
+            raise Exception(f"No layer named {layer_name} found in the project")
+        return cls(layer_name, active_layers[0].wkbType(), project.homePath())
+
+    def ogr_geometry_type(self):
+        if QgsWkbTypes.geometryType(self.wkb_type) not in (QgsWkbTypes.PointGeometry, QgsWkbTypes.LineGeometry,
+                                                          QgsWkbTypes.PolygonGeometry):
+            return ogr.wkbUnknown
+        geometry_type = int(QgsWkbTypes.flatType(QgsWkbTypes.multiType(self.wkb_type)))
+        if QgsWkbTypes.hasZ(self.wkb_type):
+            geometry_type = ogr.GT_SetZ(geometry_type)
+        return geometry_type
+
+    def begin(self):
+        print(f"Init merger layer for {self.layer_name}")
+        self.path = os.path.join(self.output_dir, f"{self.layer_name}_vetted.gpkg")
+        self.feature_count = 0
+        driver = ogr.GetDriverByName("GPKG")
+        if os.path.exists(self.path):
+            driver.DeleteDataSource(self.path)
+        self.dataset = driver.CreateDataSource(self.path)
+        if self.dataset is None:
+            raise Exception(f"Could not create {self.path}")
+
+        self.srs = osr.SpatialReference()
+        self.srs.ImportFromEPSG(4326)
+        if hasattr(osr, "OAMS_TRADITIONAL_GIS_ORDER"):
+            self.srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        self.layer = self.dataset.CreateLayer(self.layer_name, self.srs, self.ogr_geometry_type(),
+                                              ["SPATIAL_INDEX=YES"])
+        for field_name in ("layer", "path"):
+            self.layer.CreateField(ogr.FieldDefn(field_name, ogr.OFTString))
+        self.dataset.StartTransaction()
+        self.pending = 0
+
+    def append(self, source_path):
+        """Stream the features of source_path (e.g. a /vsizip/ path) into the output, returns their count."""
+        source = ogr.Open(source_path)
+        if source is None or source.GetLayerCount() == 0:
+            raise Exception(f"{source_path} could not be read")
+        source_layer = source.GetLayer(0)
+        source_definition = source_layer.GetLayerDefn()
+
+        # Add the fields this source brings, the GeoPackage primary key 'fid' is not copied
+        target_definition = self.layer.GetLayerDefn()
+        field_map = []
+        for index in range(source_definition.GetFieldCount()):
+            field_definition = source_definition.GetFieldDefn(index)
+            field_name = field_definition.GetName()
+            if field_name.lower() in ("fid", "layer", "path"):
+                continue
+            target_index = target_definition.GetFieldIndex(field_name)
+            if target_index < 0:
+                self.layer.CreateField(field_definition)
+                target_definition = self.layer.GetLayerDefn()
+            else:
+                widened_type = widened_field_type(target_definition.GetFieldDefn(target_index).GetType(),
+                                                  field_definition.GetType())
+                if widened_type is not None:
+                    self.widen_field(target_index, widened_type)
+                    target_definition = self.layer.GetLayerDefn()
+            field_map.append((index, target_definition.GetFieldIndex(field_name)))
+
+        transform = None
+        source_srs = source_layer.GetSpatialRef()
+        if source_srs is not None and not source_srs.IsSame(self.srs):
+            if hasattr(osr, "OAMS_TRADITIONAL_GIS_ORDER"):
+                source_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            transform = osr.CoordinateTransformation(source_srs, self.srs)
+
+        geometry_type = self.layer.GetGeomType()
+        count = 0
+        for source_feature in source_layer:
+            feature = ogr.Feature(target_definition)
+            for source_index, target_index in field_map:
+                if source_feature.IsFieldSetAndNotNull(source_index):
+                    feature.SetField(target_index, source_feature.GetField(source_index))
+            feature.SetField("layer", self.layer_name)
+            feature.SetField("path", source_path)
+
+            geometry = source_feature.GetGeometryRef()
+            if geometry is not None:
+                geometry = geometry.Clone()
+                if transform is not None:
+                    geometry.Transform(transform)
+                if geometry_type != ogr.wkbUnknown:
+                    geometry = ogr.ForceTo(geometry, geometry_type)
+                feature.SetGeometry(geometry)
+
+            if self.layer.CreateFeature(feature) != 0:
+                raise Exception(f"Could not write a feature of {source_path}")
+            count += 1
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.dataset.CommitTransaction()
+                self.dataset.StartTransaction()
+                self.pending = 0
+
+        self.feature_count += count
+        return count
+
+    def widen_field(self, field_index, field_type):
+        """
+        Change the type of an output field once archives disagree on it, OGR would otherwise
+        coerce or truncate the values of the later archives to the type of the first one.
+        """
+        # The GeoPackage table is rebuilt by the change, the pending batch is committed first
+        self.dataset.CommitTransaction()
+        field_name = self.layer.GetLayerDefn().GetFieldDefn(field_index).GetName()
+        print(f"Widening field {field_name} of {self.layer_name} to {ogr.GetFieldTypeName(field_type)}")
+        if self.layer.AlterFieldDefn(field_index, ogr.FieldDefn(field_name, field_type), ogr.ALTER_TYPE_FLAG) != 0:
+            raise Exception(f"Could not change the type of field {field_name}")
+        self.dataset.StartTransaction()
+        self.pending = 0
+
+    def finish(self):
+        """Commit the last batch and close the output, returns the path of the saved layer."""
+        self.dataset.CommitTransaction()
+        # The review and comparison of the vetted layer look features up by feature_id
+        if self.layer.GetLayerDefn().GetFieldIndex("feature_id") >= 0:
+            self.dataset.ExecuteSQL(f'CREATE INDEX IF NOT EXISTS "{self.layer_name}_feature_id_idx" '
+                                    f'ON "{self.layer_name}" ("feature_id")')
+        self.layer = None
+        self.dataset = None  # Closing the dataset builds the spatial index
+        print(f"Merged layer {self.layer_name} feature count: {self.feature_count}")
+        return self.path
+
+    def abort(self):
+        """Close and remove a partially written output."""
+        if self.dataset is not None:
+            self.dataset.RollbackTransaction()
+            self.layer = None
+            self.dataset = None
+        if self.path and os.path.exists(self.path):
+            ogr.GetDriverByName("GPKG").DeleteDataSource(self.path)
+
+
+def widened_field_type(target_type, source_type):
+    """Type holding the values of both field types, None if the target type already does."""
+    if target_type == source_type or target_type == ogr.OFTString:
+        return None
+    if {target_type, source_type} == {ogr.OFTInteger, ogr.OFTInteger64}:
+        return None if target_type == ogr.OFTInteger64 else ogr.OFTInteger64
+    return ogr.OFTString
+
+
+def construct_layer(directory, amrut_files, builder):
+    results, errors = construct_layers(directory, amrut_files, [builder])
+    if builder.layer_name in errors:
+        return False, errors[builder.layer_name]
+
+    return True, results[builder.layer_name]["path"]  # Successfully validated, return layer map
+
+def construct_layers(directory, amrut_files, builders, progress_callback=None):
+    """
+    Construct several layers in a single pass over the .amrut files.
+
+    Every archive is opened once and each layer it contains is streamed into the LayerBuilder of
+    that layer. progress_callback, if given, receives the percentage of the work done.
+    Returns (results, errors): results maps a layer name to {"path", "features"} of the saved
+    layer, errors maps a layer name to the reason it could not be constructed.
+    """
+    errors = {}
+    active_builders = []
+    for builder in builders:
+        try:
+            builder.begin()
+            active_builders.append(builder)
+        except Exception as e:
+            errors[builder.layer_name] = str(e)
+
+    for index, amrut_file in enumerate(amrut_files):
         amrut_path = os.path.join(directory, amrut_file)
-        print(f"Constructing Layer for {layer_name} , thus Reading File : {amrut_path}")
-        # Open the .amrut file as a ZIP archive
-        with zipfile.ZipFile(amrut_path, 'r') as zip_ref:
-            # Check if layer exists in the archive
+        print(f"Constructing Layers {[builder.layer_name for builder in active_builders]} , thus Reading File : {amrut_path}")
+        # Check which layers exist in the archive, the listing is usually cached by the validation
+        try:
+            amrut_archive = archive.get_archive(amrut_path)
+        except Exception as e:
+            # Every layer is built from every archive, none of them can be completed
+            for builder in active_builders:
+                errors[builder.layer_name] = f"{amrut_file} could not be read: {e}"
+                builder.abort()
+            active_builders = []
+            break
+
+        for builder in list(active_builders):
+            layer_name = builder.layer_name
             layer_file_name = f"{layer_name}.geojson"
-            if  layer_file_name not in zip_ref.namelist():
-                return False, f"Layer not found in {amrut_file}"
-
-            geojson_data = zip_ref.read(layer_file_name).decode('utf-8')
-            temp_dir = tempfile.gettempdir()
-            temp_geojson_file_path = os.path.join(temp_dir, f"Temporary_{amrut_file}_{layer_file_name}")
-            print(f"Reading layer from mobile : {temp_geojson_file_path}")
-            # GeoJSON data to the temporary file
-            with open(temp_geojson_file_path, 'w', encoding='utf-8') as temp_geojson_file:
-                temp_geojson_file.write(geojson_data)
-
-            geojson_layer = QgsVectorLayer(temp_geojson_file_path, layer_name, "ogr")
-            layers_to_merge.append(geojson_layer)
-
-    merge_layers(layers_to_merge)
-    saved_layer_path = save_temporary_layer(layer_name)
-    print(f"Merged layer feature count: {merged_layer.featureCount()}")
-
-
-    return True, saved_layer_path  # Successfully validated, return layer map
-
-def init_merged_layer(layer_name) :
-    global merged_layer
-    print(f"Init merger layer for {layer_name}")
-    active_layer = QgsProject.instance().mapLayersByName(layer_name)[0]
-    if not active_layer:
-        raise Exception(f"No layer named {layer_name} found in the project")
-    geometry_type = active_layer.wkbType()
-    geometry_str = QgsWkbTypes.displayString(geometry_type).split(" ")[0]
-    crs = QgsCoordinateReferenceSystem("EPSG:4326")
-    layer_uri = f"{geometry_str}?crs={crs.authid()}"
-    merged_layer = QgsVectorLayer(layer_uri, f"Temporary_{layer_name}", "memory")
-
-def merge_layers(layers_to_merge):
-    global merged_layer
-    parameters = {
-        'LAYERS': layers_to_merge,
-        'CRS': QgsCoordinateReferenceSystem("EPSG:4326"),
-        'OUTPUT': 'memory:'  # Keep it in memory
-    }
-    merged_layer = processing.run("native:mergevectorlayers", parameters)['OUTPUT']
-    if not merged_layer or not merged_layer.isValid():
-        raise Exception("Merging layers failed.")
-
-
-def save_temporary_layer(layer_name):
-    global merged_layer
-    project_path = QgsProject.instance().homePath()  # Gets the root project directory
-    temporary_layer_path = os.path.join(project_path, f"{layer_name}_vetted.gpkg")
-    save_file_to_disk(temporary_layer_path, merged_layer)
-
-    return temporary_layer_path
-
-def save_file_to_disk (file_path, layer) :
-    options = QgsVectorFileWriter.SaveVectorOptions()
-
-# Set the CRS transformation context (optional)
-    error = QgsVectorFileWriter.writeAsVectorFormatV2(
-        layer=layer,
-        fileName = file_path,
-        transformContext= QgsProject.instance().transformContext(),
-        options =options,
-    )
+            try:
+                if not amrut_archive.has_member(layer_file_name):
+                    raise Exception(f"Layer not found in {amrut_file}")
+                # Read the layer in place through /vsizip/, without extracting it to a temporary file
+                builder.append(archive.vsizip_path(amrut_path, layer_file_name))
+            except Exception as e:
+                errors[layer_name] = str(e)
+                builder.abort()
+                active_builders.remove(builder)
+
+        if progress_callback:
+            progress_callback(int((index + 1) * 100 / (len(amrut_files) + 1)))
+
+    results = {}
+    for builder in active_builders:
+        try:
+            results[builder.layer_name] = {"path": builder.finish(), "features": builder.feature_count}
+        except Exception as e:
+            errors[builder.layer_name] = str(e)
+            builder.abort()
 
+    if progress_callback:
+        progress_callback(100)
 
+    return results, errors
@@ -2,17 +2,15 @@ from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QPushButton, QFileDialog, QMessageBox, QLabel, QLineEdit, QHBoxLayout, QComboBox
 )
 from PyQt5.QtCore import Qt
-import tempfile
 import os
-import shutil
-import zipfile
-import json
 from qgis.core import (
     QgsProject, QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsRectangle, QgsMapLayer, QgsMessageLog, Qgis
 )
 from . import export_ui as ui
 from . import qc_visualization_dialog as qc
 from . import import_reconstruct_dialog as reconstruct_dialog
+from . import import_archive as archive
+from . import import_qc_session as qc_session
 
 
 class ImportDialog(QDialog):
@@ -30,6 +28,7 @@ class ImportDialog(QDialog):
         """
         super().__init__()
         self.iface = iface
+        self.qc_session = None  # QC decisions on the selected file, see commit_qc_session
 
     def reconstruct_or_qc_dialog(self):
         """
@@ -175,8 +174,17 @@ class ImportDialog(QDialog):
             proceed_button.clicked.connect(self.proceed_quality_check)
             layout.addWidget(proceed_button, alignment=Qt.AlignCenter)
 
+            # Add save button to write the QC decisions made so far to the .amrut file
+            save_button = QPushButton("Save QC Progress")
+            save_button.setFixedSize(150, 25)
+            save_button.clicked.connect(self.save_qc_progress)
+            layout.addWidget(save_button, alignment=Qt.AlignCenter)
+
             # Show the dialog
             qc_dialog.exec_()
+
+            # The QC session ends with the dialog
+            self.commit_qc_session()
             
         except Exception as e:
             QgsMessageLog.logMessage(f"Error in quality_check_dialog: {str(e)}", 'AMRUT', Qgis.Critical)
@@ -250,6 +258,8 @@ class ImportDialog(QDialog):
             if file:
                 # Validate file extension
                 if file.endswith(".amrut"):
+                    # Finish the session of the previous file before switching
+                    self.commit_qc_session()
                     self.selected_file = file
                     self.validate_amrut_file(file)
                 else:
@@ -292,94 +302,84 @@ class ImportDialog(QDialog):
                                        "The selected .amrut file or its resurvey version could not be found.")
                     return
 
-            # Create temporary directory for file extraction
-            temp_dir = tempfile.mkdtemp()
+            # Validate the archive structure, the listing and metadata are read once and shared
+            amrut_archive = archive.get_archive(file_path)
+            # Check for required metadata file
+            if not amrut_archive.has_member(archive.METADATA_FILE_NAME):
+                QMessageBox.warning(self, "Missing Metadata File", 
+                                  "The .amrut file does not contain 'metadata.json'.")
+                self.file_input.clear()
+                return
 
-            # Extract and validate ZIP file structure
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                # Check for required metadata file
-                if 'metadata.json' not in zip_ref.namelist():
-                    QMessageBox.warning(self, "Missing Metadata File", 
-                                      "The .amrut file does not contain 'metadata.json'.")
-                    self.file_input.clear()
-                    return
-                
-                # Extract all files to temporary directory
-                zip_ref.extractall(temp_dir)
-                metadata_path = os.path.join(temp_dir, "metadata.json")
-
-                # Parse metadata JSON file
-                try:
-                    with open(metadata_path, "r", encoding="utf-8") as f:
-                        metadata = json.load(f)
-                except (json.JSONDecodeError, FileNotFoundError):
-                    QMessageBox.critical(self, "Invalid Metadata", "Failed to parse metadata.json.")
-                    self.file_input.clear()
-                    return
+            # Continue the QC session of this file, or start one (resuming unsaved decisions)
+            if self.qc_session is None or self.qc_session.archive_path != file_path:
+                self.commit_qc_session()
+                self.qc_session = qc_session.QCSession(file_path)
+                if self.qc_session.resumed:
+                    QgsMessageLog.logMessage(f"Resuming the unsaved QC session of {file_path}", 'AMRUT', Qgis.Info)
+
+            # Parse metadata JSON file, with the decisions of the session applied
+            try:
+                metadata = self.qc_session.metadata()
+            except ValueError:
+                QMessageBox.critical(self, "Invalid Metadata", "Failed to parse metadata.json.")
+                self.file_input.clear()
+                return
 
-                # Check if file is already fully verified
-                if metadata.get("qc_status") == "verified":
-                    QMessageBox.information(self, "File Verified", 
-                                          "All layers of this file have been verified.")
-                    self.file_input.clear()
-                    return
-                
-                # Check if file is already marked for resurvey
-                if ("resurvey" in metadata and len(metadata["resurvey"]) > 0 and 
-                    "layers_qc_completed" not in metadata and "qc_status" not in metadata):
-                    QMessageBox.information(self, "Marked for Re-Survey", 
-                                          "File has already been marked for Re-Survey.")
-                    self.file_input.clear()
-                    return
+            # Check if file is already fully verified
+            if metadata.get("qc_status") == "verified":
+                self.commit_qc_session()
+                QMessageBox.information(self, "File Verified", 
+                                      "All layers of this file have been verified.")
+                self.file_input.clear()
+                return
+            
+            # Check if file is already marked for resurvey
+            if qc_session.is_marked_for_resurvey(metadata):
+                self.commit_qc_session()
+                QMessageBox.information(self, "Marked for Re-Survey", 
+                                      "File has already been marked for Re-Survey.")
+                self.file_input.clear()
+                return
 
-                # Validate layers array in metadata
-                if 'layers' not in metadata or not isinstance(metadata['layers'], list):
-                    QMessageBox.warning(self, "Invalid Metadata", 
-                                      "'layers' array is missing or invalid in metadata.json.")
-                    self.file_input.clear()
-                    return
+            # Validate layers array in metadata
+            if 'layers' not in metadata or not isinstance(metadata['layers'], list):
+                QMessageBox.warning(self, "Invalid Metadata", 
+                                  "'layers' array is missing or invalid in metadata.json.")
+                self.file_input.clear()
+                return
 
-                # Extract layer names from metadata
-                layer_names = [layer.split(" : ")[0].strip("{}").strip() for layer in metadata['layers']]
-                
-                # Validate layers against current QGIS project
-                project_layers = [layer.name().strip().lower() for layer in QgsProject.instance().mapLayers().values()]
-                missing_in_project = [layer for layer in layer_names if layer.lower() not in project_layers]
+            # Extract layer names from metadata
+            layer_names = [layer.split(" : ")[0].strip("{}").strip() for layer in metadata['layers']]
+            
+            # Validate layers against current QGIS project
+            project_layers = [layer.name().strip().lower() for layer in QgsProject.instance().mapLayers().values()]
+            missing_in_project = [layer for layer in layer_names if layer.lower() not in project_layers]
 
-                if missing_in_project:
-                    QMessageBox.warning(self, "Missing Layers in QGIS", 
-                                      f"The following layers are missing in the project: {', '.join(missing_in_project)}")
-                    self.file_input.clear()
-                    return
+            if missing_in_project:
+                QMessageBox.warning(self, "Missing Layers in QGIS", 
+                                  f"The following layers are missing in the project: {', '.join(missing_in_project)}")
+                self.file_input.clear()
+                return
 
-                # Initialize QC completion tracking if not present
-                if 'layers_qc_completed' not in metadata:
-                    # Mark layers as completed if they don't have corresponding GeoJSON files
-                    metadata['layers_qc_completed'] = [
-                        layer for layer in layer_names if f"{layer}.geojson" not in zip_ref.namelist()
-                    ]
-                    # Mark entire file as verified if all layers are completed
-                    if set(metadata['layers_qc_completed']) == set(layer_names):
-                        metadata["qc_status"] = "verified"
-
-                # Identify layers still pending QC
-                layers_qc_pending = [layer for layer in layer_names if layer not in metadata['layers_qc_completed']]
-
-                # Update metadata.json with QC progress
-                with open(metadata_path, "w", encoding="utf-8") as metadata_file:
-                    json.dump(metadata, metadata_file, indent=4)
-
-            # Create updated .amrut file with modified metadata
-            temp_amrut_path = file_path + ".tmp"
-            with zipfile.ZipFile(temp_amrut_path, 'w') as new_zip:
-                for root, _, files in os.walk(temp_dir):
-                    for file in files:
-                        temp_file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(temp_file_path, temp_dir)
-                        new_zip.write(temp_file_path, arcname)
-
-            # Replace original file with updated version
-            os.replace(temp_amrut_path, file_path)
+            # Initialize QC completion tracking if not present
+            metadata_changed = 'layers_qc_completed' not in metadata
+            if metadata_changed:
+                # Mark layers as completed if they don't have corresponding GeoJSON files
+                metadata['layers_qc_completed'] = [
+                    layer for layer in layer_names if not amrut_archive.has_member(f"{layer}.geojson")
+                ]
+                # Mark entire file as verified if all layers are completed
+                if set(metadata['layers_qc_completed']) == set(layer_names):
+                    metadata["qc_status"] = "verified"
+
+            # Identify layers still pending QC
+            layers_qc_pending = [layer for layer in layer_names if layer not in metadata['layers_qc_completed']]
+
+            # Record the QC progress initialised above on the session, the archive is written
+            # once with the decisions on its layers
+            if metadata_changed:
+                self.qc_session.update_metadata(metadata)
 
             # Extract geographic bounds from metadata for extent validation
             self.metadata_bounds = {key: metadata[key] for key in ["north", "south", "east", "west"] if key in metadata}
@@ -389,6 +389,7 @@ class ImportDialog(QDialog):
             if layers_qc_pending:
                 self.layer_dropdown.addItems(layers_qc_pending)
             else:
+                self.commit_qc_session()
                 QMessageBox.information(self, "All Layers Verified", 
                                       "All layers of this file have been verified.")
                 self.file_input.clear()
@@ -397,10 +398,30 @@ class ImportDialog(QDialog):
             QgsMessageLog.logMessage(f"Error in validate_amrut_file: {str(e)}", 'AMRUT', Qgis.Critical)
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
-        finally:
-            # Clean up temporary directory
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+    def commit_qc_session(self):
+        """
+        Write the pending QC decisions of the selected file to its .amrut file in one rewrite.
+
+        If the rewrite fails the decisions stay in the session journal next to the file and are
+        resumed the next time it is selected.
+        """
+        if self.qc_session is None or not self.qc_session.has_changes():
+            return
+        try:
+            archive_path = self.qc_session.commit()
+            QgsMessageLog.logMessage(f"QC progress saved to {archive_path}", 'AMRUT', Qgis.Info)
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error in commit_qc_session: {str(e)}", 'AMRUT', Qgis.Critical)
+            QMessageBox.critical(self, "Error", 
+                               f"The QC progress could not be saved: {str(e)}\n"
+                               f"It is kept in {self.qc_session.journal_dir} and resumed when the file is selected again.")
+
+    def save_qc_progress(self):
+        """Commit the QC session on request, without waiting for the file to be done."""
+        if self.qc_session is None or not self.qc_session.has_changes():
+            QMessageBox.information(self, "Nothing to Save", "There is no unsaved QC progress.")
+            return
+        self.commit_qc_session()
 
     def proceed_quality_check(self):
         """
@@ -468,7 +489,8 @@ class ImportDialog(QDialog):
                 selected_layer_name=selected_layer_name,
                 amrut_file_path=self.file_input.text(),
                 selected_raster_layer_name=selected_raster_layer_name,
-                grid_extent=grid_extent
+                grid_extent=grid_extent,
+                qc_session=self.qc_session
             )
 
             # Execute the quality check dialog
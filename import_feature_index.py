@@ -0,0 +1,107 @@
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsVectorDataProvider
+
+FEATURE_ID_FIELD = "feature_id"
+# Providers whose attribute index lives in the data source itself. OGR formats other than
+# GeoPackage would get sidecar index files written next to the user's data.
+INDEXED_STORAGE_TYPES = ("GPKG", "SQLite")
+
+_lookups = {}  # (layer id, field name) -> FeatureIdLookup
+
+
+def feature_id_key(value):
+    """Key of a feature_id value in the lookups, 12, 12.0 and "12" are the same feature."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def ensure_feature_id_index(layer, field_name=FEATURE_ID_FIELD):
+    """
+    Create an attribute index on feature_id for memory and GeoPackage layers.
+
+    Returns whether the layer has one. Expression filters on feature_id (subset strings,
+    QgsFeatureRequest expressions) use it, the index is kept for the lifetime of the layer.
+    """
+    if layer is None or not layer.isValid():
+        return False
+    field_index = layer.fields().lookupField(field_name)
+    if field_index < 0:
+        return False
+    provider = layer.dataProvider()
+    if provider.name() != "memory" and provider.storageType() not in INDEXED_STORAGE_TYPES:
+        return False
+    if not provider.capabilities() & QgsVectorDataProvider.CreateAttributeIndex:
+        return False
+    return provider.createAttributeIndex(field_index)
+
+
+class FeatureIdLookup:
+    """
+    feature_id -> fids of a layer, read in one pass and used for fid requests.
+
+    Repeated lookups of the same layer cost a dictionary access and a fid request instead of an
+    expression scan. The map is dropped whenever the layer is edited, committed or rolled back
+    and read again on the next lookup. While the layer is filtered by a subset string the map
+    would be incomplete, such lookups fall back to an expression request.
+    """
+
+    def __init__(self, layer, field_name=FEATURE_ID_FIELD):
+        self.layer = layer
+        self.field_name = field_name
+        self.fid_map = None
+        ensure_feature_id_index(layer, field_name)
+        for signal in (layer.featureAdded, layer.featureDeleted, layer.attributeValueChanged,
+                       layer.afterCommitChanges, layer.afterRollBack):
+            signal.connect(self.invalidate)
+
+    def invalidate(self, *args):
+        self.fid_map = None
+
+    def build(self):
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([self.field_name], self.layer.fields())
+        fid_map = {}
+        for feature in self.layer.getFeatures(request):
+            value = feature[self.field_name]
+            if value is not None:
+                fid_map.setdefault(feature_id_key(value), []).append(feature.id())
+        self.fid_map = fid_map
+
+    def request(self, feature_id):
+        """QgsFeatureRequest for the features with this feature_id."""
+        if self.fid_map is None:
+            if self.layer.subsetString():
+                return QgsFeatureRequest().setFilterExpression(
+                    QgsExpression.createFieldEqualityExpression(self.field_name, feature_id))
+            self.build()
+        return QgsFeatureRequest().setFilterFids(self.fid_map.get(feature_id_key(feature_id), []))
+
+    def mapped_fids(self, feature_id):
+        """fids of this feature_id from the map, without reading features. None while a subset string applies."""
+        if self.fid_map is None:
+            if self.layer.subsetString():
+                return None
+            self.build()
+        return list(self.fid_map.get(feature_id_key(feature_id), []))
+
+    def fids(self, feature_id):
+        return [feature.id() for feature in self.layer.getFeatures(self.request(feature_id))]
+
+    def features(self, feature_id):
+        return list(self.layer.getFeatures(self.request(feature_id)))
+
+    def first(self, feature_id):
+        """First feature with this feature_id, or None."""
+        return next(self.layer.getFeatures(self.request(feature_id)), None)
+
+
+def feature_lookup(layer, field_name=FEATURE_ID_FIELD):
+    """Shared FeatureIdLookup of a layer and field, created with its index on first use."""
+    key = (layer.id(), field_name)
+    lookup = _lookups.get(key)
+    if lookup is None or lookup.layer is not layer:
+        lookup = FeatureIdLookup(layer, field_name)
+        _lookups[key] = lookup
+        layer.willBeDeleted.connect(lambda key=key: _lookups.pop(key, None))
+    return lookup
@@ -0,0 +1,133 @@
+import copy
+import json
+import os
+import shutil
+from . import import_archive as archive
+
+# Decisions not yet written to an archive are kept in <archive>.qcsession next to it
+JOURNAL_SUFFIX = ".qcsession"
+JOURNAL_FILE_NAME = "journal.json"
+RESURVEY_PREFIX = "resurvey_required_"
+
+
+def is_marked_for_resurvey(metadata):
+    """Whether the QC of every layer is done and at least one feature has to be surveyed again."""
+    return ("resurvey" in metadata and len(metadata["resurvey"]) > 0 and
+            "layers_qc_completed" not in metadata and "qc_status" not in metadata)
+
+
+class QCSession:
+    """
+    QC decisions on one .amrut file, written to the archive in a single rewrite.
+
+    The import dialog keeps one session for the selected file. The verified layers, the resurvey
+    entries and the metadata changes of each layer are recorded in a journal directory next to
+    the archive instead of rewriting it per layer. commit() applies all of them at once, when
+    the user saves, the file is done or the QC dialog is closed. A journal left behind by a crash
+    is resumed the next time the file is selected, as long as the archive did not change since.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.journal_dir = archive_path + JOURNAL_SUFFIX
+        self.signature = archive.archive_signature(archive_path)
+        self._metadata = None  # Pending metadata, None while nothing is recorded
+        self.layer_files = []  # Members replaced by a file of the same name in the journal
+        self.resumed = self.load_journal()
+
+    def journal_path(self):
+        return os.path.join(self.journal_dir, JOURNAL_FILE_NAME)
+
+    def load_journal(self):
+        """Pick up the decisions of an earlier session that were not committed, returns whether there were any."""
+        if not os.path.exists(self.journal_path()):
+            return False
+        try:
+            with open(self.journal_path(), "r", encoding="utf-8") as journal_file:
+                journal = json.load(journal_file)
+            if tuple(journal["archive_signature"]) != self.signature:
+                # The archive was rewritten since, the recorded decisions no longer apply to it
+                raise ValueError(f"{os.path.basename(self.archive_path)} changed since the QC session was saved")
+            self._metadata = journal["metadata"]
+            self.layer_files = list(journal["layers"])
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Discarding QC session journal {self.journal_dir} : {e}")
+            self.discard()
+            return False
+
+    def save_journal(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        temp_journal_path = self.journal_path() + ".tmp"
+        with open(temp_journal_path, "w", encoding="utf-8") as journal_file:
+            json.dump({
+                "archive_signature": list(self.signature),
+                "metadata": self._metadata,
+                "layers": self.layer_files
+            }, journal_file, indent=4)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temp_journal_path, self.journal_path())
+
+    def has_changes(self):
+        return self._metadata is not None
+
+    def metadata(self):
+        """Metadata of the archive with the recorded changes applied, a copy the caller may modify."""
+        if self._metadata is None:
+            return archive.get_archive(self.archive_path).metadata()
+        return copy.deepcopy(self._metadata)
+
+    def update_metadata(self, metadata):
+        self._metadata = copy.deepcopy(metadata)
+        self.save_journal()
+
+    def record_layer(self, member_name, geojson_path, metadata):
+        """Record the verified GeoJSON of a layer, the file is moved into the journal."""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        shutil.move(geojson_path, os.path.join(self.journal_dir, member_name))
+        if member_name not in self.layer_files:
+            self.layer_files.append(member_name)
+        self.update_metadata(metadata)
+
+    def output_path(self, metadata):
+        """Path of the committed archive, archives marked for resurvey are renamed."""
+        if not is_marked_for_resurvey(metadata):
+            return self.archive_path
+        directory = os.path.dirname(self.archive_path)
+        original_filename = os.path.basename(self.archive_path)
+        return os.path.join(directory, f"{RESURVEY_PREFIX}{original_filename}")
+
+    def commit(self):
+        """
+        Write the recorded decisions to the archive in one rewrite, returns the path of the archive.
+
+        The journal is only removed once the rewritten archive is in place, a failed commit can be
+        retried or resumed later.
+        """
+        if not self.has_changes():
+            return self.archive_path
+
+        replacements = {}
+        for member_name in self.layer_files:
+            with open(os.path.join(self.journal_dir, member_name), "rb") as layer_file:
+                replacements[member_name] = layer_file.read()
+        replacements[archive.METADATA_FILE_NAME] = json.dumps(self._metadata, indent=4).encode("utf-8")
+
+        output_path = self.output_path(self._metadata)
+        archive.rewrite_archive(self.archive_path, replacements, output_path)
+        if output_path != self.archive_path:
+            # The renamed archive is complete, the original can go
+            os.remove(self.archive_path)
+        self.discard()
+
+        self.archive_path = output_path
+        self.journal_dir = output_path + JOURNAL_SUFFIX
+        self.signature = archive.archive_signature(output_path)
+        return output_path
+
+    def discard(self):
+        """Drop the recorded decisions and their journal."""
+        shutil.rmtree(self.journal_dir, ignore_errors=True)
+        self._metadata = None
+        self.layer_files = []
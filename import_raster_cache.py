@@ -0,0 +1,165 @@
+from qgis.core import QgsApplication
+import hashlib
+import json
+import os
+import threading
+import processing
+
+# Reprojected rasters are kept in the QGIS profile directory, shared by every QC dialog and session
+CACHE_DIR_NAME = "amrut_raster_cache"
+# Total size of the cached rasters, the least recently used ones are removed beyond it
+MAX_CACHE_BYTES = 4 * 1024 ** 3
+RASTER_SUFFIX = ".tif"
+# Rasters still being written, never served or evicted
+PARTIAL_PREFIX = "partial_"
+# Windowed warps cover the requested extent grown by this fraction of its size on every side
+EXTENT_MARGIN = 0.25
+
+_cache_lock = threading.Lock()
+
+
+class ReprojectionCancelled(Exception):
+    """Raised when the warp is cancelled through the processing feedback."""
+
+
+def cache_directory():
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), CACHE_DIR_NAME)
+
+
+def cache_key(source_path, target_crs, resampling, nodata, window=None):
+    """
+    Name of the reprojected raster in the cache.
+
+    Hash of the source file (path, size and mtime) and of the warp options, an orthophoto
+    replaced on disk gets a new key and is reprojected again.
+    """
+    stat = os.stat(source_path)
+    description = json.dumps([os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns,
+                              target_crs, resampling, nodata, window])
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+class RasterCache:
+    """
+    Directory of reprojected rasters, one <key>.tif per source raster and set of warp options.
+
+    A raster is written under a partial name and renamed once complete, so an interrupted warp
+    never leaves a raster that would be served later. Serving a raster touches its mtime, the
+    eviction removes the oldest ones first until the cache fits in max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory or cache_directory()
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key + RASTER_SUFFIX)
+
+    def lookup(self, key):
+        """Path of the cached raster, or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, key, write):
+        """Run write(path) to create the raster of key, returns its path in the cache."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        partial_path = os.path.join(self.directory, f"{PARTIAL_PREFIX}{key}_{os.getpid()}_{threading.get_ident()}{RASTER_SUFFIX}")
+        try:
+            write(partial_path)
+            os.replace(partial_path, path)
+        finally:
+            remove_raster(partial_path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        with _cache_lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(RASTER_SUFFIX) and not name.startswith(PARTIAL_PREFIX):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path != keep and remove_raster(path):
+                    total -= size
+
+
+def remove_raster(path):
+    """Remove a raster and its .aux.xml, returns False if it is still open (Windows)."""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path + ".aux.xml"):
+            os.remove(path + ".aux.xml")
+        return True
+    except OSError:
+        return False
+
+
+def warp_window(extent, extent_crs, margin=EXTENT_MARGIN):
+    """(xmin, xmax, ymin, ymax, crs) of a QgsRectangle grown by margin times its size, None without an extent."""
+    if extent is None or extent.isEmpty():
+        return None
+    dx = extent.width() * margin
+    dy = extent.height() * margin
+    return (extent.xMinimum() - dx, extent.xMaximum() + dx,
+            extent.yMinimum() - dy, extent.yMaximum() + dy, extent_crs)
+
+
+def reproject(source_path, source_crs, target_crs, resampling=0, nodata=0, context=None, feedback=None, cache=None,
+              extent=None, extent_crs=None):
+    """
+    Path of source_path reprojected to target_crs with gdal:warpreproject.
+
+    Given an extent (QgsRectangle in extent_crs, target_crs by default) only the pixels of that
+    extent and a margin of EXTENT_MARGIN around it are warped: the QC of a grid cell needs a few
+    hundred metres of the orthophoto, not the whole city, so the warp takes about the same time
+    whatever the size of the source.
+
+    Rasters read from files are warped once into the cache and served from it afterwards, other
+    sources (web services, virtual rasters in memory) are warped to a temporary output each time.
+    Raises ReprojectionCancelled once feedback is cancelled. cache defaults to the RasterCache in
+    the QGIS profile directory.
+    """
+    window = warp_window(extent, extent_crs or target_crs)
+
+    def warp(output_path):
+        params = {
+            'INPUT': source_path,
+            'SOURCE_CRS': source_crs,
+            'TARGET_CRS': target_crs,
+            'RESAMPLING': resampling,
+            'NODATA': nodata,
+            'OUTPUT': output_path
+        }
+        if window:
+            xmin, xmax, ymin, ymax, window_crs = window
+            params['TARGET_EXTENT'] = f"{xmin},{xmax},{ymin},{ymax} [{window_crs}]"
+            params['TARGET_EXTENT_CRS'] = window_crs
+        output = processing.run("gdal:warpreproject", params, context=context, feedback=feedback)['OUTPUT']
+        # A cancelled warp stops gdalwarp half way, its output must not reach the cache
+        if feedback is not None and feedback.isCanceled():
+            raise ReprojectionCancelled("Raster reprojection cancelled by user.")
+        return output
+
+    if not os.path.isfile(source_path):
+        return warp('TEMPORARY_OUTPUT')
+
+    cache = cache or RasterCache()
+    key = cache_key(source_path, target_crs, resampling, nodata, window)
+    path = cache.lookup(key)
+    if path is None:
+        path = cache.store(key, warp)
+    return path
@@ -25,7 +25,7 @@ from PyQt5.QtCore import QThread, Qt
 from PyQt5.QtGui import QPixmap
 from . import export_ui as ui
 from . import import_workers as workers
-from . import import_process_layer as process
+from . import import_construct_layer as construction
 from . import import_reconstruct_feature
 
 from qgis.core import QgsProject, QgsMapLayer
@@ -41,7 +41,10 @@ class ReconstructLayerTabDialog(QDialog):
         self.iface = iface
         self.setWindowTitle("Sankalan 2.0")
         self.setMinimumSize(700, 500)
-        self.processing_layer = False
+        self.processing_layer = False  # A comparison (and its merge dialog) is in progress
+        self.layer_threads = {}  # Layer name -> (thread, worker) of the constructions running in parallel
+        self.compare_queue = []  # Constructed layers waiting for their comparison
+        self.selected_layer_for_processing = None
         self.selected_raster_layer_name = None
         self.saved_temp_layer = None
         # Main layout
@@ -104,11 +107,12 @@ class ReconstructLayerTabDialog(QDialog):
                 if self.thread.isRunning():
                     self.thread.quit()
                     self.thread.wait()
-        if hasattr(self, 'layer_thread') and self.layer_thread:
-            if not sip.isdeleted(self.layer_thread):  # Check if the thread is already deleted
-                if self.layer_thread.isRunning():
-                    self.layer_thread.quit()
-                    self.layer_thread.wait()
+        self.compare_queue = []
+        for layer_thread, _ in list(self.layer_threads.values()):
+            if not sip.isdeleted(layer_thread):  # Check if the thread is already deleted
+                if layer_thread.isRunning():
+                    layer_thread.quit()
+                    layer_thread.wait()
 
         for layer in QgsProject.instance().mapLayers().values():
             if layer.subsetString():  # Check if a filter is applied
@@ -137,17 +141,43 @@ class ReconstructLayerTabDialog(QDialog):
             error_msg = data
             self.show_error(error_msg)
 
-    def layer_construction_result (self, result, data) :
+    def layer_construction_result (self, layer_name, result, data) :
+        self.layer_threads.pop(layer_name, None)
         if result :
             self.show_success("Layer", f"Layer successfully re-constructed and saved at {data}")
-            temporary_layer_name = f"Temporary_{self.selected_layer_for_processing}"
-            self.saved_temp_layer = QgsVectorLayer(data, temporary_layer_name, "ogr")
-            QgsProject.instance().addMapLayer(self.saved_temp_layer)
-            self.compare_changes()
+            temporary_layer = QgsVectorLayer(data, f"Temporary_{layer_name}", "ogr")
+            QgsProject.instance().addMapLayer(temporary_layer)
+            self.queue_comparison(layer_name)
 
         else :
             self.show_error(data)
-            self.processing_layer = False
+        self.refresh_layer_construction_tab()
+
+    def layers_construction_result(self, results, errors):
+        """Add the constructed layers to the project, changes are compared when each layer is processed."""
+        lines = []
+        for layer_name, result in results.items():
+            temporary_layer = QgsVectorLayer(result["path"], f"Temporary_{layer_name}", "ogr")
+            QgsProject.instance().addMapLayer(temporary_layer)
+            lines.append(f"{layer_name} : {result['features']} features")
+        for layer_name, error in errors.items():
+            lines.append(f"{layer_name} : {error}")
+            QgsMessageLog.logMessage(f"Construction of {layer_name} failed : {error}", 'AMRUT', Qgis.Warning)
+
+        self.layer_threads.pop(self.all_layers_key, None)
+        self.refresh_layer_construction_tab()
+        message = "\n".join(lines)
+        if errors:
+            self.show_error(f"Some layers could not be constructed :\n{message}")
+        else:
+            self.show_success("Layers", f"Layers successfully re-constructed :\n{message}")
+        for layer_name in results:
+            self.queue_comparison(layer_name)
+
+    def layers_construction_error(self, error):
+        self.layer_threads.pop(self.all_layers_key, None)
+        self.refresh_layer_construction_tab()
+        self.show_error(error)
 
     def get_layer_by_name(self, layer_name):
         """Retrieve a layer from the QGIS project by its name."""
@@ -207,6 +237,7 @@ class ReconstructLayerTabDialog(QDialog):
             self.show_error(data)
 
         self.processing_layer = False
+        self.process_next_comparison()
 
     def refresh_layer_construction_tab(self):
         """Refreshes the Layer Construction Tab to update layer statuses."""
@@ -225,35 +256,94 @@ class ReconstructLayerTabDialog(QDialog):
         self.tabs.setCurrentIndex(layer_reconstruction_tab_index)
 
     """C O N S T R U C T    L A Y E R S"""
+    all_layers_key = "*"  # layer_threads key of the single pass construction of all layers
+
+    def is_layer_busy(self, layer_name):
+        """True while the layer is being constructed, compared or waiting for its comparison."""
+        if layer_name in self.layer_threads or layer_name in self.compare_queue:
+            return True
+        if self.all_layers_key in self.layer_threads:
+            _, worker = self.layer_threads[self.all_layers_key]
+            if layer_name in [builder.layer_name for builder in worker.builders]:
+                return True
+        return self.processing_layer and self.selected_layer_for_processing == layer_name
+
     def construct_layer (self, layer_name) :
-        if not self.processing_layer :
-            self.processing_layer = True
-            self.selected_layer_for_processing = layer_name
-            is_in_temporary_stage = self.is_layer_in_temporary_stage(layer_name)
-            if is_in_temporary_stage :
-                try:
-                    data = process.process_temp_layer(layer_name)
-                    self.compare_changes_result(True, data)
-                except Exception as e:
-                    self.compare_changes_result(False, str(e))
-            else:
-                try :
-                    self.progress_bar.setVisible(True)
-                    self.progress_lable.setText("Constructing Layer...")
-                    self.progress_bar.setRange(0, 0)
-                    self.layer_construction_worker = workers.LayerConstructionWorker(self.data_dir, self.amrut_files,
-                                                                                   layer_name)
-                    self.layer_thread = QThread()
-                    self.layer_construction_worker.moveToThread(self.layer_thread)
-                    self.layer_thread.started.connect(self.layer_construction_worker.run)
-                    self.layer_construction_worker.finished.connect(self.layer_thread.quit)
-                    self.layer_construction_worker.finished.connect(self.layer_construction_worker.deleteLater)
-                    self.layer_thread.finished.connect(self.layer_thread.deleteLater)
-                    self.progress_bar.setVisible(False)
-                    self.layer_construction_worker.result_signal.connect(self.layer_construction_result)
-                    self.layer_thread.start()
-                except Exception as e :
-                    raise Exception (str(e))
+        """Construct a layer in its own worker, several layers can be constructed at the same time."""
+        if self.is_layer_busy(layer_name):
+            return
+        if self.is_layer_in_temporary_stage(layer_name):
+            self.queue_comparison(layer_name)
+            return
+        try:
+            # Everything the builder needs from the project is read here, on the GUI thread
+            builder = construction.LayerBuilder.for_project_layer(layer_name)
+        except Exception as e:
+            self.show_error(str(e))
+            return
+
+        self.progress_bar.setVisible(True)
+        self.progress_lable.setText("Constructing Layer...")
+        self.progress_bar.setRange(0, 0)
+        layer_construction_worker = workers.LayerConstructionWorker(self.data_dir, self.amrut_files, builder)
+        layer_thread = QThread()
+        layer_construction_worker.moveToThread(layer_thread)
+        layer_thread.started.connect(layer_construction_worker.run)
+        layer_construction_worker.finished.connect(layer_thread.quit)
+        layer_construction_worker.finished.connect(layer_construction_worker.deleteLater)
+        layer_thread.finished.connect(layer_thread.deleteLater)
+        layer_construction_worker.result_signal.connect(self.layer_construction_result)
+        self.layer_threads[layer_name] = (layer_thread, layer_construction_worker)
+        layer_thread.start()
+        self.refresh_layer_construction_tab()
+
+    def queue_comparison(self, layer_name):
+        """Comparisons open interactive dialogs, so they run one after the other."""
+        if layer_name not in self.compare_queue:
+            self.compare_queue.append(layer_name)
+        self.process_next_comparison()
+
+    def process_next_comparison(self):
+        if self.processing_layer or not self.compare_queue:
+            return
+        layer_name = self.compare_queue.pop(0)
+        self.processing_layer = True
+        self.selected_layer_for_processing = layer_name
+        self.saved_temp_layer = self.get_layer_by_name(f"Temporary_{layer_name}")
+        self.compare_changes()
+
+    def construct_all_layers(self):
+        """Construct every layer not constructed yet, reading each .amrut file only once."""
+        if self.all_layers_key in self.layer_threads:
+            return
+        pending_layers = [layer_name for layer_name in self.layers_map
+                          if not self.get_layer_status(layer_name) and not self.is_layer_busy(layer_name)]
+        if not pending_layers:
+            self.show_success("Layer", "All layers are already constructed")
+            return
+        try:
+            builders = [construction.LayerBuilder.for_project_layer(layer_name) for layer_name in pending_layers]
+        except Exception as e:
+            self.show_error(str(e))
+            return
+
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_lable.setText(f"Constructing {len(pending_layers)} Layers...")
+        layers_construction_worker = workers.MultiLayerConstructionWorker(self.data_dir, self.amrut_files, builders)
+        layer_thread = QThread()
+        layers_construction_worker.moveToThread(layer_thread)
+        layer_thread.started.connect(layers_construction_worker.run)
+        layers_construction_worker.finished.connect(layer_thread.quit)
+        layers_construction_worker.finished.connect(layers_construction_worker.deleteLater)
+        layer_thread.finished.connect(layer_thread.deleteLater)
+        layers_construction_worker.progress_signal.connect(self.progress_bar.setValue)
+        layers_construction_worker.result_signal.connect(self.layers_construction_result)
+        layers_construction_worker.error_signal.connect(self.layers_construction_error)
+        self.layer_threads[self.all_layers_key] = (layer_thread, layers_construction_worker)
+        layer_thread.start()
+        self.refresh_layer_construction_tab()
 
     def compare_changes(self):
         self.progress_bar.setVisible(True)
@@ -317,6 +407,11 @@ class ReconstructLayerTabDialog(QDialog):
         layers_widget.setLayout(layers_layout)
         layout.addWidget(layers_widget, alignment=Qt.AlignTop)
 
+        construct_all_button = QPushButton("Construct All Layers")
+        construct_all_button.setEnabled(any(not self.get_layer_status(layer) for layer in layers_name))
+        construct_all_button.clicked.connect(self.construct_all_layers)
+        layout.addWidget(construct_all_button, alignment=Qt.AlignTop)
+
         return tab
 
 
@@ -389,6 +484,9 @@ class ReconstructLayerTabDialog(QDialog):
             pixmap = ui.get_warning_icon()
         else:
             pixmap = ui.get_warning_icon()
+        if self.is_layer_busy(layer_name):
+            process_button.setText("Processing...")
+            process_button.setEnabled(False)
        
         status_icon.setPixmap(pixmap)
         process_button.clicked.connect(lambda: self.construct_layer(layer_name))
@@ -15,6 +15,9 @@ from qgis.core import (
 )
 from qgis.gui import QgsMapCanvas, QgsMapToolPan
 from . import import_workers
+from . import import_feature_index as feature_index
+from . import import_review_queue as review_queue
+from . import import_canvas
 import processing
 import random
 import base64
@@ -43,6 +46,11 @@ class ReconstructFeatures:
         
         # Get the temporary layer that was previously saved
         self.saved_temp_layer = self.get_layer_by_name("Temporary_"+selected_layer.name())
+
+        # Index feature_id on both layers, the review looks features up by it throughout
+        for layer in (self.selected_layer_for_processing, self.saved_temp_layer):
+            if layer:
+                feature_index.feature_lookup(layer)
         
         # Log extent information for debugging
         if self.saved_temp_layer:
@@ -55,6 +63,7 @@ class ReconstructFeatures:
         self.selected_raster_layer = selected_raster_layer
         self.data = data 
         self.reprojected_raster_layer = None
+        self.highlighters = {}  # canvas -> FeatureHighlighter of the layer it shows
         
         # Initialize feature index counter for navigation through broken features
         self.current_feature_index = 0
@@ -132,8 +141,14 @@ class ReconstructFeatures:
         Show the main dialog for verifying features in full-screen mode.
         This creates a comprehensive interface with dual map canvases and attribute tables.
         """
+        # Order the features once and read them ahead of the reviewer on a worker thread
+        self.review_queue = review_queue.ReviewQueue(
+            self.selected_layer_for_processing, self.data.keys(), self.feature_extent)
+        self.review_queue.start()
+
         # Create main dialog window
         dialog = QDialog(None)
+        dialog.finished.connect(self.review_queue.close)
         dialog.setWindowTitle("Merge Feature Attribute")
         dialog.setWindowState(Qt.WindowMaximized)  # Set to full-screen/maximized
 
@@ -174,9 +189,10 @@ class ReconstructFeatures:
         self.right_canvas = right_canvas_frame.findChild(QgsMapCanvas)
 
         # Set up canvas synchronization to keep views aligned
-        self.is_synchronizing = False  # Flag to prevent recursive synchronization
-        self.left_canvas.extentsChanged.connect(self.synchronize_right_canvas)
-        self.right_canvas.extentsChanged.connect(self.synchronize_left_canvas)
+        self.canvas_link = import_canvas.LinkedCanvasController([self.left_canvas, self.right_canvas])
+        dialog.finished.connect(self.canvas_link.close)
+        # The reprojected raster only covers this survey area, it is not left in the project
+        dialog.finished.connect(self.remove_reprojected_raster)
         
         # Enable panning tools on both canvases
         self.setup_panning()
@@ -185,6 +201,16 @@ class ReconstructFeatures:
         self.update_canvases()
         dialog.exec_()
 
+    def remove_reprojected_raster(self):
+        """
+        Remove the raster reprojected for this dialog from the project.
+        The file stays in the raster cache for the next sessions.
+        """
+        if self.reprojected_raster_layer and self.reprojected_raster_layer is not self.selected_raster_layer:
+            if QgsProject.instance().mapLayer(self.reprojected_raster_layer.id()):
+                QgsProject.instance().removeMapLayer(self.reprojected_raster_layer.id())
+        self.reprojected_raster_layer = None
+
     def transform_raster_CRS(self, layer, raster_layer):
         """
         Transform raster layer to match the vector layer's CRS using a background worker.
@@ -198,14 +224,14 @@ class ReconstructFeatures:
         self.progress_bar.setRange(0, 0)
         self.progress_bar.show()
         
-        # Check if raster layer exists and if transformation is needed
+        # A reprojected raster left by an earlier session may cover another survey area, it is
+        # replaced. Reprojecting again is cheap when the raster cache already holds the window
+        self.reprojected_raster_layer = None
         if raster_layer:
-            reprojected_raster_layer_name = "Temporary_"+raster_layer.name()
-            print(reprojected_raster_layer_name)
-            self.reprojected_raster_layer = self.get_layer_by_name(reprojected_raster_layer_name)
+            self.remove_layer_by_name("Temporary_"+raster_layer.name())
 
-        # Skip transformation if no raster or already exists
-        if not raster_layer or self.reprojected_raster_layer:
+        # Skip transformation if there is no raster
+        if not raster_layer:
             # Reset progress bar and exit
             self.progress_bar.setRange(0, 100)
             self.progress_bar.setValue(100)
@@ -213,12 +239,19 @@ class ReconstructFeatures:
             self.progress_bar.setVisible(False)
             return
 
-        # Show progress bar and process events
+        # Show progress bar and process events, the worker reports the progress of the warp
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_lable.setText("Reprojecting raster")
         self.progress_bar.show()
         QApplication.processEvents()
 
         # Create worker thread for raster transformation
-        self.worker = import_workers.RasterTransformWorker(layer, raster_layer)
+        # Only the surveyed area is shown on the canvases, the rest of the raster is not reprojected
+        survey_extent = self.saved_temp_layer.extent() if self.saved_temp_layer else None
+        survey_crs = self.saved_temp_layer.crs().authid() if self.saved_temp_layer else None
+        self.worker = import_workers.RasterTransformWorker(layer, raster_layer, survey_extent, survey_crs)
+        worker = self.worker
         self.thread = QThread()
 
         # Move worker to separate thread for non-blocking operation
@@ -239,11 +272,12 @@ class ReconstructFeatures:
                 raster_layer: The transformed raster layer result
             """
             self.reprojected_raster_layer = raster_layer
+            QApplication.instance().aboutToQuit.disconnect(worker.cancel)
             
             # Add transformed layer to project if successful
             if raster_layer:
                 QgsProject.instance().addMapLayer(self.reprojected_raster_layer)
-            else:
+            elif not worker.feedback.isCanceled():
                 QMessageBox.warning(None, "Error", "Raster transformation failed.")
 
             # Reset progress bar and hide it
@@ -261,6 +295,9 @@ class ReconstructFeatures:
         self.worker.finished_signal.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
 
+        # Stop the warp if QGIS is closed while it runs
+        QApplication.instance().aboutToQuit.connect(worker.cancel)
+
         # Start transformation thread
         self.thread.start()
 
@@ -285,7 +322,7 @@ class ReconstructFeatures:
         # Check if there are features to display
         if self.current_feature_index < len(self.data):
             # Get current feature data
-            feature_id = list(self.data.keys())[self.current_feature_index]
+            feature_id = self.review_queue.feature_id(self.current_feature_index)
             broken_features = self.data[feature_id]
 
             if broken_features:
@@ -461,10 +498,6 @@ class ReconstructFeatures:
         Args:
             accepted_feature: The feature that was accepted by the user
         """
-        # Reset layer filters to show all features
-        self.selected_layer_for_processing.setSubsetString("")
-        self.saved_temp_layer.setSubsetString("")
-        
         # Check if review is complete
         if not self.data or self.current_feature_index >= len(self.data):
             QMessageBox.information(None, "Review Complete", "All features have been reviewed.")
@@ -493,9 +526,8 @@ class ReconstructFeatures:
                     attributes[field.name()] = accepted_feature[field.name()]
 
             # Update matching features in saved_temp_layer
+            request = feature_index.feature_lookup(self.saved_temp_layer, feature_id_field_name).request(accepted_feature_id)
             with edit(self.saved_temp_layer):
-                request = QgsFeatureRequest()
-                request.setFilterExpression(f'"{feature_id_field_name}" = \'{accepted_feature_id}\'')
                 for feat in self.saved_temp_layer.getFeatures(request):
                     # Update all non-primary key attributes
                     for key, value in attributes.items():
@@ -560,6 +592,7 @@ class ReconstructFeatures:
                     new_layer = QgsVectorLayer(temp_layer_path, new_layer_name, "ogr")
 
                     if new_layer.isValid():
+                        feature_index.ensure_feature_id_index(new_layer)
                         QgsProject.instance().addMapLayer(new_layer)
                         self.saved_temp_layer = new_layer  # Update reference
                     else:
@@ -569,9 +602,8 @@ class ReconstructFeatures:
                     self.saved_temp_layer.setName(new_layer_name)
                     print("Merged layer is invalid. Only renaming existing layer.")      
 
-                # Final layer name update and filter reset
+                # Final layer name update
                 self.saved_temp_layer.setName(new_layer_name)
-                self.saved_temp_layer.setSubsetString("")
             else:
                 print("saved_temp_layer is None, cannot rename.")
 
@@ -655,13 +687,14 @@ class ReconstructFeatures:
 
         # Create map canvas and configure layers
         canvas = QgsMapCanvas()
+        import_canvas.configure_canvas(canvas)
         
         # Set opacity for better layer visualization
         self.set_colour_opacity(self.saved_temp_layer, 0.6)
         self.set_colour_opacity(self.selected_layer_for_processing, 0.6)
         
-        # Set layers to display (vector layer on top of raster)
-        canvas.setLayers([layer, self.reprojected_raster_layer])
+        # Set layers to display (features under review on top of raster)
+        self.highlighters[canvas] = import_canvas.FeatureHighlighter(canvas, layer, [self.reprojected_raster_layer])
         canvas.setCanvasColor(QColor("white"))  # White background
         canvas.refresh()  # Refresh display
         
@@ -687,28 +720,6 @@ class ReconstructFeatures:
         # Refresh layer display
         layer.triggerRepaint()
 
-    def synchronize_right_canvas(self):
-        """
-        Synchronize the right canvas extent with the left canvas.
-        Prevents infinite loop with synchronization flag.
-        """
-        if not self.is_synchronizing:
-            self.is_synchronizing = True
-            self.right_canvas.setExtent(self.left_canvas.extent())
-            self.right_canvas.refresh()
-            self.is_synchronizing = False
-
-    def synchronize_left_canvas(self):
-        """
-        Synchronize the left canvas extent with the right canvas.
-        Prevents infinite loop with synchronization flag.
-        """
-        if not self.is_synchronizing:
-            self.is_synchronizing = True
-            self.left_canvas.setExtent(self.right_canvas.extent())
-            self.left_canvas.refresh()
-            self.is_synchronizing = False
-
     def setup_panning(self):
         """
         Enable panning tools on both map canvases for user navigation.
@@ -732,40 +743,21 @@ class ReconstructFeatures:
         """
         # Ensure there are still features to process
         if self.current_feature_index < len(self.data):
-            # Get all feature IDs from the data dictionary
-            feature_ids = list(self.data.keys())
-            
-            # Get the current feature ID based on the index
-            feature_id = feature_ids[self.current_feature_index]
-            
-            # Fetch the feature from the selected layer using the feature ID
-            # Uses a filter expression to find the specific feature
-            feature = next(self.selected_layer_for_processing.getFeatures(f"feature_id = {feature_id}"), None)
+            # The feature and its extent are usually prefetched by the review queue
+            item = self.review_queue.item(self.current_feature_index)
+            feature_id = item.feature_id
+            feature = item.features[0] if item.features else None
             
             if feature:
-                # Calculate the geometric center of the feature
-                centroid_geom = feature.geometry().centroid()
-                
-                # Convert the centroid geometry to a point coordinate
-                centroid_point = centroid_geom.asPoint()
-                
-                # Calculate an appropriate buffer size based on the feature's geometry
-                buffer = self.calculate_dynamic_buffer(feature.geometry())
+                extent = item.extent
                 
-                # Create a rectangular extent around the feature's centroid
-                # The extent is expanded by the buffer in all directions
-                extent = QgsRectangle(
-                    centroid_point.x() - buffer,  # Left boundary
-                    centroid_point.y() - buffer,  # Bottom boundary
-                    centroid_point.x() + buffer,  # Right boundary
-                    centroid_point.y() + buffer   # Top boundary
-                )
-                
-                # Zoom the left canvas to show the feature from the processing layer
-                self.zoom_to_feature_on_canvas(extent, self.left_canvas, self.selected_layer_for_processing, feature_id)
-                
-                # Zoom the right canvas to show the feature from the temporary saved layer
-                self.zoom_to_feature_on_canvas(extent, self.right_canvas, self.saved_temp_layer, feature_id)
+                # Both canvases are zoomed here, the canvas link would only redraw them again
+                with self.canvas_link.paused():
+                    # Zoom the left canvas to show the feature from the processing layer
+                    self.zoom_to_feature_on_canvas(extent, self.left_canvas, self.selected_layer_for_processing, feature_id)
+                    
+                    # Zoom the right canvas to show the feature from the temporary saved layer
+                    self.zoom_to_feature_on_canvas(extent, self.right_canvas, self.saved_temp_layer, feature_id)
             else:
                 # Log a warning message if the feature cannot be found in the layer
                 QgsMessageLog.logMessage(
@@ -774,6 +766,32 @@ class ReconstructFeatures:
                     Qgis.Warning
                 )            
 
+    def feature_extent(self, features):
+        """
+        Extent to zoom to for a feature: a square around its centroid sized by calculate_dynamic_buffer.
+        Runs on the review queue's prefetch thread, it only computes geometry.
+        
+        Args:
+            features: The features of the feature_id, the first one is shown
+            
+        Returns:
+            QgsRectangle: The extent to zoom to
+        """
+        # Calculate the geometric center of the feature
+        geometry = features[0].geometry()
+        centroid_point = geometry.centroid().asPoint()
+        
+        # Calculate an appropriate buffer size based on the feature's geometry
+        buffer = self.calculate_dynamic_buffer(geometry)
+        
+        # The extent is expanded by the buffer in all directions
+        return QgsRectangle(
+            centroid_point.x() - buffer,  # Left boundary
+            centroid_point.y() - buffer,  # Bottom boundary
+            centroid_point.x() + buffer,  # Right boundary
+            centroid_point.y() + buffer   # Top boundary
+        )
+
     def zoom_to_feature_on_canvas(self, extent, canvas, layer, feature_id):
         """
         Zoom to the feature's bounding box on the canvas.
@@ -785,9 +803,8 @@ class ReconstructFeatures:
             feature_id: ID of the feature to highlight
         """
         if layer:
-            # Apply a subset filter to display only the specific feature
-            # This hides all other features in the layer
-            layer.setSubsetString(f"feature_id = {feature_id}")
+            # Display only the specific feature, the layer itself is not filtered
+            self.highlighters[canvas].show_feature_ids([feature_id])
         
         # Set the canvas extent to the calculated bounding box
         canvas.setExtent(extent)
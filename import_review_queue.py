@@ -0,0 +1,152 @@
+from qgis.core import QgsVectorLayerFeatureSource
+from PyQt5.QtCore import QThread
+from . import import_feature_index as feature_index
+from . import import_workers
+
+# Features read per prefetch chunk, the first chunk is ready before the reviewer moves on
+PREFETCH_COUNT = 10
+
+
+class ReviewItem:
+    """A feature_id under review: its features, their fids and the extent to zoom to."""
+
+    def __init__(self, feature_id, fids, features, extent):
+        self.feature_id = feature_id
+        self.fids = fids
+        self.features = features
+        self.extent = extent
+
+
+class ReviewQueue:
+    """
+    The feature_ids a reviewer steps through, with their features read ahead of time.
+
+    The order is fixed when the queue is created. start() reads the features and computes the
+    extents of the whole queue on a worker thread, PREFETCH_COUNT feature_ids at a time in queue
+    order, so moving to the next feature usually finds it ready. Items not prefetched yet are
+    read on the spot. Edits of the layer drop the items of the features they touch, those are
+    read again when reached.
+
+    extent_function(features) returns the QgsRectangle to zoom to, it runs on the worker thread
+    and must not touch widgets.
+    """
+
+    def __init__(self, layer, feature_ids, extent_function, prefetch=PREFETCH_COUNT):
+        self.layer = layer
+        self.feature_ids = list(feature_ids)
+        self.extent_function = extent_function
+        self.prefetch = prefetch
+        self.lookup = feature_index.feature_lookup(layer)
+        self.items = {}  # feature_id key -> ReviewItem
+        self.dirty = set()  # Keys edited since their prefetch started
+        self.generation = 0
+        self.thread = None
+        self.worker = None
+        self.layer.featureAdded.connect(self.feature_added)
+        self.layer.featureDeleted.connect(self.feature_changed)
+        self.layer.attributeValueChanged.connect(self.feature_changed)
+        self.layer.geometryChanged.connect(self.feature_changed)
+
+    def __len__(self):
+        return len(self.feature_ids)
+
+    def feature_id(self, index):
+        return self.feature_ids[index]
+
+    def item(self, index):
+        """ReviewItem at index, read now if it was not prefetched."""
+        feature_id = self.feature_ids[index]
+        key = feature_index.feature_id_key(feature_id)
+        item = self.items.get(key)
+        if item is None:
+            features = list(self.layer.getFeatures(self.lookup.request(feature_id)))
+            extent = self.extent_function(features) if features else None
+            item = ReviewItem(feature_id, [feature.id() for feature in features], features, extent)
+            self.items[key] = item
+            self.dirty.discard(key)
+        return item
+
+    def start(self, index=0):
+        """Prefetch the items from index on, on a worker thread."""
+        self.stop()
+        self.generation += 1
+        pending = [feature_id for feature_id in self.feature_ids[index:]
+                   if feature_index.feature_id_key(feature_id) not in self.items]
+        if not pending:
+            return
+        # The fids come from the lookup on this thread, the worker only reads features by fid.
+        # Under a subset string the lookup cannot tell them, the items are then read on demand.
+        if self.layer.subsetString():
+            return
+        entries = [(feature_id, self.lookup.mapped_fids(feature_id)) for feature_id in pending]
+        chunks = [entries[start:start + self.prefetch] for start in range(0, len(entries), self.prefetch)]
+
+        self.thread = QThread()
+        self.worker = import_workers.ReviewPrefetchWorker(
+            QgsVectorLayerFeatureSource(self.layer), chunks, self.extent_function, self.generation)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.result_signal.connect(self.prefetched)
+        self.worker.finished.connect(lambda generation=self.generation: self.prefetch_finished(generation))
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.start()
+
+    def prefetch_finished(self, generation):
+        if generation == self.generation:
+            self.thread = None
+            self.worker = None
+
+    def prefetched(self, generation, items):
+        if generation != self.generation:
+            return
+        for feature_id, fids, features, extent in items:
+            key = feature_index.feature_id_key(feature_id)
+            if key not in self.dirty and key not in self.items:
+                self.items[key] = ReviewItem(feature_id, fids, features, extent)
+
+    def drop(self, key):
+        self.items.pop(key, None)
+        self.dirty.add(key)
+
+    def feature_changed(self, fid, *args):
+        for key, item in list(self.items.items()):
+            if fid in item.fids:
+                self.drop(key)
+        # A prefetch in flight may still carry the old state of the feature
+        if self.worker is not None:
+            for chunk in self.worker.chunks:
+                for feature_id, fids in chunk:
+                    if fid in fids:
+                        self.dirty.add(feature_index.feature_id_key(feature_id))
+
+    def feature_added(self, fid):
+        feature = self.layer.getFeature(fid)
+        if feature.isValid():
+            self.drop(feature_index.feature_id_key(feature[feature_index.FEATURE_ID_FIELD]))
+
+    def stop(self):
+        """Cancel the prefetch, results still queued for this thread are ignored."""
+        self.generation += 1
+        if self.worker is not None:
+            self.worker.cancelled = True
+        if self.thread is not None:
+            try:
+                self.thread.quit()
+                self.thread.wait()
+            except RuntimeError:
+                pass  # Already deleted by deleteLater
+        self.thread = None
+        self.worker = None
+
+    def close(self):
+        self.stop()
+        for signal, slot in ((self.layer.featureAdded, self.feature_added),
+                             (self.layer.featureDeleted, self.feature_changed),
+                             (self.layer.attributeValueChanged, self.feature_changed),
+                             (self.layer.geometryChanged, self.feature_changed)):
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                pass
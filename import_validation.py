@@ -1,6 +1,13 @@
 import os
 import zipfile
 import json
+from concurrent.futures import ThreadPoolExecutor
+from . import import_archive as archive
+
+# Parsed metadata of the archives of a directory, kept in that directory between runs
+INDEX_FILE_NAME = ".amrut_index.json"
+INDEX_VERSION = 1
+MAX_WORKERS = 8
 
 def get_amrut_files(directory):
     """Returns a list of all files in the directory ending with .amrut extension."""
@@ -10,42 +17,116 @@ def get_amrut_files(directory):
     print(f"f Path : {directory}")
     return [f for f in os.listdir(directory) if f.endswith(".amrut")]
 
-def validate_amrut_files(directory):
-    """Returns a Pair of <Boolean and Message/Data>"""
+def load_index(directory):
+    """Archive index of the directory, empty if missing, unreadable or of another version."""
+    index_path = os.path.join(directory, INDEX_FILE_NAME)
+    try:
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        if index.get("version") == INDEX_VERSION:
+            return index.get("archives", {})
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {}
+
+def save_index(directory, archives):
+    """Write the index atomically. The index is only a cache, a read-only directory is not an error."""
+    index_path = os.path.join(directory, INDEX_FILE_NAME)
+    temp_index_path = index_path + ".tmp"
+    try:
+        with open(temp_index_path, "w", encoding="utf-8") as index_file:
+            json.dump({"version": INDEX_VERSION, "archives": archives}, index_file)
+        os.replace(temp_index_path, index_path)
+    except OSError as e:
+        print(f"Could not write archive index {index_path} : {e}")
+
+def read_archive_entry(amrut_path):
+    """Index entry of an archive: its signature and parsed metadata, or the reason it is unreadable."""
+    amrut_file = os.path.basename(amrut_path)
+    entry = {"size": None, "mtime": None, "metadata": None, "error": None}
+    try:
+        # A file removed since the listing is reported like any other unreadable archive
+        entry["size"], entry["mtime"] = archive.archive_signature(amrut_path)
+        # The archive stays in the shared cache, the dialogs opening it next do not read it again
+        amrut_archive = archive.get_archive(amrut_path)
+        # Check if metadata.json exists in the archive
+        if not amrut_archive.has_member(archive.METADATA_FILE_NAME):
+            entry["error"] = f"metadata.json not found in {amrut_file}"
+            return entry
+        entry["metadata"] = amrut_archive.metadata()
+        entry["layers"] = amrut_archive.layer_names()
+    except (zipfile.BadZipFile, ValueError, OSError) as e:
+        entry["error"] = f"{amrut_file} could not be read : {e}"
+    return entry
+
+def validate_entry(amrut_file, entry):
+    """Returns the reason the archive is not ready for reconstruction, or None."""
+    if entry["error"]:
+        return entry["error"]
+
+    metadata = entry["metadata"]
+    # Check qc_status
+    if metadata.get("qc_status") != "verified":
+        return f"{amrut_file} is not verified"
+
+    # Read layers and extract layer names
+    if not metadata.get("layers_qc_completed", []):
+        return f"No completed QC layers found in {amrut_file}"
+    return None
+
+def validate_amrut_files(directory, max_workers=MAX_WORKERS):
+    """
+    Returns a Pair of <Boolean and Message/Data>
+
+    Archives are read in a thread pool and every failure is reported, not only the first one.
+    The parsed metadata is kept in INDEX_FILE_NAME keyed by file name, size and mtime, so
+    archives that did not change since the last validation are not opened again.
+    """
     amrut_files = get_amrut_files(directory)
     print(f"f Files : {amrut_files}")
 
     if len(amrut_files) == 0:
         return False, "No valid AMRUT files found"
 
-    layer_map = {}
-
+    cached_archives = load_index(directory)
+    archives = {}
+    stale_files = []
     for amrut_file in amrut_files:
-        amrut_path = os.path.join(directory, amrut_file)
-        print(f"f Reading File : {amrut_path}")
-        # Open the .amrut file as a ZIP archive
-        with zipfile.ZipFile(amrut_path, 'r') as zip_ref:
-            # Check if metadata.json exists in the archive
-            if "metadata.json" not in zip_ref.namelist():
-                return False, f"metadata.json not found in {amrut_file}"
+        entry = cached_archives.get(amrut_file)
+        try:
+            size, mtime = archive.archive_signature(os.path.join(directory, amrut_file))
+        except OSError:
+            size = mtime = None  # Removed since the listing, read_archive_entry reports it
+        if entry and size is not None and entry.get("size") == size and entry.get("mtime") == mtime:
+            archives[amrut_file] = entry
+        else:
+            stale_files.append(amrut_file)
 
-            # Read metadata.json
-            with zip_ref.open("metadata.json") as metadata_file:
-                metadata = json.load(metadata_file)
+    if stale_files:
+        print(f"f Reading {len(stale_files)} changed file(s), {len(archives)} taken from the index")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(stale_files))) as executor:
+            stale_paths = [os.path.join(directory, amrut_file) for amrut_file in stale_files]
+            for amrut_file, entry in zip(stale_files, executor.map(read_archive_entry, stale_paths)):
+                archives[amrut_file] = entry
 
-                # Check qc_status
-                if metadata.get("qc_status") != "verified":
-                    return False, f"{amrut_file} is not verified"
+    # Entries of removed archives are dropped with the rewrite. Failed reads are not indexed, the
+    # file may still be copied or locked and is read again by the next validation
+    indexed_archives = {amrut_file: entry for amrut_file, entry in archives.items() if not entry["error"]}
+    if indexed_archives != cached_archives:
+        save_index(directory, indexed_archives)
 
-                # Read layers and extract layer names
-                layers_qc_completed = metadata.get("layers_qc_completed", [])
-
-                if not layers_qc_completed:
-                    return False, f"No completed QC layers found in {amrut_file}"
-
-                # Store completed layers in the map
-                for layer_name in layers_qc_completed:
-                    layer_map[layer_name] = "Processed"
+    layer_map = {}
+    errors = []
+    for amrut_file in sorted(amrut_files):
+        error = validate_entry(amrut_file, archives[amrut_file])
+        if error:
+            errors.append(error)
+            continue
+        # Store completed layers in the map
+        for layer_name in archives[amrut_file]["metadata"]["layers_qc_completed"]:
+            layer_map[layer_name] = "Processed"
 
+    if errors:
+        return False, f"{len(errors)} of {len(amrut_files)} AMRUT files are not valid :\n" + "\n".join(errors)
 
     return True, (amrut_files, layer_map)  # Successfully validated, return layer map
@@ -1,11 +1,13 @@
 from qgis.core import QgsMessageLog, Qgis
 from qgis.core import QgsVectorLayer
-from PyQt5.QtCore import QRunnable, QThreadPool, pyqtSignal, QObject, QThread
+from PyQt5.QtCore import QRunnable, QThreadPool, pyqtSignal, QObject, QCoreApplication
 from . import import_validation as validation
 from . import import_construct_layer as construction
 from . import import_process_layer as process
+from . import import_raster_cache as raster_cache
+from . import import_archive as archive
 from qgis.core import (
-    QgsProcessingFeedback, QgsProcessingContext, QgsRasterLayer
+    QgsProcessingFeedback, QgsProcessingContext, QgsRasterLayer, QgsFeatureRequest
 )
 import processing
 
@@ -32,25 +34,49 @@ class AmrutFilesValidationWorker(QObject) :
 
 
 class LayerConstructionWorker (QObject) :
-    result_signal = pyqtSignal(bool, str)
+    result_signal = pyqtSignal(str, bool, str)  # Layer name, success, saved path or error
     finished = pyqtSignal()
 
-    def __init__(self, directory,amrut_files,layer_name) :
+    def __init__(self, directory,amrut_files,builder) :
         super().__init__()
         self.amrut_files = amrut_files
-        self.layer_name = layer_name
+        self.builder = builder
+        self.layer_name = builder.layer_name
         self.directory = directory
     def run(self):
         try :
-            layer_construction_result = construction.construct_layer(self.directory,self.amrut_files, self.layer_name)
+            layer_construction_result = construction.construct_layer(self.directory,self.amrut_files, self.builder)
             print(f"Layer Reconstruction_result : {layer_construction_result}")
             if layer_construction_result[0] :
-                self.result_signal.emit(True, layer_construction_result[1])
+                self.result_signal.emit(self.layer_name, True, layer_construction_result[1])
             else :
-                self.result_signal.emit(False, layer_construction_result[1])
+                self.result_signal.emit(self.layer_name, False, layer_construction_result[1])
             self.finished.emit()
         except Exception as e :
-            self.result_signal.emit(False, str(e))
+            self.result_signal.emit(self.layer_name, False, str(e))
+            self.finished.emit()
+
+class MultiLayerConstructionWorker(QObject):
+    """Constructs all the given layers in a single pass over the .amrut files."""
+    result_signal = pyqtSignal(object, object)  # {layer: {"path", "features"}}, {layer: error}
+    progress_signal = pyqtSignal(int)
+    error_signal = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, directory, amrut_files, builders):
+        super().__init__()
+        self.directory = directory
+        self.amrut_files = amrut_files
+        self.builders = builders
+
+    def run(self):
+        try:
+            results, errors = construction.construct_layers(self.directory, self.amrut_files, self.builders,
+                                                            progress_callback=self.progress_signal.emit)
+            self.result_signal.emit(results, errors)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+        finally:
             self.finished.emit()
 
 class CompareChangesWorker(QObject):
@@ -72,39 +98,36 @@ class CompareChangesWorker(QObject):
 
 class RasterTransformWorker(QObject):
     progress_signal = pyqtSignal(int)  # Emit progress percentage
-    finished_signal = pyqtSignal(object)  # Emit when transformation is done
+    finished_signal = pyqtSignal(object)  # Emit when transformation is done, None if it failed or was cancelled
 
-    def __init__(self, layer, raster_layer):
+    def __init__(self, layer, raster_layer, extent=None, extent_crs=None):
         super().__init__()
         self.layer = layer
         self.raster_layer = raster_layer
+        self.extent = extent  # Only this area of the raster is reprojected, all of it without one
+        self.extent_crs = extent_crs
+        # Reports the progress of the warp, doubles as the cancellation token
+        self.feedback = QgsProcessingFeedback()
+        self.feedback.progressChanged.connect(lambda progress: self.progress_signal.emit(int(progress)))
+
+    def cancel(self):
+        """Request cancellation, called directly from the GUI thread since run() blocks the worker thread."""
+        self.feedback.cancel()
 
     def run(self):
         """ Perform raster transformation and emit progress updates """
         try:
             processing_context = QgsProcessingContext()
-            feedback = QgsProcessingFeedback()
-
-            # Define parameters for transformation
-            reproject_params = {
-                'INPUT': self.raster_layer.source(),
-                'SOURCE_CRS': self.raster_layer.crs().authid(),
-                'TARGET_CRS': self.layer.crs().authid(),
-                'RESAMPLING': 0,
-                'NODATA': 0,
-                'OUTPUT': 'TEMPORARY_OUTPUT'
-            }
+            self.progress_signal.emit(0)
 
-            # Simulate progress update (since processing.run is blocking)
-            for progress in range(0, 101, 20):  # Simulated steps
-                self.progress_signal.emit(progress)
-                QThread.msleep(500)  # Simulate work being done
-
-            # Run the transformation
-            transform_result = processing.run("gdal:warpreproject", reproject_params, context=processing_context, feedback=feedback)
+            # Run the transformation, or reuse the raster reprojected by an earlier QC session
+            reprojected_path = raster_cache.reproject(
+                self.raster_layer.source(), self.raster_layer.crs().authid(), self.layer.crs().authid(),
+                resampling=0, nodata=0, context=processing_context, feedback=self.feedback,
+                extent=self.extent, extent_crs=self.extent_crs)
 
             # Create and validate the transformed raster layer
-            reprojected_raster = QgsRasterLayer(transform_result['OUTPUT'], f"Temporary_{self.raster_layer.name()}")
+            reprojected_raster = QgsRasterLayer(reprojected_path, f"Temporary_{self.raster_layer.name()}")
             if not reprojected_raster.isValid():
                 raise ValueError("Raster transformation failed.")
 
@@ -113,13 +136,137 @@ class RasterTransformWorker(QObject):
             self.finished_signal.emit(reprojected_raster)
 
         except Exception as e:
-            print(f"Raster Transformation Error: {e}")
+            # gdal:warpreproject may also fail with its own error once gdalwarp is stopped
+            if isinstance(e, raster_cache.ReprojectionCancelled) or self.feedback.isCanceled():
+                QgsMessageLog.logMessage("Raster transformation cancelled", 'AMRUT', Qgis.Info)
+            else:
+                print(f"Raster Transformation Error: {e}")
             self.finished_signal.emit(None)
 
 
+class QCDataWorker(QObject):
+    """
+    Prepares the data of the QC visualization dialog off the GUI thread: the field layer of the
+    archive, loaded into a memory layer in the CRS of the original layer, and the raster
+    reprojected to that CRS around the grid cell.
+    """
+    ready_signal = pyqtSignal(object, object)  # Field layer or None, reprojected raster path or None
+    finished = pyqtSignal()
 
+    def __init__(self, amrut_file_path, layer_name, target_crs, raster_source=None, raster_crs=None,
+                 raster_extent=None, raster_extent_crs=None):
+        super().__init__()
+        self.amrut_file_path = amrut_file_path
+        self.layer_name = layer_name
+        self.target_crs = target_crs  # QgsCoordinateReferenceSystem of the original layer, or None
+        self.raster_source = raster_source  # Only set when the raster has to be reprojected
+        self.raster_crs = raster_crs
+        self.raster_extent = raster_extent
+        self.raster_extent_crs = raster_extent_crs
+        # Shared with every processing.run call, doubles as the cancellation token
+        self.feedback = QgsProcessingFeedback()
 
+    def cancel(self):
+        """Request cancellation, called directly from the GUI thread since run() blocks the worker thread."""
+        self.feedback.cancel()
 
+    def run(self):
+        field_layer = None
+        raster_path = None
+        try:
+            field_layer = self.load_field_layer()
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error loading GeoJSON: {str(e)}", 'AMRUT', Qgis.Critical)
+
+        if self.raster_source and not self.feedback.isCanceled():
+            try:
+                # Nearest neighbour with -9999 as no data, the grid cell and its surroundings only
+                raster_path = raster_cache.reproject(
+                    self.raster_source, self.raster_crs, self.target_crs.authid(),
+                    resampling=0, nodata=-9999, context=QgsProcessingContext(), feedback=self.feedback,
+                    extent=self.raster_extent, extent_crs=self.raster_extent_crs)
+            except Exception as e:
+                if not self.feedback.isCanceled():
+                    QgsMessageLog.logMessage(f"Error reprojecting raster: {str(e)}", 'AMRUT', Qgis.Warning)
+
+        self.ready_signal.emit(field_layer, raster_path)
+        self.finished.emit()
+
+    def load_field_layer(self):
+        """
+        Field data of the archive in an editable memory layer, None if it is missing or invalid.
+
+        The member is read in place through GDAL's /vsizip/, no temporary file is written.
+        """
+        geojson_filename = f"{self.layer_name}.geojson"
+
+        # Check if GeoJSON file exists in archive, the listing is shared with the import dialog
+        if not archive.get_archive(self.amrut_file_path).has_member(geojson_filename):
+            QgsMessageLog.logMessage(f"[DEBUG] GeoJSON file {geojson_filename} not found in AMRUT archive", 'AMRUT', Qgis.Warning)
+            return None
+
+        geojson_layer = archive.open_archive_layer(self.amrut_file_path, geojson_filename, self.layer_name)
+        if not geojson_layer.isValid():
+            QgsMessageLog.logMessage(f"[DEBUG] GeoJSON layer invalid, error: {geojson_layer.error().message()}", 'AMRUT', Qgis.Critical)
+            return None
+
+        # Set CRS if undefined, using original layer's CRS
+        if not geojson_layer.crs().isValid() and self.target_crs:
+            geojson_layer.setCrs(self.target_crs)
+            geojson_layer.updateExtents()
+
+        # The verification edits the field data, so it is loaded into a memory layer
+        if self.target_crs and geojson_layer.crs() != self.target_crs:
+            reproject_params = {
+                'INPUT': geojson_layer,
+                'TARGET_CRS': self.target_crs.authid(),
+                'OUTPUT': 'memory:'
+            }
+            result = processing.run("native:reprojectlayer", reproject_params, context=QgsProcessingContext(), feedback=self.feedback)
+            geojson_layer = result['OUTPUT']
+        else:
+            geojson_layer = geojson_layer.materialize(QgsFeatureRequest())
+        geojson_layer.setName(f"Temporary_{self.layer_name}")
+        geojson_layer.updateExtents()
+
+        QgsMessageLog.logMessage(
+            f"GeoJSON valid: {geojson_layer.isValid()}, CRS: {geojson_layer.crs().authid()}, "
+            f"Extent: {geojson_layer.extent().toString()}, Features: {geojson_layer.featureCount()}",
+            'AMRUT', Qgis.Info
+        )
+
+        # Created on this thread, the dialog adds it to the project on the GUI thread
+        geojson_layer.moveToThread(QCoreApplication.instance().thread())
+        return geojson_layer
 
 
+class ReviewPrefetchWorker(QObject):
+    """Reads the features of a review queue ahead of the reviewer, chunk by chunk in queue order."""
+    result_signal = pyqtSignal(int, object)  # Generation, [(feature_id, fids, features, extent)]
+    finished = pyqtSignal()
+
+    def __init__(self, source, chunks, extent_function, generation):
+        super().__init__()
+        self.source = source  # QgsVectorLayerFeatureSource, safe to read from this thread
+        self.chunks = chunks  # Lists of (feature_id, fids)
+        self.extent_function = extent_function
+        self.generation = generation
+        self.cancelled = False
 
+    def run(self):
+        try:
+            for chunk in self.chunks:
+                if self.cancelled:
+                    break
+                request = QgsFeatureRequest().setFilterFids([fid for _, fids in chunk for fid in fids])
+                features_by_fid = {feature.id(): feature for feature in self.source.getFeatures(request)}
+                items = []
+                for feature_id, fids in chunk:
+                    features = [features_by_fid[fid] for fid in fids if fid in features_by_fid]
+                    extent = self.extent_function(features) if features else None
+                    items.append((feature_id, fids, features, extent))
+                self.result_signal.emit(self.generation, items)
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error prefetching review features: {str(e)}", 'AMRUT', Qgis.Warning)
+        finally:
+            self.finished.emit()
@@ -87,10 +87,19 @@ class ClipMergeExportTabDialog(QDialog):
         self.next_button.clicked.connect(self.navigate_next)
         self.navigation_layout.addWidget(self.next_button)
 
+        # Only shown while the export is running
+        self.cancel_button = QPushButton("Cancel Export")
+        self.cancel_button.clicked.connect(self.cancel_clipping)
+        self.cancel_button.setVisible(False)
+        self.navigation_layout.addWidget(self.cancel_button)
+
         layout.addLayout(self.navigation_layout)
 
     def closeEvent(self, event):
         """Handle cleanup on dialog close."""
+        # Ask a running export to stop, it gives up at the end of the current stage
+        self.cancel_clipping()
+
         # Stop all running threads
         if hasattr(self, 'thread') and self.thread:
             if not sip.isdeleted(self.thread):  # Check if the thread is already deleted
@@ -261,6 +270,11 @@ class ClipMergeExportTabDialog(QDialog):
         self.output_dir_button.clicked.connect(self.select_output_directory)
         layout.addWidget(self.output_dir_button,  alignment=Qt.AlignTop)
 
+        # Keep going when a single grid cell fails, failures are summarised at the end
+        self.continue_on_error_checkbox = QCheckBox("Continue export when a grid cell fails")
+        self.continue_on_error_checkbox.setChecked(True)
+        layout.addWidget(self.continue_on_error_checkbox, alignment=Qt.AlignTop)
+
         return tab
 
     def select_output_directory(self):
@@ -282,12 +296,14 @@ class ClipMergeExportTabDialog(QDialog):
                     global gridLayer
                     self.progress_lable.setText("Clipping...Please Wait")
                     self.progress_bar.setValue(0)
-                    self.progress_bar.setMaximum(gridLayer.featureCount() -2)
+                    self.progress_bar.setRange(0, 100)  # Progress is reported in percent of the whole run
                      # Disable navigation buttons
                     self.next_button.setEnabled(False)
                     self.back_button.setEnabled(False)
                     self.thread = QThread()
-                    self.clipWorker = workers.ClippingWorker(gridLayer, selectedLayers, self.output_dir)
+                    self.clip_failures = []
+                    self.clipWorker = workers.ClippingWorker(gridLayer, selectedLayers, self.output_dir,
+                                                             continue_on_error=self.continue_on_error_checkbox.isChecked())
                     self.clipWorker.moveToThread(self.thread)
                     self.thread.started.connect(self.clipWorker.run)
                     self.clipWorker.finished.connect(self.thread.quit)
@@ -295,6 +311,11 @@ class ClipMergeExportTabDialog(QDialog):
                     self.thread.finished.connect(self.thread.deleteLater)
                     self.clipWorker.success_signal.connect(self.handle_clip_success)
                     self.clipWorker.progress_signal.connect(self.update_clipping_progress)
+                    self.clipWorker.failure_signal.connect(self.handle_clip_failure)
+                    self.clipWorker.failures_signal.connect(self.handle_clip_failures)
+                    self.clipWorker.cancelled_signal.connect(self.handle_clip_cancelled)
+                    self.cancel_button.setEnabled(True)
+                    self.cancel_button.setVisible(True)
                     self.clipWorker.error_signal.connect(self.show_error)
                     self.thread.start()
             else:
@@ -395,6 +416,7 @@ class ClipMergeExportTabDialog(QDialog):
                 self.next_button.setText("Run")
     
     def show_error (self, error):
+        self.cancel_button.setVisible(False)
         self.back_button.setEnabled(True)
         self.next_button.setEnabled(True)
         self.progress_bar.setRange(0, 100)  # Reset progress bar range
@@ -465,13 +487,46 @@ class ClipMergeExportTabDialog(QDialog):
         return None  
     
     def handle_clip_success(self, success):
+        self.cancel_button.setVisible(False)
         if success:
             self.progress_lable.setText("Clipping completed")
-            QMessageBox.information(self, "Clipping", "Clipping completed")
+            if self.clip_failures:
+                QMessageBox.warning(self, "Clipping", "Clipping completed with errors.\n\n" + clip.summarise_failures(self.clip_failures))
+            else:
+                QMessageBox.information(self, "Clipping", "Clipping completed")
             self.close()  # Close the main dialog
+
+    def cancel_clipping(self):
+        """Cooperatively cancel a running export."""
+        if hasattr(self, 'clipWorker') and self.clipWorker and not sip.isdeleted(self.clipWorker):
+            self.clipWorker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.progress_lable.setText("Cancelling...")
+
+    def handle_clip_cancelled(self):
+        self.cancel_button.setVisible(False)
+        self.progress_bar.setVisible(False)
+        self.progress_lable.setText("Clipping cancelled")
+        self.next_button.setEnabled(True)
+        self.back_button.setEnabled(True)
+        if self.isVisible():
+            QMessageBox.information(self, "Clipping", "Export cancelled. Grid cells completed so far are kept in the 'Grid Output' directory.")
+
+    def handle_clip_failure(self, failure):
+        """Keep the export running and show the number of failed cells so far."""
+        self.clip_failures.append(failure)
+        self.progress_lable.setText(f"Clipping...Please Wait ({len(self.clip_failures)} failure(s) so far)")
+
+    def handle_clip_failures(self, failures):
+        self.clip_failures = list(failures)
     
-    def update_clipping_progress (self, progress) :
+    def update_clipping_progress (self, progress, message) :
         self.progress_bar.setValue(progress)
+        if not self.cancel_button.isEnabled():
+            return  # Keep the "Cancelling..." text
+        if self.clip_failures:
+            message += f" ({len(self.clip_failures)} failure(s) so far)"
+        self.progress_lable.setText(message)
 
     class CustomTabBar(QTabBar):
         def mousePressEvent(self, event):
@@ -1,15 +1,14 @@
 from PyQt5.QtWidgets import QDialog, QHBoxLayout, QVBoxLayout, QLabel
-from PyQt5.QtCore import Qt, QTimer
-from qgis.core import QgsProject, QgsVectorLayer, QgsCoordinateTransform, QgsRasterLayer, QgsProcessingFeedback, QgsProcessingContext, QgsMessageLog, Qgis, QgsPointXY
+from PyQt5.QtCore import Qt, QThread
+from qgis.core import QgsProject, QgsVectorLayer, QgsCoordinateTransform, QgsRasterLayer, QgsProcessingFeedback, QgsProcessingContext, QgsMessageLog, Qgis, QgsPointXY, QgsFeatureRequest
 from qgis.gui import QgsMapCanvas, QgsMapToolPan
 from PyQt5.QtGui import QColor
 from . import verification_dialog
+from . import import_canvas
+from . import import_workers
 from qgis.core import QgsCoordinateReferenceSystem
 
-import zipfile
-import tempfile
 import os
-import processing
 
 class QualityCheckVisualizationDialog(QDialog):
     """
@@ -22,7 +21,7 @@ class QualityCheckVisualizationDialog(QDialog):
     Features include synchronized map navigation, raster layer support, and automatic cleanup.
     """
     
-    def __init__(self, parent, selected_layer_name, amrut_file_path, selected_raster_layer_name, grid_extent):
+    def __init__(self, parent, selected_layer_name, amrut_file_path, selected_raster_layer_name, grid_extent, qc_session=None):
         """
         Initialize the Quality Check Visualization Dialog.
         
@@ -32,6 +31,7 @@ class QualityCheckVisualizationDialog(QDialog):
             amrut_file_path (str): Path to the AMRUT file containing field data
             selected_raster_layer_name (str): Name of the background raster layer
             grid_extent: Spatial extent for the visualization
+            qc_session: QC session of the file the verification decisions are recorded on
         """
         super().__init__(parent)
         
@@ -40,6 +40,7 @@ class QualityCheckVisualizationDialog(QDialog):
         self.amrut_file_path = amrut_file_path
         self.selected_raster_layer_name = selected_raster_layer_name
         self.grid_extent = grid_extent
+        self.qc_session = qc_session
         
         # Initialize tracking variables
         self.temporary_files = []  # List to track temporary files for cleanup
@@ -52,50 +53,109 @@ class QualityCheckVisualizationDialog(QDialog):
         # Initialize map canvas attributes
         self.left_canvas = None   # Canvas for original data
         self.right_canvas = None  # Canvas for field data
-        self.synchronizing = False  # Prevent infinite synchronization loops
 
         # Create main horizontal layout for side-by-side panels
-        layout = QHBoxLayout(self)
+        self.panels_layout = QHBoxLayout(self)
 
         # Retrieve layers from QGIS project
-        layer = self.get_layer_by_name(self.selected_layer_name)
-        raster_layer = self.get_layer_by_name(self.selected_raster_layer_name) if self.selected_raster_layer_name else None
+        self.layer = self.get_layer_by_name(self.selected_layer_name)
+        self.raster_layer = self.get_layer_by_name(self.selected_raster_layer_name) if self.selected_raster_layer_name else None
 
         # DEBUG: Log layer information for troubleshooting
-        if layer:
-            QgsMessageLog.logMessage(f"[DEBUG] Original layer found: {layer.name()}, Valid: {layer.isValid()}, Features: {layer.featureCount()}", 'AMRUT', Qgis.Info)
+        if self.layer:
+            QgsMessageLog.logMessage(f"[DEBUG] Original layer found: {self.layer.name()}, Valid: {self.layer.isValid()}, Features: {self.layer.featureCount()}", 'AMRUT', Qgis.Info)
         else:
             QgsMessageLog.logMessage(f"[DEBUG] Original layer '{self.selected_layer_name}' not found", 'AMRUT', Qgis.Warning)
 
-        if raster_layer:
-            QgsMessageLog.logMessage(f"[DEBUG] Raster layer found: {raster_layer.name()}, Valid: {raster_layer.isValid()}", 'AMRUT', Qgis.Info)
+        if self.raster_layer:
+            QgsMessageLog.logMessage(f"[DEBUG] Raster layer found: {self.raster_layer.name()}, Valid: {self.raster_layer.isValid()}", 'AMRUT', Qgis.Info)
+
+        # The panels are built once the field data and the raster are ready
+        self.loading_label = QLabel("Loading layers...")
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        self.panels_layout.addWidget(self.loading_label)
+        self.canvas_link = None
+        self.closing = False
+        self.finished.connect(self.stop_loading)
+        self.start_loading()
+
+    def start_loading(self):
+        """
+        Load the field data of the archive and reproject the raster on a worker thread.
+
+        The dialog is shown right away, data_ready() builds the panels and starts the verification
+        as soon as the data is there, however long that takes.
+        """
+        target_crs = self.layer.crs() if self.layer else None
+        raster_source = raster_crs = None
+        if self.raster_to_reproject(self.layer, self.raster_layer):
+            raster_source = self.raster_layer.source()
+            raster_crs = self.raster_layer.crs().authid()
+
+        self.data_thread = QThread()
+        self.data_worker = import_workers.QCDataWorker(
+            self.amrut_file_path, self.selected_layer_name, target_crs,
+            raster_source, raster_crs, self.grid_extent, "EPSG:4326")
+        self.data_worker.moveToThread(self.data_thread)
+        self.data_thread.started.connect(self.data_worker.run)
+        self.data_worker.ready_signal.connect(self.data_ready)
+        self.data_worker.finished.connect(self.data_thread.quit)
+        self.data_worker.finished.connect(self.data_worker.deleteLater)
+        self.data_thread.finished.connect(self.data_thread.deleteLater)
+        self.data_thread.start()
+
+    def stop_loading(self):
+        """Cancel the loading when the dialog is closed before the data is ready."""
+        self.closing = True
+        try:
+            self.data_worker.cancel()
+        except RuntimeError:
+            pass  # Worker already deleted, the loading is over
+
+    def data_ready(self, geojson_layer, reprojected_raster_path):
+        """
+        Build both panels from the loaded data and open the verification flow.
+
+        Args:
+            geojson_layer: Field data of the archive in a memory layer, None if it could not be loaded
+            reprojected_raster_path: Raster reprojected to the CRS of the layer, None if it was not needed or failed
+        """
+        if self.closing:
+            return
+
+        if reprojected_raster_path:
+            self.add_reprojected_raster(self.raster_layer, reprojected_raster_path)
+        elif self.raster_layer and self.reprojected_raster_layer is None:
+            self.reprojected_raster_layer = self.raster_layer  # Fallback to original
+
+        self.panels_layout.removeWidget(self.loading_label)
+        self.loading_label.deleteLater()
 
         # Create left panel (original data)
-        if layer:
-            left_panel, self.left_canvas = self.create_layer_visualization_panel(layer, f"{self.selected_layer_name} (Original Data)", raster_layer)
+        if self.layer:
+            left_panel, self.left_canvas = self.create_layer_visualization_panel(self.layer, f"{self.selected_layer_name} (Original Data)", self.raster_layer)
         else:
             left_panel, self.left_canvas = self.create_error_panel(f"Layer '{self.selected_layer_name}' not found in the project."), None
-        layout.addLayout(left_panel)
+        self.panels_layout.addLayout(left_panel)
 
         # Add visual separator between panels
-        self.add_vertical_divider(layout)
+        self.add_vertical_divider(self.panels_layout)
 
         # Create right panel (field data from AMRUT file)
-        right_panel, self.right_canvas = self.create_geojson_visualization_panel(raster_layer)
-        layout.addLayout(right_panel)
+        right_panel, self.right_canvas = self.create_geojson_visualization_panel(geojson_layer, self.raster_layer)
+        self.panels_layout.addLayout(right_panel)
 
         # Set up synchronized navigation between both map canvases
-        self.is_synchronizing = False  # Flag to avoid recursive synchronization
         if self.left_canvas and self.right_canvas:
-            # Connect extent change signals for synchronization
-            self.left_canvas.extentsChanged.connect(self.synchronize_right_canvas)
-            self.right_canvas.extentsChanged.connect(self.synchronize_left_canvas)
+            # Extent changes are applied to the other canvas once they settle
+            self.canvas_link = import_canvas.LinkedCanvasController([self.left_canvas, self.right_canvas])
+            self.finished.connect(self.canvas_link.close)
 
         # Enable panning tools for both canvases
         self.setup_panning()
 
-        # Delay the feature verification dialog to ensure UI is fully loaded
-        QTimer.singleShot(2000, lambda: self.show_new_feature_dialog(layer))
+        # The layers are in the project, the verification can start
+        self.show_new_feature_dialog(self.layer)
 
     def show_new_feature_dialog(self, layer):
         """
@@ -111,7 +171,8 @@ class QualityCheckVisualizationDialog(QDialog):
                     self.selected_layer_name, 
                     self.selected_raster_layer_name, 
                     self.amrut_file_path, 
-                    self.grid_extent
+                    self.grid_extent,
+                    self.qc_session
                 )
                 newFeatureFound.check_for_new_features()
                 
@@ -141,28 +202,6 @@ class QualityCheckVisualizationDialog(QDialog):
         except Exception as e:
             QgsMessageLog.logMessage(f"Error in show_new_feature_dialog: {str(e)}", 'AMRUT', Qgis.Critical)
 
-    def synchronize_right_canvas(self):
-        """
-        Synchronize the right canvas extent with the left canvas.
-        Prevents infinite recursion using synchronization flag.
-        """
-        if not self.is_synchronizing and self.right_canvas:  # Check if right_canvas exists
-            self.is_synchronizing = True  # Mark synchronization in progress
-            self.right_canvas.setExtent(self.left_canvas.extent())  # Match extents
-            self.right_canvas.refresh()  # Refresh display
-            self.is_synchronizing = False  # Reset synchronization flag
-
-    def synchronize_left_canvas(self):
-        """
-        Synchronize the left canvas extent with the right canvas.
-        Prevents infinite recursion using synchronization flag.
-        """
-        if not self.is_synchronizing and self.left_canvas:  # Check if left_canvas exists
-            self.is_synchronizing = True  # Mark synchronization in progress
-            self.left_canvas.setExtent(self.right_canvas.extent())  # Match extents
-            self.left_canvas.refresh()  # Refresh display
-            self.is_synchronizing = False  # Reset synchronization flag
-
     def setup_panning(self):
         """
         Enable panning tools on both map canvases for user navigation.
@@ -181,11 +220,12 @@ class QualityCheckVisualizationDialog(QDialog):
         except Exception as e:
             QgsMessageLog.logMessage(f"Error in setup_panning: {str(e)}", 'AMRUT', Qgis.Critical)
 
-    def create_geojson_visualization_panel(self, raster_layer):
+    def create_geojson_visualization_panel(self, geojson_layer, raster_layer):
         """
         Create a visualization panel for GeoJSON data extracted from the AMRUT file.
         
         Args:
+            geojson_layer: Field data loaded from the AMRUT file by the QCDataWorker, or None
             raster_layer: Background raster layer for context
             
         Returns:
@@ -194,9 +234,6 @@ class QualityCheckVisualizationDialog(QDialog):
         try:
             panel_layout = QVBoxLayout()
 
-            # Extract and load GeoJSON from AMRUT file
-            geojson_layer = self.load_geojson_from_amrut(self.amrut_file_path, self.selected_layer_name)
-
             if geojson_layer and geojson_layer.isValid():
                 # Create unique temporary layer name
                 temporary_layer_name = f"Temporary_{self.selected_layer_name}"
@@ -231,87 +268,6 @@ class QualityCheckVisualizationDialog(QDialog):
             panel_layout = self.create_error_panel(f"Error loading GeoJSON: {str(e)}")
             return panel_layout, None
 
-    def load_geojson_from_amrut(self, amrut_file_path, layer_name):
-        """
-        Extract and load GeoJSON data from an AMRUT archive file.
-        
-        Args:
-            amrut_file_path (str): Path to the AMRUT zip file
-            layer_name (str): Name of the layer to extract
-            
-        Returns:
-            QgsVectorLayer: Loaded GeoJSON layer or None if failed
-        """
-        try:
-            # Open AMRUT file as zip archive
-            with zipfile.ZipFile(amrut_file_path, 'r') as zip_ref:
-                geojson_filename = f"{layer_name}.geojson"
-
-                # Check if GeoJSON file exists in archive
-                if geojson_filename in zip_ref.namelist():
-                    # Extract GeoJSON content as text
-                    geojson_content = zip_ref.read(geojson_filename).decode('utf-8')
-
-                    # Create temporary file for GeoJSON data
-                    temp_dir = tempfile.gettempdir()
-                    temp_geojson_file_path = os.path.join(temp_dir, f"Temporary_{geojson_filename}")
-
-                    # Write GeoJSON content to temporary file
-                    with open(temp_geojson_file_path, 'w', encoding='utf-8') as temp_geojson_file:
-                        temp_geojson_file.write(geojson_content)
-
-                    # Track temporary file for cleanup
-                    self.temporary_files.append(temp_geojson_file_path)
-                    
-                    # Load GeoJSON as vector layer
-                    geojson_layer = QgsVectorLayer(temp_geojson_file_path, layer_name, "ogr")
-                    if not geojson_layer.isValid():
-                        QgsMessageLog.logMessage(f"[DEBUG] GeoJSON layer invalid, error: {geojson_layer.error().message()}", 'AMRUT', Qgis.Critical)
-                        return None
-
-                    # Get original layer for CRS reference
-                    original_layer = self.get_layer_by_name(self.selected_layer_name)
-                    
-                    # Set CRS if undefined, using original layer's CRS
-                    if not geojson_layer.crs().isValid() and original_layer:
-                        geojson_layer.setCrs(original_layer.crs())
-                        geojson_layer.updateExtents()
-
-                    # Reproject GeoJSON layer if CRS doesn't match original
-                    if original_layer and geojson_layer.crs() != original_layer.crs():
-                        # Set up processing context for reprojection
-                        processing_context = QgsProcessingContext()
-                        feedback = QgsProcessingFeedback()
-                        
-                        # Configure reprojection parameters
-                        reproject_params = {
-                            'INPUT': geojson_layer,
-                            'TARGET_CRS': original_layer.crs().authid(),
-                            'OUTPUT': 'memory:'
-                        }
-                        
-                        # Execute reprojection
-                        result = processing.run("native:reprojectlayer", reproject_params, context=processing_context, feedback=feedback)
-                        geojson_layer = result['OUTPUT']
-                        geojson_layer.setName(f"Temporary_{layer_name}")
-                        geojson_layer.updateExtents()
-
-                    # Log layer information for debugging
-                    QgsMessageLog.logMessage(
-                        f"GeoJSON valid: {geojson_layer.isValid()}, CRS: {geojson_layer.crs().authid()}, "
-                        f"Extent: {geojson_layer.extent().toString()}, Features: {geojson_layer.featureCount()}",
-                        'AMRUT', Qgis.Info
-                    )
-
-                    return geojson_layer
-                else:
-                    QgsMessageLog.logMessage(f"[DEBUG] GeoJSON file {geojson_filename} not found in AMRUT archive", 'AMRUT', Qgis.Warning)
-                    return None
-            
-        except Exception as e:
-            QgsMessageLog.logMessage(f"Error loading GeoJSON: {str(e)}", 'AMRUT', Qgis.Critical)
-            return None
-
     def get_layer_by_name(self, layer_name):
         """
         Retrieve a layer from the current QGIS project by its name.
@@ -377,10 +333,6 @@ class QualityCheckVisualizationDialog(QDialog):
             label.setStyleSheet("font-size: 12px; font-weight: bold;")
             panel_layout.addWidget(label)
 
-            # Transform raster CRS to match vector layer if needed
-            if raster_layer and self.reprojected_raster_layer is None:
-                self.transform_raster_CRS(layer, raster_layer)
-
             # Create map canvas and add to panel
             map_canvas = self.create_map_canvas(layer)
             if map_canvas:
@@ -395,19 +347,24 @@ class QualityCheckVisualizationDialog(QDialog):
             QgsMessageLog.logMessage(f"Error in create_layer_visualization_panel: {str(e)}", 'AMRUT', Qgis.Critical)
             return self.create_error_panel(f"Error creating visualization: {str(e)}"), None
         
-    def transform_raster_CRS(self, layer, raster_layer):
+    def raster_to_reproject(self, layer, raster_layer):
         """
-        Transform raster layer CRS to match vector layer CRS for proper overlay.
+        Decide whether the raster has to be reprojected to the CRS of the layer for a proper overlay.
+
+        Rasters that can be shown as they are become the reprojected raster layer right away, the
+        others are reprojected by the QCDataWorker.
         
         Args:
             layer: Vector layer with target CRS
             raster_layer: Raster layer to transform
+            
+        Returns:
+            bool: Whether the worker has to reproject the raster
         """
         try:
             if not layer or not raster_layer:
-                return
+                return False
 
-            existing_layer = None
             grid_crs = layer.crs()
             raster_crs = raster_layer.crs()
             
@@ -421,76 +378,51 @@ class QualityCheckVisualizationDialog(QDialog):
             # Check if reprojection is needed
             if raster_crs.authid() == grid_crs.authid():
                 self.reprojected_raster_layer = raster_layer
-                return
+                return False
 
             # Clean up existing temporary raster layers
-            if self.reprojected_raster_layer is None:
-                self.remove_layer_by_name(f"Temporary_{raster_layer.name()}")
-            else:
-                # Check for existing reprojected layer
-                for lyr in QgsProject.instance().mapLayers().values():
-                    if lyr.name() == f"Temporary_{raster_layer.name()}" and isinstance(lyr, QgsRasterLayer):
-                        existing_layer = lyr
-                        break
-
-            # Use existing reprojected layer if available
-            if existing_layer:
-                self.reprojected_raster_layer = existing_layer
-            else:
-                # Validate raster source path
-                if not os.path.isfile(raster_layer.source()):
-                    QgsMessageLog.logMessage(f"Raster layer '{raster_layer.name()}' is not file-based or lacks a valid source path.", 'AMRUT', Qgis.Warning)
-                    self.reprojected_raster_layer = raster_layer  # Use original if can't reproject
-                    return
-
-                # Set up processing environment
-                processing_context = QgsProcessingContext()
-                feedback = QgsProcessingFeedback()
-
-                # Configure reprojection parameters
-                reproject_params = {
-                    'INPUT': raster_layer.source(),
-                    'SOURCE_CRS': raster_crs.authid(),
-                    'TARGET_CRS': grid_crs.authid(),
-                    'RESAMPLING': 0,        # Nearest neighbor resampling
-                    'NODATA': -9999,        # No data value
-                    'OUTPUT': 'TEMPORARY_OUTPUT'
-                }
-
-                try:
-                    # Execute raster reprojection
-                    reprojected_result = processing.run("gdal:warpreproject", reproject_params, context=processing_context, feedback=feedback)
-                    temp_raster_path = reprojected_result['OUTPUT']
-                    
-                    # Track temporary file for cleanup
-                    self.temporary_files.append(temp_raster_path)
-
-                    # Create reprojected raster layer
-                    self.reprojected_raster_layer = QgsRasterLayer(temp_raster_path, f"Temporary_{raster_layer.name()}")
-
-                    # Validate reprojected layer
-                    if not self.reprojected_raster_layer.isValid():
-                        QgsMessageLog.logMessage("Failed to reproject the raster layer.", 'AMRUT', Qgis.Warning)
-                        self.reprojected_raster_layer = raster_layer  # Fallback to original
-                        return
-
-                    # Log reprojection success
-                    QgsMessageLog.logMessage(
-                        f"[Reprojected Raster] CRS: {self.reprojected_raster_layer.crs().authid()}, "
-                        f"Extent: {self.reprojected_raster_layer.extent().toString()}",
-                        'AMRUT', Qgis.Info
-                    )
-
-                    # Add reprojected layer to project
-                    QgsProject.instance().addMapLayer(self.reprojected_raster_layer)
-                
-                except Exception as e:
-                    QgsMessageLog.logMessage(f"Error reprojecting raster: {str(e)}", 'AMRUT', Qgis.Warning)
-                    self.reprojected_raster_layer = raster_layer  # Fallback to original
+            self.remove_layer_by_name(f"Temporary_{raster_layer.name()}")
+
+            # Validate raster source path
+            if not os.path.isfile(raster_layer.source()):
+                QgsMessageLog.logMessage(f"Raster layer '{raster_layer.name()}' is not file-based or lacks a valid source path.", 'AMRUT', Qgis.Warning)
+                self.reprojected_raster_layer = raster_layer  # Use original if can't reproject
+                return False
+            return True
 
         except Exception as e:
-            QgsMessageLog.logMessage(f"Error in transform_raster_CRS: {str(e)}", 'AMRUT', Qgis.Critical)
+            QgsMessageLog.logMessage(f"Error in raster_to_reproject: {str(e)}", 'AMRUT', Qgis.Critical)
             self.reprojected_raster_layer = raster_layer if raster_layer else None
+            return False
+
+    def add_reprojected_raster(self, raster_layer, reprojected_raster_path):
+        """
+        Add the raster reprojected by the QCDataWorker to the project.
+
+        The raster is kept in the reprojection cache for the next sessions, it is not a temporary file.
+        
+        Args:
+            raster_layer: Original raster layer, the fallback if the reprojected one is invalid
+            reprojected_raster_path (str): Path of the reprojected raster
+        """
+        # Create reprojected raster layer
+        self.reprojected_raster_layer = QgsRasterLayer(reprojected_raster_path, f"Temporary_{raster_layer.name()}")
+
+        # Validate reprojected layer
+        if not self.reprojected_raster_layer.isValid():
+            QgsMessageLog.logMessage("Failed to reproject the raster layer.", 'AMRUT', Qgis.Warning)
+            self.reprojected_raster_layer = raster_layer  # Fallback to original
+            return
+
+        # Log reprojection success
+        QgsMessageLog.logMessage(
+            f"[Reprojected Raster] CRS: {self.reprojected_raster_layer.crs().authid()}, "
+            f"Extent: {self.reprojected_raster_layer.extent().toString()}",
+            'AMRUT', Qgis.Info
+        )
+
+        # Add reprojected layer to project
+        QgsProject.instance().addMapLayer(self.reprojected_raster_layer)
 
     def create_map_canvas(self, layer):
         """
@@ -509,6 +441,7 @@ class QualityCheckVisualizationDialog(QDialog):
 
             # Create and configure canvas
             canvas = QgsMapCanvas()
+            import_canvas.configure_canvas(canvas)
             canvas.setCanvasColor(QColor("white"))
 
             # CRITICAL: Proper layer ordering with vector on top of raster
@@ -0,0 +1,151 @@
+# coding=utf-8
+"""Export benchmark.
+
+Runs create_grid_within_single_polygon and clip_layers_to_grid headlessly on
+synthetic data and records throughput. It is not part of the regular test
+suite, run it explicitly from the plugin directory::
+
+    python -m unittest test.benchmark_export
+
+The QGIS python plugins directory has to be on PYTHONPATH for processing.
+The data size is controlled through environment variables:
+
+* AMRUT_BENCH_AOI_SIZE - side of the square AOI in metres (default 1000)
+* AMRUT_BENCH_GRID_SIZE - side of a grid cell in metres (default 500)
+* AMRUT_BENCH_FEATURES - features per vector layer (default 1000)
+* AMRUT_BENCH_RASTER - 0 to leave out the raster layer (default 1)
+* AMRUT_BENCH_PIXEL_SIZE - raster pixel size in metres (default 1)
+* AMRUT_BENCH_OUTPUT - file the results are appended to as JSON lines
+  (default bench_output.txt in the plugin directory)
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from qgis.core import QgsProject
+
+from .utilities import (
+    get_qgis_app, get_plugin_module, init_processing, append_benchmark_result)
+from . import synthetic_data
+
+QGIS_APP = get_qgis_app()
+
+AOI_SIZE = float(os.environ.get('AMRUT_BENCH_AOI_SIZE', 1000))
+GRID_SIZE = float(os.environ.get('AMRUT_BENCH_GRID_SIZE', 500))
+FEATURES = int(os.environ.get('AMRUT_BENCH_FEATURES', 1000))
+RASTER = os.environ.get('AMRUT_BENCH_RASTER', '1') != '0'
+PIXEL_SIZE = float(os.environ.get('AMRUT_BENCH_PIXEL_SIZE', 1))
+OUTPUT = os.environ.get(
+    'AMRUT_BENCH_OUTPUT',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench_output.txt'))
+
+
+class SignalRecorder(object):
+    """Stand-in for a pyqtSignal, counts what the export emits."""
+
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, *args):
+        self.emitted.append(args)
+
+
+def write_result(name, result):
+    """Append one benchmark result to the output file."""
+    append_benchmark_result(OUTPUT, name, result, {
+        'aoi_size': AOI_SIZE,
+        'grid_size': GRID_SIZE,
+        'features_per_layer': FEATURES,
+        'raster': RASTER,
+        'pixel_size': PIXEL_SIZE})
+
+
+class ExportBenchmark(unittest.TestCase):
+    """Throughput of the export path on synthetic data."""
+
+    @classmethod
+    def setUpClass(cls):
+        init_processing()
+        cls.export_grid = get_plugin_module('export_grid')
+        cls.export_clip = get_plugin_module('export_clip')
+        cls.work_dir = tempfile.mkdtemp(prefix='amrut_bench_export_')
+        start = time.perf_counter()
+        cls.aoi, cls.layers = synthetic_data.create_export_dataset(
+            os.path.join(cls.work_dir, 'data'), AOI_SIZE, FEATURES, RASTER, PIXEL_SIZE)
+        cls.generation_time = time.perf_counter() - start
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def create_grid(self):
+        """Run the grid creation, return (grid layer, seconds)."""
+        start = time.perf_counter()
+        name = self.export_grid.create_grid_within_single_polygon(
+            self.layers, self.aoi, GRID_SIZE, self.aoi.crs().authid())
+        seconds = time.perf_counter() - start
+        grid_layer = QgsProject.instance().mapLayersByName(name)[0]
+        self.addCleanup(self.remove_grid, grid_layer)
+        return grid_layer, seconds
+
+    @staticmethod
+    def remove_grid(grid_layer):
+        path = grid_layer.source().split('|')[0]
+        QgsProject.instance().removeMapLayer(grid_layer.id())
+        if os.path.exists(path):
+            os.remove(path)
+
+    def test_create_grid(self):
+        """Grid creation throughput."""
+        grid_layer, seconds = self.create_grid()
+        cells = grid_layer.featureCount()
+        self.assertGreater(cells, 0)
+        write_result('create_grid', {
+            'seconds': round(seconds, 3),
+            'cells': cells,
+            'cells_per_second': round(cells / seconds, 3) if seconds else None})
+
+    def test_clip_layers_to_grid(self):
+        """Clip, tile, merge and archive throughput."""
+        grid_layer, _ = self.create_grid()
+        output_dir = os.path.join(self.work_dir, 'export')
+        os.makedirs(output_dir, exist_ok=True)
+        progress = SignalRecorder()
+
+        start = time.perf_counter()
+        failures = self.export_clip.clip_layers_to_grid(
+            grid_layer, self.layers, output_dir, progress)
+        seconds = time.perf_counter() - start
+
+        self.assertEqual(failures, [])
+        cells = grid_layer.featureCount()
+        features = sum(
+            layer.featureCount() for layer in self.layers if hasattr(layer, 'featureCount'))
+        report_path = os.path.join(output_dir, 'Grid Output', 'export_report.json')
+        with open(report_path, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+
+        write_result('clip_layers_to_grid', {
+            'seconds': round(seconds, 3),
+            'data_generation_seconds': round(self.generation_time, 3),
+            'cells': cells,
+            'cells_per_second': round(cells / seconds, 3) if seconds else None,
+            'features_per_second': round(features / seconds, 3) if seconds else None,
+            'progress_updates': len(progress.emitted),
+            'stage_totals': report['stage_totals']})
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(ExportBenchmark)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
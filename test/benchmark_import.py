@@ -0,0 +1,282 @@
+# coding=utf-8
+"""Import / QC benchmark.
+
+Times the validation of a directory of .amrut files, the construction of the
+merged layer, the change comparison and the archive rewrite on a synthetic
+corpus. It is not part of the regular test suite, run it explicitly from the
+plugin directory::
+
+    python -m unittest test.benchmark_import
+
+The QGIS python plugins directory has to be on PYTHONPATH for processing.
+The corpus is controlled through environment variables:
+
+* AMRUT_BENCH_ARCHIVES - number of .amrut files (default 50)
+* AMRUT_BENCH_FEATURES - features per archive (default 200)
+* AMRUT_BENCH_CHANGES - fraction of moved, split, deleted and new features,
+  each (default 0.05)
+* AMRUT_BENCH_PHOTO_BYTES - size of the photo attribute (default 20000)
+* AMRUT_BENCH_TILES - tiles per archive (default 100)
+* AMRUT_BENCH_QC_ARCHIVES - archives run through the verification checks
+  (default 5)
+* AMRUT_BENCH_OUTPUT - file the results are appended to as JSON lines
+  (default bench_output.txt in the plugin directory)
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+from qgis.core import QgsProject, QgsRectangle, QgsVectorLayer
+
+from .utilities import (
+    get_qgis_app, get_plugin_module, init_processing, append_benchmark_result)
+from . import synthetic_data
+
+QGIS_APP = get_qgis_app()
+
+ARCHIVES = int(os.environ.get('AMRUT_BENCH_ARCHIVES', 50))
+FEATURES = int(os.environ.get('AMRUT_BENCH_FEATURES', 200))
+CHANGES = float(os.environ.get('AMRUT_BENCH_CHANGES', 0.05))
+PHOTO_BYTES = int(os.environ.get('AMRUT_BENCH_PHOTO_BYTES', 20000))
+TILES = int(os.environ.get('AMRUT_BENCH_TILES', 100))
+QC_ARCHIVES = int(os.environ.get('AMRUT_BENCH_QC_ARCHIVES', 5))
+OUTPUT = os.environ.get(
+    'AMRUT_BENCH_OUTPUT',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench_output.txt'))
+
+LAYER_NAME = 'buildings'
+
+
+def write_result(name, result):
+    """Append one benchmark result to the output file."""
+    append_benchmark_result(OUTPUT, name, result, {
+        'archives': ARCHIVES,
+        'features_per_archive': FEATURES,
+        'changes': CHANGES,
+        'photo_bytes': PHOTO_BYTES,
+        'tiles': TILES,
+        'qc_archives': QC_ARCHIVES})
+
+
+def rewrite_archive_by_extraction(amrut_path, geojson_name, geojson_data, metadata):
+    """Rewrite an archive the way VerificationDialog.accept_data used to.
+
+    Everything is extracted, the layer and metadata.json are replaced and the
+    whole tree is compressed again.
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with zipfile.ZipFile(amrut_path, 'r') as zip_ref:
+            zip_ref.extractall(temp_dir)
+        with open(os.path.join(temp_dir, geojson_name), 'wb') as geojson_file:
+            geojson_file.write(geojson_data)
+        with open(os.path.join(temp_dir, 'metadata.json'), 'w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=4)
+        temp_amrut_path = amrut_path + '.tmp'
+        with zipfile.ZipFile(temp_amrut_path, 'w') as zip_ref:
+            for root, _, files in os.walk(temp_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    zip_ref.write(file_path, os.path.relpath(file_path, temp_dir))
+        os.replace(temp_amrut_path, amrut_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class ImportBenchmark(unittest.TestCase):
+    """Throughput of the import and QC path on a synthetic corpus."""
+
+    @classmethod
+    def setUpClass(cls):
+        init_processing()
+        cls.import_validation = get_plugin_module('import_validation')
+        cls.import_construct_layer = get_plugin_module('import_construct_layer')
+        cls.import_process_layer = get_plugin_module('import_process_layer')
+        cls.verification_dialog = get_plugin_module('verification_dialog')
+        cls.import_archive = get_plugin_module('import_archive')
+        cls.import_raster_cache = get_plugin_module('import_raster_cache')
+
+        cls.work_dir = tempfile.mkdtemp(prefix='amrut_bench_import_')
+        cls.data_dir = os.path.join(cls.work_dir, 'survey')
+        start = time.perf_counter()
+        original_path, cls.amrut_files, cls.expected = synthetic_data.create_amrut_corpus(
+            cls.data_dir, LAYER_NAME, ARCHIVES, FEATURES, CHANGES, CHANGES, CHANGES, CHANGES,
+            photo_bytes=PHOTO_BYTES, tiles=TILES)
+        cls.generation_time = time.perf_counter() - start
+        # The original layer lives next to the corpus, not inside the scanned directory
+        cls.original_path = shutil.move(original_path, os.path.join(cls.work_dir, os.path.basename(original_path)))
+        cls.corpus_bytes = sum(
+            os.path.getsize(os.path.join(cls.data_dir, name)) for name in cls.amrut_files)
+
+        project = QgsProject.instance()
+        cls.previous_project_file = project.fileName()
+        # Constructed layers are saved in the project home
+        project.setFileName(os.path.join(cls.work_dir, 'benchmark.qgz'))
+        cls.original_layer = QgsVectorLayer(cls.original_path, LAYER_NAME, 'ogr')
+        project.addMapLayer(cls.original_layer)
+
+    @classmethod
+    def tearDownClass(cls):
+        project = QgsProject.instance()
+        project.removeMapLayer(cls.original_layer.id())
+        project.setFileName(cls.previous_project_file)
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def add_temporary_layer(self, source):
+        layer = QgsVectorLayer(source, 'Temporary_{}'.format(LAYER_NAME), 'ogr')
+        self.assertTrue(layer.isValid())
+        QgsProject.instance().addMapLayer(layer)
+        self.addCleanup(QgsProject.instance().removeMapLayer, layer.id())
+        return layer
+
+    def test_validate_amrut_files(self):
+        """Validation of the whole directory, without and with the archive index."""
+        index_path = os.path.join(self.data_dir, self.import_validation.INDEX_FILE_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        start = time.perf_counter()
+        valid, data = self.import_validation.validate_amrut_files(self.data_dir)
+        seconds = time.perf_counter() - start
+        self.assertTrue(valid, data)
+
+        start = time.perf_counter()
+        valid, data = self.import_validation.validate_amrut_files(self.data_dir)
+        indexed_seconds = time.perf_counter() - start
+        self.assertTrue(valid, data)
+
+        write_result('validate_amrut_files', {
+            'seconds': round(seconds, 3),
+            'indexed_seconds': round(indexed_seconds, 3),
+            'data_generation_seconds': round(self.generation_time, 3),
+            'archives_per_second': round(len(self.amrut_files) / seconds, 3) if seconds else None,
+            'corpus_bytes': self.corpus_bytes})
+
+    def test_construct_and_compare(self):
+        """Merged layer construction followed by the split feature comparison."""
+        builder = self.import_construct_layer.LayerBuilder.for_project_layer(LAYER_NAME)
+        start = time.perf_counter()
+        constructed, path = self.import_construct_layer.construct_layer(
+            self.data_dir, self.amrut_files, builder)
+        construct_seconds = time.perf_counter() - start
+        self.assertTrue(constructed, path)
+        self.addCleanup(os.remove, path)
+        temporary_layer = self.add_temporary_layer(path)
+
+        start = time.perf_counter()
+        split_feature_map = self.import_process_layer.process_temp_layer(LAYER_NAME)
+        compare_seconds = time.perf_counter() - start
+
+        self.assertEqual(len(split_feature_map), self.expected['split'])
+        features = temporary_layer.featureCount()
+        write_result('construct_and_compare', {
+            'construct_seconds': round(construct_seconds, 3),
+            'compare_seconds': round(compare_seconds, 3),
+            'features': features,
+            'features_per_second': round(features / construct_seconds, 3) if construct_seconds else None,
+            'split_features': len(split_feature_map)})
+
+    def test_verification_checks(self):
+        """New, deleted and geometry change detection of the QC dialog, per archive."""
+        results = {}
+
+        class RecordingVerification(self.verification_dialog.VerificationDialog):
+            """Runs the checks without opening the review dialogs."""
+
+            def show_new_features_dialog(self, feature_ids, title):
+                results.setdefault(title, 0)
+                results[title] += len(feature_ids)
+
+        timings = []
+        comparisons = {}
+        for amrut_file in self.amrut_files[:QC_ARCHIVES]:
+            amrut_path = os.path.join(self.data_dir, amrut_file)
+            metadata = self.import_archive.get_archive(amrut_path).metadata()
+            grid_extent = QgsRectangle(metadata['west'], metadata['south'], metadata['east'], metadata['north'])
+            temporary_layer = self.add_temporary_layer(
+                self.import_archive.vsizip_path(amrut_path, '{}.geojson'.format(LAYER_NAME)))
+
+            start = time.perf_counter()
+            verification = RecordingVerification(LAYER_NAME, '', amrut_path, grid_extent)
+            verification.check_for_new_features()
+            verification.check_for_deleted_features()
+            verification.check_for_geom_changes()
+            timings.append(time.perf_counter() - start)
+            for tier, count in verification.changes.comparisons.items():
+                comparisons[tier] = comparisons.get(tier, 0) + count
+            QgsProject.instance().removeMapLayer(temporary_layer.id())
+
+        self.assertTrue(timings)
+        write_result('verification_checks', {
+            'archives': len(timings),
+            'seconds': round(sum(timings), 3),
+            'slowest_archive_seconds': round(max(timings), 3),
+            'detected': results,
+            'geometry_comparisons': comparisons})
+
+    def rewrite_all(self, name, rewrite):
+        """Copy the corpus and run rewrite(amrut_path, geojson_name, geojson_data, metadata) on every archive."""
+        rewrite_dir = os.path.join(self.work_dir, name)
+        shutil.copytree(self.data_dir, rewrite_dir)
+        self.addCleanup(shutil.rmtree, rewrite_dir, True)
+        geojson_name = '{}.geojson'.format(LAYER_NAME)
+
+        start = time.perf_counter()
+        for amrut_file in self.amrut_files:
+            amrut_path = os.path.join(rewrite_dir, amrut_file)
+            with zipfile.ZipFile(amrut_path) as zip_ref:
+                metadata = json.loads(zip_ref.read('metadata.json'))
+                geojson_data = zip_ref.read(geojson_name)
+            metadata['qc_status'] = 'verified'
+            rewrite(amrut_path, geojson_name, geojson_data, metadata)
+        return time.perf_counter() - start
+
+    def test_rewrite_archives(self):
+        """Replacing the layer and metadata.json of every archive, by extraction and by raw copy."""
+        seconds = self.rewrite_all('rewrite_extract', rewrite_archive_by_extraction)
+
+        def rewrite_raw(amrut_path, geojson_name, geojson_data, metadata):
+            self.import_archive.rewrite_archive(amrut_path, {
+                geojson_name: geojson_data,
+                'metadata.json': json.dumps(metadata, indent=4).encode('utf-8')})
+
+        raw_seconds = self.rewrite_all('rewrite_raw', rewrite_raw)
+
+        write_result('rewrite_archives', {
+            'seconds': round(seconds, 3),
+            'archives_per_second': round(len(self.amrut_files) / seconds, 3) if seconds else None,
+            'megabytes_per_second': round(self.corpus_bytes / seconds / 1e6, 3) if seconds else None,
+            'raw_copy_seconds': round(raw_seconds, 3),
+            'raw_copy_megabytes_per_second': round(self.corpus_bytes / raw_seconds / 1e6, 3) if raw_seconds else None})
+
+    def test_raster_reprojection_cache(self):
+        """Reprojecting the background raster of a QC session, cold and from the cache."""
+        source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenbytenraster.asc')
+        cache = self.import_raster_cache.RasterCache(os.path.join(self.work_dir, 'raster_cache'))
+
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            path = self.import_raster_cache.reproject(source, 'EPSG:4326', 'EPSG:3857', cache=cache)
+            timings.append(time.perf_counter() - start)
+            self.assertTrue(os.path.isfile(path))
+
+        write_result('raster_reprojection_cache', {
+            'cold_seconds': round(timings[0], 3),
+            'cached_seconds': round(timings[1], 3)})
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(ImportBenchmark)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
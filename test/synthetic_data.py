@@ -0,0 +1,325 @@
+# coding=utf-8
+"""Synthetic layers and rasters for the benchmarks.
+
+All generators are seeded so that two runs with the same parameters work on
+identical data.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import base64
+import json
+import math
+import os
+import random
+import zipfile
+
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    QgsVectorLayer,
+    QgsRasterLayer,
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+    QgsRectangle,
+    QgsProject,
+    QgsVectorFileWriter)
+
+DEFAULT_CRS = 'EPSG:32644'
+
+
+def square_extent(size, origin=(500000.0, 2500000.0)):
+    """Extent of a square AOI of ``size`` metres."""
+    x, y = origin
+    return QgsRectangle(x, y, x + size, y + size)
+
+
+def save_layer(layer, path):
+    """Write a memory layer to a GeoPackage and load it back through OGR."""
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = 'GPKG'
+    options.layerName = layer.name()
+    QgsVectorFileWriter.writeAsVectorFormatV2(
+        layer, path, QgsProject.instance().transformContext(), options)
+    saved = QgsVectorLayer(path, layer.name(), 'ogr')
+    if not saved.isValid():
+        raise RuntimeError('Could not load synthetic layer {}'.format(path))
+    return saved
+
+
+def create_aoi_layer(extent, crs=DEFAULT_CRS, name='aoi'):
+    """Single polygon AOI covering ``extent``, slightly enlarged."""
+    layer = QgsVectorLayer('Polygon?crs={}'.format(crs), name, 'memory')
+    feature = QgsFeature()
+    feature.setGeometry(QgsGeometry.fromRect(extent.buffered(1.0)))
+    layer.dataProvider().addFeatures([feature])
+    layer.updateExtents()
+    return layer
+
+
+def _new_layer(geometry_type, name, crs):
+    layer = QgsVectorLayer('{}?crs={}'.format(geometry_type, crs), name, 'memory')
+    layer.dataProvider().addAttributes([
+        QgsField('name', QVariant.String),
+        QgsField('category', QVariant.Int),
+        QgsField('value', QVariant.Double)])
+    layer.updateFields()
+    return layer
+
+
+def _attributes(rng, index):
+    return ['feature {}'.format(index), rng.randint(1, 10), rng.random() * 100]
+
+
+def _random_point(rng, extent, margin=0.0):
+    return QgsPointXY(
+        rng.uniform(extent.xMinimum() + margin, extent.xMaximum() - margin),
+        rng.uniform(extent.yMinimum() + margin, extent.yMaximum() - margin))
+
+
+def create_point_layer(extent, count, crs=DEFAULT_CRS, name='points', seed=1):
+    rng = random.Random(seed)
+    layer = _new_layer('Point', name, crs)
+    features = []
+    for index in range(count):
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPointXY(_random_point(rng, extent)))
+        feature.setAttributes(_attributes(rng, index))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+def create_line_layer(extent, count, crs=DEFAULT_CRS, name='lines', seed=2,
+                      vertices=8, step=40.0):
+    """Random walks of ``vertices`` points, kept inside ``extent``."""
+    rng = random.Random(seed)
+    layer = _new_layer('LineString', name, crs)
+    features = []
+    for index in range(count):
+        point = _random_point(rng, extent)
+        points = [point]
+        for _ in range(vertices - 1):
+            angle = rng.uniform(0, 2 * math.pi)
+            x = min(max(point.x() + step * math.cos(angle), extent.xMinimum()), extent.xMaximum())
+            y = min(max(point.y() + step * math.sin(angle), extent.yMinimum()), extent.yMaximum())
+            point = QgsPointXY(x, y)
+            points.append(point)
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPolylineXY(points))
+        feature.setAttributes(_attributes(rng, index))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+def create_polygon_layer(extent, count, crs=DEFAULT_CRS, name='polygons', seed=3,
+                         vertices=12, radius=25.0):
+    """Star-shaped polygons of ``vertices`` points, kept inside ``extent``."""
+    rng = random.Random(seed)
+    layer = _new_layer('Polygon', name, crs)
+    features = []
+    for index in range(count):
+        centre = _random_point(rng, extent, margin=radius)
+        ring = []
+        for vertex in range(vertices):
+            angle = 2 * math.pi * vertex / vertices
+            distance = radius * rng.uniform(0.5, 1.0)
+            ring.append(QgsPointXY(centre.x() + distance * math.cos(angle),
+                                   centre.y() + distance * math.sin(angle)))
+        ring.append(ring[0])
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPolygonXY([ring]))
+        feature.setAttributes(_attributes(rng, index))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+def create_raster(path, extent, crs=DEFAULT_CRS, pixel_size=1.0, seed=4, name='raster'):
+    """Three band Byte GeoTIFF covering ``extent``, filled with a noisy gradient."""
+    from osgeo import gdal, osr
+
+    width = int(math.ceil(extent.width() / pixel_size))
+    height = int(math.ceil(extent.height() / pixel_size))
+    dataset = gdal.GetDriverByName('GTiff').Create(
+        path, width, height, 3, gdal.GDT_Byte, ['COMPRESS=DEFLATE', 'TILED=YES'])
+    dataset.SetGeoTransform(
+        [extent.xMinimum(), pixel_size, 0, extent.yMaximum(), 0, -pixel_size])
+    srs = osr.SpatialReference()
+    srs.SetFromUserInput(crs)
+    dataset.SetProjection(srs.ExportToWkt())
+
+    rng = random.Random(seed)
+    for band_index in range(1, 4):
+        band = dataset.GetRasterBand(band_index)
+        offset = band_index * 60
+        for row in range(height):
+            noise = rng.randrange(16)
+            line = bytes(((column + row + offset + noise) // 4) % 256 for column in range(width))
+            band.WriteRaster(0, row, width, 1, line)
+    dataset.FlushCache()
+    dataset = None
+
+    layer = QgsRasterLayer(path, name)
+    if not layer.isValid():
+        raise RuntimeError('Could not load synthetic raster {}'.format(path))
+    return layer
+
+
+def create_export_dataset(directory, aoi_size=1000.0, features_per_layer=1000,
+                          raster=True, pixel_size=1.0, crs=DEFAULT_CRS):
+    """Generate an AOI and the layers to export, saved in ``directory``.
+
+    :returns: (aoi_layer, [point, line, polygon(, raster)] layers)
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    extent = square_extent(aoi_size)
+    aoi = create_aoi_layer(extent, crs)
+    layers = [
+        save_layer(create_point_layer(extent, features_per_layer, crs),
+                   os.path.join(directory, 'points.gpkg')),
+        save_layer(create_line_layer(extent, features_per_layer, crs),
+                   os.path.join(directory, 'lines.gpkg')),
+        save_layer(create_polygon_layer(extent, features_per_layer, crs),
+                   os.path.join(directory, 'polygons.gpkg')),
+    ]
+    if raster:
+        layers.append(create_raster(
+            os.path.join(directory, 'raster.tif'), extent, crs, pixel_size))
+    return aoi, layers
+
+
+# Synthetic .amrut corpora. Archives are written with the standard library only,
+# in the layout produced by the export and sent back by the surveyors:
+# metadata.json, <layer>.geojson (EPSG:4326) and a tiles/<z>/<x>/<y>.png tree.
+
+CORPUS_ORIGIN = (78.0, 30.0)
+CORPUS_CELL_SIZE = 0.005  # Degrees, roughly a 500 m grid cell
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _square(x, y, size):
+    return [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]
+
+
+def _geojson_feature(properties, coordinates):
+    return {
+        'type': 'Feature',
+        'properties': properties,
+        'geometry': {'type': 'MultiPolygon', 'coordinates': [coordinates]}}
+
+
+def _feature_collection(layer_name, features):
+    return {
+        'type': 'FeatureCollection',
+        'name': layer_name,
+        'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:OGC:1.3:CRS84'}},
+        'features': features}
+
+
+def _cell_bounds(index, columns):
+    row, column = divmod(index, columns)
+    west = CORPUS_ORIGIN[0] + column * CORPUS_CELL_SIZE
+    south = CORPUS_ORIGIN[1] + row * CORPUS_CELL_SIZE
+    return west, south, west + CORPUS_CELL_SIZE, south + CORPUS_CELL_SIZE
+
+
+def create_amrut_corpus(directory, layer_name='buildings', archives=50, features_per_archive=200,
+                        moved=0.05, split=0.05, deleted=0.05, new=0.05,
+                        photos=0.2, photo_bytes=20000, tiles=100, tile_bytes=4000, seed=5):
+    """Write ``archives`` verified .amrut files and the original layer they were exported from.
+
+    Every archive is one grid cell with ``features_per_archive`` polygons. The
+    given fractions of them are moved (geometry change), split in two features
+    sharing a feature_id with different attributes, flagged with delete=True,
+    and the same fraction of new features is added. ``photos`` is the fraction
+    of features carrying a base64 encoded photo of ``photo_bytes`` bytes.
+
+    :returns: (path of the original layer GeoJSON, list of .amrut file names,
+        dict of expected counts)
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    rng = random.Random(seed)
+    columns = max(int(math.ceil(math.sqrt(archives))), 1)
+    size = CORPUS_CELL_SIZE / 50  # Roughly 10 m buildings
+    photo = base64.b64encode(
+        PNG_SIGNATURE + bytes(rng.randrange(256) for _ in range(photo_bytes))).decode('ascii')
+    tile = PNG_SIGNATURE + bytes(rng.randrange(256) for _ in range(tile_bytes))
+
+    original_features = []
+    amrut_files = []
+    expected = {'moved': 0, 'split': 0, 'deleted': 0, 'new': 0}
+    feature_id = 1
+    new_feature_id = 10 ** 7
+
+    for index in range(archives):
+        west, south, east, north = _cell_bounds(index, columns)
+        survey_features = []
+        for _ in range(features_per_archive):
+            x = rng.uniform(west + 2 * size, east - 3 * size)
+            y = rng.uniform(south + 2 * size, north - 3 * size)
+            properties = {'feature_id': feature_id, 'name': 'building {}'.format(feature_id),
+                          'floors': rng.randint(1, 5)}
+            original_features.append(_geojson_feature(dict(properties), _square(x, y, size)))
+
+            properties.update({'photo': photo if rng.random() < photos else None, 'delete': False})
+            change = rng.random()
+            if change < moved:
+                survey_features.append(_geojson_feature(properties, _square(x + size / 2, y, size)))
+                expected['moved'] += 1
+            elif change < moved + split:
+                half = dict(properties, floors=properties['floors'] + 1)
+                survey_features.append(_geojson_feature(properties, _square(x, y, size / 2)))
+                survey_features.append(_geojson_feature(half, _square(x + size / 2, y, size / 2)))
+                expected['split'] += 1
+            elif change < moved + split + deleted:
+                properties['delete'] = True
+                survey_features.append(_geojson_feature(properties, _square(x, y, size)))
+                expected['deleted'] += 1
+            else:
+                survey_features.append(_geojson_feature(properties, _square(x, y, size)))
+            feature_id += 1
+
+        for _ in range(int(round(features_per_archive * new))):
+            x = rng.uniform(west + 2 * size, east - 3 * size)
+            y = rng.uniform(south + 2 * size, north - 3 * size)
+            properties = {'feature_id': new_feature_id, 'name': 'new building {}'.format(new_feature_id),
+                          'floors': 1, 'photo': photo, 'delete': False}
+            survey_features.append(_geojson_feature(properties, _square(x, y, size)))
+            new_feature_id += 1
+            expected['new'] += 1
+
+        grid_name = 'grid_{}'.format(index)
+        metadata = {
+            'north': north, 'south': south, 'east': east, 'west': west,
+            'layers': ['{{{} : Polygon}}'.format(layer_name)],
+            'grid': grid_name,
+            'qc_status': 'verified',
+            'layers_qc_completed': [layer_name]}
+
+        amrut_file = '{}.amrut'.format(grid_name)
+        with zipfile.ZipFile(os.path.join(directory, amrut_file), 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('metadata.json', json.dumps(metadata, indent=4))
+            archive.writestr('{}.geojson'.format(layer_name),
+                             json.dumps(_feature_collection(layer_name, survey_features)))
+            side = max(int(math.ceil(math.sqrt(tiles))), 1)
+            for tile_index in range(tiles):
+                x, y = divmod(tile_index, side)
+                archive.writestr('tiles/22/{}/{}.png'.format(x, y), tile)
+        amrut_files.append(amrut_file)
+
+    original_path = os.path.join(directory, '{}.geojson'.format(layer_name))
+    with open(original_path, 'w', encoding='utf-8') as original:
+        json.dump(_feature_collection(layer_name, original_features), original)
+    return original_path, amrut_files, expected
@@ -0,0 +1,242 @@
+# coding=utf-8
+"""Archive rewrite and QC session tests.
+
+Covers rewrite_archive on the archives the field app and common tools
+produce and the QCSession journal, neither needs a map canvas.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from .utilities import get_qgis_app, get_plugin_module
+
+QGIS_APP = get_qgis_app()
+archive = get_plugin_module('import_archive')
+qc_session = get_plugin_module('import_qc_session')
+
+METADATA = {'grid_id': 'G_001', 'layers': ['buildings', 'roads']}
+BUILDINGS = {'type': 'FeatureCollection', 'features': []}
+
+
+class UnseekableFile(object):
+    """Write only stream without seek/tell, zipfile then writes data descriptors."""
+
+    def __init__(self, file_object):
+        self.file_object = file_object
+
+    def write(self, data):
+        return self.file_object.write(data)
+
+    def flush(self):
+        self.file_object.flush()
+
+
+def read_members(path):
+    """{name: bytes} of an archive, the CRC of every member is checked on the way."""
+    with zipfile.ZipFile(path) as zip_file:
+        if zip_file.testzip() is not None:
+            raise zipfile.BadZipFile('{} has a corrupt member'.format(path))
+        return {info.filename: zip_file.read(info) for info in zip_file.infolist()}
+
+
+class RewriteArchiveTest(unittest.TestCase):
+    """Test rewrite_archive copies, replaces, adds and removes members."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'survey.amrut')
+
+    def tearDown(self):
+        """Runs after each test."""
+        archive.invalidate(self.path)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_archive(self, members, compression=zipfile.ZIP_DEFLATED):
+        with zipfile.ZipFile(self.path, 'w', compression) as zip_file:
+            for name, data in members.items():
+                zip_file.writestr(name, data)
+
+    def test_make_archive(self):
+        """Test an archive of shutil.make_archive keeps its untouched members."""
+        source = os.path.join(self.directory, 'source')
+        os.makedirs(os.path.join(source, 'photos'))
+        with open(os.path.join(source, archive.METADATA_FILE_NAME), 'w') as metadata_file:
+            json.dump(METADATA, metadata_file)
+        with open(os.path.join(source, 'buildings.geojson'), 'w') as layer_file:
+            json.dump(BUILDINGS, layer_file)
+        with open(os.path.join(source, 'photos', 'p1.jpg'), 'wb') as photo_file:
+            photo_file.write(os.urandom(4096))
+        os.replace(shutil.make_archive(os.path.join(self.directory, 'survey'), 'zip', source), self.path)
+        before = read_members(self.path)
+
+        archive.update_metadata(self.path, {'grid_id': 'G_002'})
+
+        after = read_members(self.path)
+        self.assertEqual(json.loads(after.pop(archive.METADATA_FILE_NAME)), {'grid_id': 'G_002'})
+        del before[archive.METADATA_FILE_NAME]
+        self.assertEqual(after, before)
+
+    def test_data_descriptors(self):
+        """Test members streamed with a data descriptor are copied with it."""
+        with open(self.path, 'wb') as output:
+            with zipfile.ZipFile(UnseekableFile(output), 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                zip_file.writestr(archive.METADATA_FILE_NAME, json.dumps(METADATA))
+                zip_file.writestr('buildings.geojson', json.dumps(BUILDINGS) * 100)
+                zip_file.writestr('empty.txt', b'')
+        with zipfile.ZipFile(self.path) as zip_file:
+            for info in zip_file.infolist():
+                self.assertTrue(info.flag_bits & archive.DATA_DESCRIPTOR_FLAG)
+
+        archive.rewrite_archive(self.path, {'notes.txt': b'checked'})
+
+        members = read_members(self.path)
+        self.assertEqual(members['buildings.geojson'], json.dumps(BUILDINGS).encode() * 100)
+        self.assertEqual(members['empty.txt'], b'')
+        self.assertEqual(members['notes.txt'], b'checked')
+
+    def test_replace_add_remove(self):
+        """Test members are replaced, added and removed, the others kept in order."""
+        self.write_archive({
+            archive.METADATA_FILE_NAME: json.dumps(METADATA),
+            'buildings.geojson': json.dumps(BUILDINGS),
+            'roads.geojson': 'roads',
+            'stored.bin': b'\x00' * 100})
+
+        archive.rewrite_archive(self.path, {
+            'buildings.geojson': b'new buildings',
+            'roads.geojson': None,
+            'wells.geojson': b'wells'})
+
+        with zipfile.ZipFile(self.path) as zip_file:
+            names = zip_file.namelist()
+        self.assertEqual(names, [archive.METADATA_FILE_NAME, 'stored.bin', 'buildings.geojson', 'wells.geojson'])
+        members = read_members(self.path)
+        self.assertEqual(members['buildings.geojson'], b'new buildings')
+        self.assertEqual(members['wells.geojson'], b'wells')
+        self.assertEqual(members['stored.bin'], b'\x00' * 100)
+
+    def test_stored_members(self):
+        """Test members written without compression are copied."""
+        self.write_archive({archive.METADATA_FILE_NAME: json.dumps(METADATA), 'a.txt': 'a'}, zipfile.ZIP_STORED)
+        archive.rewrite_archive(self.path, {'b.txt': b'b'})
+        self.assertEqual(read_members(self.path)['a.txt'], b'a')
+
+    def test_interrupted_write(self):
+        """Test a rewrite failing before the rename leaves the original archive."""
+        self.write_archive({archive.METADATA_FILE_NAME: json.dumps(METADATA), 'buildings.geojson': 'b'})
+        with open(self.path, 'rb') as original_file:
+            original = original_file.read()
+
+        with mock.patch.object(archive.os, 'replace', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                archive.update_metadata(self.path, {'grid_id': 'G_002'})
+
+        with open(self.path, 'rb') as archive_file:
+            self.assertEqual(archive_file.read(), original)
+        self.assertEqual(os.listdir(self.directory), ['survey.amrut'])
+
+    def test_output_path(self):
+        """Test writing to another path leaves the source archive."""
+        self.write_archive({archive.METADATA_FILE_NAME: json.dumps(METADATA)})
+        output_path = os.path.join(self.directory, 'copy.amrut')
+        archive.update_metadata(self.path, {'grid_id': 'G_002'}, output_path)
+        self.assertEqual(json.loads(read_members(self.path)[archive.METADATA_FILE_NAME]), METADATA)
+        self.assertEqual(json.loads(read_members(output_path)[archive.METADATA_FILE_NAME]), {'grid_id': 'G_002'})
+
+
+class QCSessionTest(unittest.TestCase):
+    """Test QCSession journals decisions and commits them in one rewrite."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'survey.amrut')
+        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr(archive.METADATA_FILE_NAME, json.dumps(METADATA))
+            zip_file.writestr('buildings.geojson', json.dumps(BUILDINGS))
+            zip_file.writestr('roads.geojson', 'roads')
+        self.verified_path = os.path.join(self.directory, 'verified.geojson')
+        with open(self.verified_path, 'w') as verified_file:
+            verified_file.write('verified buildings')
+
+    def tearDown(self):
+        """Runs after each test."""
+        for path in os.listdir(self.directory):
+            archive.invalidate(os.path.join(self.directory, path))
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_journal_commit(self):
+        """Test recorded decisions survive a new session and are committed."""
+        metadata = dict(METADATA, layers_qc_completed=['buildings'])
+        session = qc_session.QCSession(self.path)
+        self.assertFalse(session.resumed)
+        session.record_layer('buildings.geojson', self.verified_path, metadata)
+        self.assertFalse(os.path.exists(self.verified_path))
+        self.assertEqual(read_members(self.path)['buildings.geojson'], json.dumps(BUILDINGS).encode())
+
+        session = qc_session.QCSession(self.path)
+        self.assertTrue(session.resumed)
+        self.assertEqual(session.metadata(), metadata)
+        self.assertEqual(session.commit(), self.path)
+
+        members = read_members(self.path)
+        self.assertEqual(members['buildings.geojson'], b'verified buildings')
+        self.assertEqual(members['roads.geojson'], b'roads')
+        self.assertEqual(json.loads(members[archive.METADATA_FILE_NAME]), metadata)
+        self.assertFalse(os.path.exists(session.journal_dir))
+        self.assertFalse(session.has_changes())
+        self.assertFalse(qc_session.QCSession(self.path).resumed)
+
+    def test_discard(self):
+        """Test a discarded session leaves the archive unchanged."""
+        session = qc_session.QCSession(self.path)
+        session.record_layer('buildings.geojson', self.verified_path, dict(METADATA, qc_status='done'))
+        session.discard()
+
+        self.assertFalse(os.path.exists(session.journal_dir))
+        self.assertEqual(session.metadata(), METADATA)
+        self.assertEqual(session.commit(), self.path)
+        self.assertEqual(read_members(self.path)['buildings.geojson'], json.dumps(BUILDINGS).encode())
+        self.assertFalse(qc_session.QCSession(self.path).resumed)
+
+    def test_stale_journal(self):
+        """Test a journal of an archive changed since is discarded."""
+        session = qc_session.QCSession(self.path)
+        session.update_metadata(dict(METADATA, qc_status='done'))
+        archive.update_metadata(self.path, dict(METADATA, grid_id='G_002'))
+
+        session = qc_session.QCSession(self.path)
+        self.assertFalse(session.resumed)
+        self.assertFalse(os.path.exists(session.journal_dir))
+
+    def test_resurvey_rename(self):
+        """Test an archive marked for resurvey is committed under its new name."""
+        session = qc_session.QCSession(self.path)
+        session.update_metadata(dict(METADATA, resurvey=[{'layer': 'buildings', 'feature_id': 3}]))
+        renamed_path = os.path.join(self.directory, qc_session.RESURVEY_PREFIX + 'survey.amrut')
+
+        self.assertEqual(session.commit(), renamed_path)
+
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted([
+            os.path.basename(renamed_path), 'verified.geojson']))
+        members = read_members(renamed_path)
+        self.assertEqual(json.loads(members[archive.METADATA_FILE_NAME])['resurvey'],
+                         [{'layer': 'buildings', 'feature_id': 3}])
+        self.assertEqual(members['roads.geojson'], b'roads')
+        self.assertEqual(session.archive_path, renamed_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# coding=utf-8
+"""Geometry comparator tests.
+
+Checks GeometryComparator against the GEOS comparisons it replaces,
+equals()/isGeosEqual() for lines and polygons and distance() for points,
+on small hand written geometries.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+from qgis.core import QgsGeometry, QgsWkbTypes
+
+from .utilities import get_qgis_app, get_plugin_module
+
+QGIS_APP = get_qgis_app()
+change_detection = get_plugin_module('import_change_detection')
+
+SQUARE = 'POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))'
+
+
+def geometries(original_wkt, temporary_wkt):
+    return QgsGeometry.fromWkt(original_wkt), QgsGeometry.fromWkt(temporary_wkt)
+
+
+class GeometryComparatorTest(unittest.TestCase):
+    """Test GeometryComparator decides like GEOS."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.comparator = change_detection.GeometryComparator()
+
+    def assertSameAsGeos(self, original_wkt, temporary_wkt, changed):
+        original, temporary = geometries(original_wkt, temporary_wkt)
+        self.assertEqual(not original.isGeosEqual(temporary), changed)
+        self.assertEqual(self.comparator.changed(original, temporary), changed)
+
+    def assertSameAsDistance(self, original_wkt, temporary_wkt, changed):
+        original, temporary = geometries(original_wkt, temporary_wkt)
+        self.assertEqual(original.distance(temporary) > change_detection.POINT_TOLERANCE, changed)
+        self.assertEqual(self.comparator.changed(original, temporary), changed)
+
+    def test_identical(self):
+        """Test identical geometries are unchanged."""
+        for wkt in (SQUARE, 'LINESTRING(0 0, 5 5, 10 0)', 'POINT(3 4)'):
+            original, temporary = geometries(wkt, wkt)
+            self.assertTrue(original.equals(temporary))
+            self.assertFalse(self.comparator.changed(original, temporary))
+
+    def test_rotated_ring(self):
+        """Test a ring starting from another vertex is unchanged."""
+        rotated = 'POLYGON((10 0, 10 10, 0 10, 0 0, 10 0))'
+        # equals() compares vertex order, the ring is only topologically equal
+        original, temporary = geometries(SQUARE, rotated)
+        self.assertFalse(original.equals(temporary))
+        self.assertSameAsGeos(SQUARE, rotated, False)
+        self.assertSameAsGeos(SQUARE, 'POLYGON((0 0, 0 10, 10 10, 10 0, 0 0))', False)
+
+    def test_multi_part(self):
+        """Test a single part polygon saved as a multipolygon is unchanged."""
+        self.assertSameAsGeos(SQUARE, 'MULTIPOLYGON(((0 0, 10 0, 10 10, 0 10, 0 0)))', False)
+
+    def test_same_bbox(self):
+        """Test polygons with the same bounding box and vertex count differ."""
+        self.assertSameAsGeos('POLYGON((0 0, 10 0, 10 10, 0 0))', 'POLYGON((0 0, 10 10, 0 10, 0 0))', True)
+        self.assertSameAsGeos(SQUARE, 'POLYGON((0 0, 10 0, 10 10, 5 5, 0 10, 0 0))', True)
+        original, temporary = geometries('POLYGON((0 0, 10 0, 10 10, 0 0))', 'POLYGON((0 0, 10 10, 0 10, 0 0))')
+        self.assertFalse(original.equals(temporary))
+
+    def test_moved_polygon(self):
+        """Test a moved polygon is changed on its bounding box."""
+        self.assertSameAsGeos(SQUARE, 'POLYGON((1 0, 11 0, 11 10, 1 10, 1 0))', True)
+        self.assertEqual(self.comparator.stats['bbox'], 1)
+
+    def test_sub_precision_jitter(self):
+        """Test a vertex moved by less than HASH_PRECISION is unchanged."""
+        original, temporary = geometries(
+            'POLYGON((0 0, 10 0, 10 10, 5 8, 0 10, 0 0))',
+            'POLYGON((0 0, 10 0, 10 10, 5.00000000001 8, 0 10, 0 0))')
+        self.assertFalse(self.comparator.changed(original, temporary))
+
+    def test_point_jitter(self):
+        """Test points moved by up to the tolerance are unchanged."""
+        self.assertSameAsDistance('POINT(100 100)', 'POINT(100.3 100.4)', False)
+        self.assertSameAsDistance('POINT(100 100)', 'POINT(100.9 100.9)', True)
+        self.assertSameAsDistance('POINT(100 100)', 'POINT(102 100)', True)
+
+    def test_multipoint(self):
+        """Test multipoints are compared on the distance of their closest parts."""
+        original = 'MULTIPOINT((0 0), (100 100))'
+        self.assertSameAsDistance(original, 'MULTIPOINT((100 100), (0 0))', False)
+        self.assertSameAsDistance(original, 'MULTIPOINT((0.5 0), (100.5 100))', False)
+        self.assertSameAsDistance(original, 'MULTIPOINT((5 0), (105 100))', True)
+        # Only the closest parts count, as with distance(), a single moved part is not a change
+        self.assertSameAsDistance(original, 'MULTIPOINT((0 0), (150 150))', False)
+        self.assertEqual(self.comparator.stats['bbox'], 0)
+
+    def test_tolerance(self):
+        """Test polygons moved by up to a configured tolerance are unchanged."""
+        comparator = change_detection.GeometryComparator({QgsWkbTypes.PolygonGeometry: 0.5})
+        original, temporary = geometries(SQUARE, 'POLYGON((0.2 0, 10.2 0, 10.2 10, 0.2 10, 0.2 0))')
+        self.assertFalse(comparator.changed(original, temporary))
+        self.assertTrue(self.comparator.changed(original, temporary))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,3 +59,64 @@ def get_qgis_app():
         IFACE = QgisInterface(CANVAS)
 
     return QGIS_APP, CANVAS, IFACE, PARENT
+
+
+def get_plugin_module(module_name):
+    """ Import a module of the plugin as part of its package.
+
+    The plugin modules use relative imports, so they are loaded through the
+    plugin directory as a package instead of from PYTHONPATH directly.
+
+    :param module_name: Name of the module, e.g. 'export_clip'.
+    :type module_name: str
+
+    :returns: The imported module.
+    """
+    import importlib
+    import os
+
+    plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent_dir = os.path.dirname(plugin_dir)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    package = os.path.basename(plugin_dir)
+    return importlib.import_module('{}.{}'.format(package, module_name))
+
+
+def init_processing():
+    """ Initialise the Processing framework for headless runs.
+
+    The QGIS python plugins directory (e.g. /usr/share/qgis/python/plugins)
+    has to be on PYTHONPATH for the processing module to be found.
+    """
+    from qgis.core import QgsApplication
+    from qgis.analysis import QgsNativeAlgorithms
+    from processing.core.Processing import Processing
+
+    Processing.initialize()
+    registry = QgsApplication.processingRegistry()
+    if registry.providerById('native') is None:
+        registry.addProvider(QgsNativeAlgorithms())
+
+
+def append_benchmark_result(path, name, result, parameters):
+    """ Append one benchmark result to ``path`` as a JSON line.
+
+    :param path: Output file, results of successive runs accumulate in it.
+    :param name: Name of the benchmark.
+    :param result: Dict of measurements.
+    :param parameters: Dict of the parameters the data was generated with.
+    """
+    import json
+    import platform
+    from datetime import datetime
+
+    result = dict(result)
+    result.update({
+        'benchmark': name,
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'plugin_version': get_plugin_module('export_report').plugin_version(),
+        'python': platform.python_version(),
+        'parameters': parameters})
+    with open(path, 'a', encoding='utf-8') as output:
+        output.write(json.dumps(result) + '\n')
@@ -4,22 +4,33 @@ from qgis.core import QgsProject, QgsRectangle, QgsGeometry, QgsMessageLog, QgsC
 from qgis.gui import QgsMapCanvas, QgsMapToolPan
 from PyQt5.QtGui import QColor, QFont, QTextOption
 from math import cos, radians
-import zipfile
 import os
 import tempfile
 import shutil
-import json
 import random
+from . import import_archive as archive
+from . import import_qc_session as qc_session
+from . import import_change_detection as change_detection
+from . import import_feature_index as feature_index
+from . import import_review_queue as review_queue
+from . import import_canvas
 
 class VerificationDialog:
-    def __init__(self, selected_layer_name, selected_raster_layer_name, amrut_file_path, grid_extent):
+    def __init__(self, selected_layer_name, selected_raster_layer_name, amrut_file_path, grid_extent, qc_session=None):
         # Fetch the layer based on its name
         self.selected_layer_name = selected_layer_name
         self.selected_layer = self.get_layer_by_name(self.selected_layer_name)
         self.selected_raster_layer = self.get_layer_by_name(f"Temporary_{selected_raster_layer_name}")
         self.temporary_layer = self.get_layer_by_name(f"Temporary_{selected_layer_name}")
+        # Index feature_id on both layers, the review looks features up by it throughout
+        for layer in (self.selected_layer, self.temporary_layer):
+            if layer:
+                feature_index.feature_lookup(layer)
 
         self.amrut_file_path = amrut_file_path
+        # Decisions are recorded on the session of the import dialog and committed with the others,
+        # without one accept_data() writes the archive right away
+        self.qc_session = qc_session
         self.grid_extent = grid_extent
         self.new_features_checked = False
         self.deleted_features_checked = False
@@ -27,6 +38,24 @@ class VerificationDialog:
         self.removed_features = set()
         self.merged_ids = []
         self.resurvey = []
+        self.changes = None  # ChangeSet of the checks, see get_changes
+        self.highlighters = {}  # canvas -> FeatureHighlighter of the layer it shows
+
+    def get_changes(self):
+        """
+        Changes of the temporary layer against the selected layer, detected in one pass over each.
+
+        The result is shared by the three checks and detected again once the review edited the
+        temporary layer (see invalidate_changes).
+        """
+        if self.changes is None:
+            self.changes = change_detection.detect_changes(
+                self.selected_layer, self.temporary_layer, self.create_inward_buffer(self.grid_extent))
+            QgsMessageLog.logMessage(f"Detected changes: {self.changes.summary()}", "AMRUT", Qgis.Info)
+        return self.changes
+
+    def invalidate_changes(self):
+        self.changes = None
 
     def check_for_new_features(self):
         """
@@ -34,15 +63,7 @@ class VerificationDialog:
         If new features are found, prompt the user with a dialog.
         """
         if self.selected_layer and self.temporary_layer:
-            # Collect feature IDs from the selected layer into a set
-            selected_feature_ids = {f['feature_id'] for f in self.selected_layer.getFeatures()}
-            self.new_feature_ids = set()  # Initialize a set to store IDs of new features
-
-            for feature in self.temporary_layer.getFeatures():
-                temp_feature_id = feature['feature_id']  # Extract feature ID from the temporary layer
-                if temp_feature_id not in selected_feature_ids:  # Check if it's a new feature
-                    self.new_feature_ids.add(temp_feature_id)
-
+            self.new_feature_ids = set(self.get_changes().new)
             self.show_new_features_dialog(self.new_feature_ids, "New Features")
 
     def check_for_deleted_features(self):
@@ -50,58 +71,16 @@ class VerificationDialog:
         Check for features in the temporary layer that have the 'delete' attribute set to True.
         Only consider the attribute if it exists in the feature's fields.
         """
-        if self.temporary_layer:
-            deleted_feature_ids = set()
-
-            for feature in self.temporary_layer.getFeatures():
-                # Check if 'delete' attribute exists in the feature
-                if 'delete' in feature.fields().names():
-                    delete_value = feature.attribute('delete')
-                    if delete_value is True:
-                        feature_id = feature.attribute('feature_id')
-                        if feature_id is not None:
-                            deleted_feature_ids.add(feature_id)
-
+        if self.selected_layer and self.temporary_layer:
+            deleted_feature_ids = set(self.get_changes().deleted)
             self.show_new_features_dialog(deleted_feature_ids, "Deleted Features")
 
     def check_for_geom_changes(self):
-        grid_inward_buffer = self.create_inward_buffer(self.grid_extent)
         if self.selected_layer and self.temporary_layer:
-            changed_geometry_features = set()  # Set to store feature IDs with geometry changes
-            removed_features = set()  # Set to store feature IDs of removed features
-
-            # Iterate over all features in the selected layer
-            for selected_feature in self.selected_layer.getFeatures():
-                feature_id = selected_feature['feature_id']  # Get the feature ID
-
-                # Find the corresponding feature in the temporary layer with the same feature ID
-                temp_feature = next(self.temporary_layer.getFeatures(f"feature_id = {feature_id}"), None)
-                if temp_feature:
-                    # Compare the geometries of the features
-                    selected_geom = selected_feature.geometry()
-                    temp_geom = temp_feature.geometry()
-
-                    if selected_geom and temp_geom:
-                        geometry_type = QgsWkbTypes.geometryType(selected_feature.geometry().wkbType())  # Get the geometry type
-
-                        # Determine the buffer size based on the geometry type
-                        if geometry_type == QgsWkbTypes.PointGeometry:
-                            if selected_geom.distance(temp_geom) > 1:  # Check if distance > 1 meter
-                                changed_geometry_features.add(feature_id)
-                        elif not selected_geom.equals(temp_geom):  # For non-point geometries
-                            feature_extent = temp_geom.boundingBox()  # Get the bounding box of the feature
-                            if (grid_inward_buffer.xMinimum() <= feature_extent.xMinimum() and
-                                grid_inward_buffer.yMinimum() <= feature_extent.yMinimum() and
-                                grid_inward_buffer.xMaximum() >= feature_extent.xMaximum() and
-                                grid_inward_buffer.yMaximum() >= feature_extent.yMaximum()):
-                                # Add the feature ID to the set if the condition is satisfied
-                                changed_geometry_features.add(feature_id)
-                else:
-                    removed_features.add(feature_id)
-
+            changes = self.get_changes()
             # Store the changed geometry feature IDs for further processing
-            self.changed_geometry_features = changed_geometry_features
-            self.removed_features = removed_features
+            self.changed_geometry_features = set(changes.geometry_changed)
+            self.removed_features = set(changes.removed)
             self.show_new_features_dialog(self.changed_geometry_features, "Geometry Changes")
 
     def show_new_features_dialog(self, feature_ids, title):
@@ -211,35 +190,23 @@ class VerificationDialog:
         self.right_canvas = right_canvas_frame.findChild(QgsMapCanvas)  # Retrieve the right canvas
 
         # Synchronize the views of both canvases
-        self.is_synchronizing = False  # Flag to avoid recursive synchronization
-        self.left_canvas.extentsChanged.connect(self.synchronize_right_canvas)
-        self.right_canvas.extentsChanged.connect(self.synchronize_left_canvas)
+        self.canvas_link = import_canvas.LinkedCanvasController([self.left_canvas, self.right_canvas])
+        dialog.finished.connect(self.canvas_link.close)
         self.setup_panning()
 
         accept_button.clicked.connect(lambda: self.accept_feature(feature_ids))
         reject_button.clicked.connect(lambda: self.reject_feature(feature_ids))
         resurvey_button.clicked.connect(lambda: self.resurvey_feature(feature_ids))
 
+        # Order the features once and read them ahead of the reviewer on a worker thread
+        self.review_queue = review_queue.ReviewQueue(self.temporary_layer, feature_ids, self.feature_extent)
+        self.review_queue.start()
+        dialog.finished.connect(self.review_queue.close)
+
         # Update the canvases to focus on the first feature
         self.update_canvases(feature_ids)
         dialog.exec_()  # Display the dialog
 
-    def synchronize_right_canvas(self):
-        """Synchronize the right canvas with the left canvas."""
-        if not self.is_synchronizing:  # Prevent infinite loop 
-            self.is_synchronizing = True  # Mark synchronization in progress
-            self.right_canvas.setExtent(self.left_canvas.extent())  # Set the extent of the right canvas to match the left canvas
-            self.right_canvas.refresh()  # Refresh the right canvas to update its display
-            self.is_synchronizing = False  # Reset the synchronization flag
-
-    def synchronize_left_canvas(self):
-        """Synchronize the left canvas with the right canvas."""
-        if not self.is_synchronizing:  # Prevent infinite loop
-            self.is_synchronizing = True  # Mark synchronization in progress
-            self.left_canvas.setExtent(self.right_canvas.extent())  # Set the extent of the left canvas to match the right canvas
-            self.left_canvas.refresh()  # Refresh the left canvas to update its display
-            self.is_synchronizing = False  # Reset the synchronization flag
-
     def setup_panning(self):
         """Enable panning on both canvases."""
         try:
@@ -263,9 +230,10 @@ class VerificationDialog:
         frame_layout.addWidget(label)
 
         canvas = QgsMapCanvas()
+        import_canvas.configure_canvas(canvas)
         self.set_colour_opacity(self.temporary_layer, 0.6)
         self.set_colour_opacity(self.selected_layer, 0.6)
-        canvas.setLayers([layer, self.selected_raster_layer])
+        self.highlighters[canvas] = import_canvas.FeatureHighlighter(canvas, layer, [self.selected_raster_layer])
         canvas.setCanvasColor(QColor("white"))
         canvas.setMapTool(QgsMapToolPan(canvas))
 
@@ -297,14 +265,51 @@ class VerificationDialog:
         frame_layout.addWidget(canvas_container)
         return frame
 
+    def feature_extent(self, features):
+        """
+        Extent to zoom to for the features of a feature_id: their bounding box with a margin.
+        Runs on the review queue's prefetch thread, it only computes geometry.
+        """
+        # Compute a bounding box that includes all matching features
+        bbox = None
+        for feature in features:
+            geom = feature.geometry()
+            
+            if bbox is None:
+                bbox = geom.boundingBox()
+            else:
+                bbox.combineExtentWith(geom.boundingBox())
+
+        # Ensure valid bounding box (for single points, use a small default box)
+        if bbox is None or (bbox.width() == 0 and bbox.height() == 0):
+            centroid = features[0].geometry().centroid().asPoint()
+            buffer = self.calculate_dynamic_buffer(features[0].geometry())
+            extent = QgsRectangle(
+                centroid.x() - buffer,
+                centroid.y() - buffer,
+                centroid.x() + buffer,
+                centroid.y() + buffer
+            )
+        else:
+            # Apply a buffer for better visibility
+            buffer = self.calculate_dynamic_buffer(QgsGeometry.fromRect(bbox))
+            extent = QgsRectangle(
+                bbox.xMinimum() - buffer,
+                bbox.yMinimum() - buffer,
+                bbox.xMaximum() + buffer,
+                bbox.yMaximum() + buffer
+            )
+        return extent
+
     def update_canvases(self, feature_ids):
         """
         Update canvases to focus on all features with the same feature_id.
         Zooms both canvases to the bounding box of all features being verified.
         """
         if self.current_feature_index < len(feature_ids):  # Check if there are remaining features
-            feature_id = int(list(feature_ids)[self.current_feature_index])  # Get the current feature ID
-            features = [f for f in self.temporary_layer.getFeatures(f"feature_id = {feature_id}")]  # Fetch all features with the same feature_id
+            item = self.review_queue.item(self.current_feature_index)  # Usually prefetched already
+            feature_id = int(item.feature_id)  # Get the current feature ID
+            features = item.features  # All features with the same feature_id
 
             if features:
                 if self.new_features_checked and len(features) == 1:
@@ -314,7 +319,7 @@ class VerificationDialog:
 
                     # Get original feature IDs from removed_features that were merged
                     for old_id in self.removed_features:
-                        old_feature = next(self.selected_layer.getFeatures(f"feature_id = {old_id}"), None)
+                        old_feature = next(self.selected_layer.getFeatures(feature_index.feature_lookup(self.selected_layer).request(old_id)), None)
                         
                         if old_feature:
                             old_geom = old_feature.geometry()
@@ -331,42 +336,16 @@ class VerificationDialog:
                         self.merged_ids = merged_ids
                         self.is_feature_merged = True
 
-                # Compute a bounding box that includes all matching features
-                bbox = None
-                for feature in features:
-                    geom = feature.geometry()
-                    
-                    if bbox is None:
-                        bbox = geom.boundingBox()
+                # The extent around all matching features was computed with the queue
+                extent = item.extent
+
+                # Zoom both canvases to the combined bounding box, the link would only redraw them again
+                with self.canvas_link.paused():
+                    if self.is_feature_merged:
+                        self.zoom_to_merged_features_on_canvas(extent, self.left_canvas, self.selected_layer, feature_id)
                     else:
-                        bbox.combineExtentWith(geom.boundingBox())
-
-                # Ensure valid bounding box (for single points, use a small default box)
-                if bbox is None or (bbox.width() == 0 and bbox.height() == 0):
-                    centroid = features[0].geometry().centroid().asPoint()
-                    buffer = self.calculate_dynamic_buffer(features[0].geometry())
-                    extent = QgsRectangle(
-                        centroid.x() - buffer,
-                        centroid.y() - buffer,
-                        centroid.x() + buffer,
-                        centroid.y() + buffer
-                    )
-                else:
-                    # Apply a buffer for better visibility
-                    buffer = self.calculate_dynamic_buffer(QgsGeometry.fromRect(bbox))
-                    extent = QgsRectangle(
-                        bbox.xMinimum() - buffer,
-                        bbox.yMinimum() - buffer,
-                        bbox.xMaximum() + buffer,
-                        bbox.yMaximum() + buffer
-                    )
-
-                # Zoom both canvases to the combined bounding box
-                if self.is_feature_merged:
-                    self.zoom_to_merged_features_on_canvas(extent, self.left_canvas, self.selected_layer, feature_id)
-                else:
-                    self.zoom_to_feature_on_canvas(extent, self.left_canvas, self.selected_layer, feature_id)
-                self.zoom_to_feature_on_canvas(extent, self.right_canvas, self.temporary_layer, feature_id)
+                        self.zoom_to_feature_on_canvas(extent, self.left_canvas, self.selected_layer, feature_id)
+                    self.zoom_to_feature_on_canvas(extent, self.right_canvas, self.temporary_layer, feature_id)
 
     def zoom_to_merged_features_on_canvas(self, extent, canvas, layer, feature_id):
         """Zoom to the bounding box of all features with the same feature_id."""
@@ -374,23 +353,21 @@ class VerificationDialog:
             # Combine feature_id with merged_ids
             all_feature_ids = set(self.merged_ids)  # Convert to set to avoid duplicates
             all_feature_ids.add(feature_id)    # Ensure the original feature_id is included
-
-            # Convert to SQL-friendly format
-            feature_ids_str = ", ".join(map(str, all_feature_ids))
-            layer.setSubsetString(f"feature_id IN ({feature_ids_str})")  # Filter layer to show all matching features
+            self.highlighters[canvas].show_feature_ids(all_feature_ids)  # Show all matching features
         canvas.setExtent(extent)
         canvas.refresh()
 
     def zoom_to_feature_on_canvas(self, extent, canvas, layer, feature_id):
         """Zoom to the bounding box of all features with the same feature_id."""
         if layer:
-            layer.setSubsetString(f"feature_id = {feature_id}")  # Filter layer to show all matching features
+            self.highlighters[canvas].show_feature_ids([feature_id])  # Show all matching features
         canvas.setExtent(extent)
         canvas.refresh()
 
     def accept_feature(self, feature_ids):
-        feature_id = int(list(feature_ids)[self.current_feature_index])  # Get the current feature ID
-        features = [f for f in self.temporary_layer.getFeatures(f"feature_id = {feature_id}")]  # Fetch all matching features
+        self.invalidate_changes()  # The review edits the temporary layer
+        feature_id = int(self.review_queue.feature_id(self.current_feature_index))  # Get the current feature ID
+        features = [f for f in self.temporary_layer.getFeatures(feature_index.feature_lookup(self.temporary_layer).request(feature_id))]  # Fetch all matching features
 
         if len(features) > 1:
             self.temporary_layer.startEditing()  # Start editing the layer
@@ -408,7 +385,7 @@ class VerificationDialog:
         # Delete the feature if condition is met
         if self.new_features_checked and not self.deleted_features_checked:
             self.temporary_layer.startEditing()
-            ids_to_delete = [f.id() for f in self.temporary_layer.getFeatures(f"feature_id = {feature_id}")]
+            ids_to_delete = [f.id() for f in self.temporary_layer.getFeatures(feature_index.feature_lookup(self.temporary_layer).request(feature_id))]
             self.temporary_layer.deleteFeatures(ids_to_delete)
             self.temporary_layer.commitChanges()
 
@@ -419,8 +396,9 @@ class VerificationDialog:
         Handle rejecting the current feature.
         Deletes the feature from the temporary layer(layer from .amrut file) and moves to the next feature.
         """
-        feature_id = int(list(feature_ids)[self.current_feature_index])  # Get the current feature ID
-        features = [f for f in self.temporary_layer.getFeatures(f"feature_id = {feature_id}")]  # Fetch all matching features
+        self.invalidate_changes()  # The review edits the temporary layer
+        feature_id = int(self.review_queue.feature_id(self.current_feature_index))  # Get the current feature ID
+        features = [f for f in self.temporary_layer.getFeatures(feature_index.feature_lookup(self.temporary_layer).request(feature_id))]  # Fetch all matching features
         if features:
             self.temporary_layer.startEditing()  # Start editing the temporary layer
             
@@ -433,7 +411,7 @@ class VerificationDialog:
                     feature_ids_to_restore = {feature_id} | set(self.merged_ids)  # Combine into a set to avoid duplicates
 
                     for fid in feature_ids_to_restore:
-                        selected_feature = next(self.selected_layer.getFeatures(f"feature_id = {fid}"), None)
+                        selected_feature = next(self.selected_layer.getFeatures(feature_index.feature_lookup(self.selected_layer).request(fid)), None)
                         if selected_feature:
                             # Get the attributes and geometry
                             selected_geometry = selected_feature.geometry()
@@ -472,7 +450,7 @@ class VerificationDialog:
                             self.temporary_layer.addFeature(temp_feature)
                 else:
                     # Copy the feature from selected layer having the same feature_id to temporary layer
-                    selected_feature = next(self.selected_layer.getFeatures(f"feature_id = {feature_id}"), None)
+                    selected_feature = next(self.selected_layer.getFeatures(feature_index.feature_lookup(self.selected_layer).request(feature_id)), None)
                     if selected_feature:
                         # Get the attributes from the selected feature and create a new feature for the temporary layer
                         selected_geometry = selected_feature.geometry()
@@ -515,8 +493,9 @@ class VerificationDialog:
         self.move_to_next_feature(feature_ids)  # Move to the next feature in the list
 
     def resurvey_feature(self, feature_ids):
-        feature_id = int(list(feature_ids)[self.current_feature_index])  # Get the current feature ID
-        features = [f for f in self.temporary_layer.getFeatures(f"feature_id = {feature_id}")]  # Fetch all matching features
+        self.invalidate_changes()  # The review edits the temporary layer
+        feature_id = int(self.review_queue.feature_id(self.current_feature_index))  # Get the current feature ID
+        features = [f for f in self.temporary_layer.getFeatures(feature_index.feature_lookup(self.temporary_layer).request(feature_id))]  # Fetch all matching features
         
         if features:
             feature = features[0]
@@ -599,12 +578,11 @@ class VerificationDialog:
         """
         self.is_feature_merged = False
         self.merged_ids = []
-        self.selected_layer.setSubsetString("")  # Reset the filter to show all features
-        self.temporary_layer.setSubsetString("")
         self.current_feature_index += 1  # Increment the feature index
         if self.current_feature_index < len(feature_ids):  # Check if there are more features
             self.update_canvases(feature_ids)  # Update canvases to display the next feature
         else:
+            self.review_queue.close()
             self.dialog.close()  # Close the verification dialog
             if(self.new_features_checked == False) :
                 self.new_features_checked = True
@@ -689,7 +667,7 @@ class VerificationDialog:
         dialog.exec_()  # Display the dialog
 
     def accept_data(self):
-        """Replace old GeoJSON file in .amrut file with new GeoJSON file and update metadata.json."""
+        """Record the new GeoJSON file and metadata of the layer on the QC session, which replaces them in the .amrut file."""
         has_resurvey_data = bool(getattr(self, "resurvey", []))
         temp_dir = None
         try:
@@ -697,54 +675,50 @@ class VerificationDialog:
             geojson_name_without_ext = os.path.splitext(geojson_filename)[0]
 
 
-            # Create a temporary directory for extraction
-            temp_dir = tempfile.mkdtemp()
+            # Metadata with the decisions on the other layers of this session applied
+            session = self.qc_session or qc_session.QCSession(self.amrut_file_path)
+            amrut_archive = archive.get_archive(session.archive_path)
+            metadata = session.metadata()
+
+            # Check for 'layers' array in metadata
+            if 'layers' not in metadata or not isinstance(metadata['layers'], list):
+                QMessageBox.warning(self, "Invalid Metadata", "'layers' array is missing or invalid in metadata.json.")
+                self.file_input.clear()
+                return
+
+            # Extract layer names from the 'layers' array
+            layer_names = [
+                layer.split(" : ")[0].strip("{}").strip()
+                for layer in metadata['layers']
+            ]
+
+            # Ensure 'layers_qc_completed' exists in metadata
+            if "layers_qc_completed" not in metadata:
+                metadata["layers_qc_completed"] = []
 
+            # Append the current GeoJSON name to 'layers_qc_completed' if not already present
+            if geojson_name_without_ext not in metadata["layers_qc_completed"]:
+                metadata["layers_qc_completed"].append(geojson_name_without_ext)
 
-            # Extract the contents of the .amrut file to the temporary directory
-            with zipfile.ZipFile(self.amrut_file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-                # Read metadata.json from the archive
-                metadata = json.loads(zip_ref.read('metadata.json'))
-
-                # Check for 'layers' array in metadata
-                if 'layers' not in metadata or not isinstance(metadata['layers'], list):
-                    QMessageBox.warning(self, "Invalid Metadata", "'layers' array is missing or invalid in metadata.json.")
-                    self.file_input.clear()
-                    return
-
-                # Extract layer names from the 'layers' array
-                layer_names = [
-                    layer.split(" : ")[0].strip("{}").strip()
-                    for layer in metadata['layers']
-                ]
-
-                # Ensure 'layers_qc_completed' exists in metadata
-                if "layers_qc_completed" not in metadata:
-                    metadata["layers_qc_completed"] = []
-
-                # Append the current GeoJSON name to 'layers_qc_completed' if not already present
-                if geojson_name_without_ext not in metadata["layers_qc_completed"]:
-                    metadata["layers_qc_completed"].append(geojson_name_without_ext)
-
-                qc_status = None
-                
-                # Check if all layers are in 'layers_qc_completed'
-                all_verified = all(layer in metadata["layers_qc_completed"] for layer in layer_names)
-                # Update the qc_status field
-                if all_verified:
-                    qc_status = "verified"
+            qc_status = None
+            
+            # Check if all layers are in 'layers_qc_completed'
+            all_verified = all(layer in metadata["layers_qc_completed"] for layer in layer_names)
+            # Update the qc_status field
+            if all_verified:
+                qc_status = "verified"
 
             # Check if the GeoJSON file exists in the archive
-            geojson_file_path = os.path.join(temp_dir, geojson_filename)
-            if not os.path.exists(geojson_file_path):
+            if not amrut_archive.has_member(geojson_filename):
                 raise FileNotFoundError(f"GeoJSON file '{geojson_filename}' not found in the AMRUT file.")
 
             # Validate the temporary layer
             if not self.temporary_layer or not self.temporary_layer.isValid():
                 raise ValueError("Temporary layer is invalid.")
 
-            # Export the temporary layer to the GeoJSON format
+            # Export the temporary layer to the GeoJSON format, only this file is written to disk
+            temp_dir = tempfile.mkdtemp()
+            geojson_file_path = os.path.join(temp_dir, geojson_filename)
             options = QgsVectorFileWriter.SaveVectorOptions()
             options.driverName = "GeoJSON"
             options.forceMulti = True  # Ensures consistent geometry type
@@ -757,55 +731,32 @@ class VerificationDialog:
             if error[0] != QgsVectorFileWriter.NoError:
                 raise ValueError(f"Failed to write the temporary layer to GeoJSON format: {error}")
 
-            # Write the updated metadata.json back to the temporary directory
-            metadata_path = os.path.join(temp_dir, "metadata.json")
-            with open(metadata_path, "w") as metadata_file:
-                if has_resurvey_data:
-                    # Check if 'resurvey' key exists and is a list
-                    if "resurvey" in metadata and isinstance(metadata["resurvey"], list):
-                        metadata["resurvey"].extend(self.resurvey)
-                    else:
-                        metadata["resurvey"] = list(self.resurvey)
-
-                else: 
-                    if qc_status != None:
-                        metadata["qc_status"] = qc_status  # Update QC status
-
-                if "resurvey" in metadata and len(metadata["resurvey"]) > 0 and set(metadata['layers_qc_completed']) == set(layer_names):
-                    print(f"Layers : {layer_names}")
-                    print(f"QC_Completed : {metadata['layers_qc_completed']}")
-                    metadata.pop("qc_status", None)
-                    metadata.pop("layers_qc_completed", None)
-                
-                json.dump(metadata, metadata_file, indent=4)
-
-            # Create a new .amrut file with the updated GeoJSON and metadata
-            temp_amrut_path = self.amrut_file_path + ".tmp"
-            with zipfile.ZipFile(temp_amrut_path, 'w') as zip_ref:
-                for root, _, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        zip_ref.write(file_path, arcname)
-
-            # Rename output if resurvey data is present
-            if "resurvey" in metadata and len(metadata["resurvey"]) > 0 and "layers_qc_completed" not in metadata and "qc_status" not in metadata:
-                directory = os.path.dirname(self.amrut_file_path)
-                original_filename = os.path.basename(self.amrut_file_path)
-                new_filename = f"resurvey_required_{original_filename}"
-                new_amrut_path = os.path.join(directory, new_filename)
-
-                # Rename the original file
-                os.rename(self.amrut_file_path, new_amrut_path)
-
-                # Replace the renamed file with updated content
-                os.replace(temp_amrut_path, new_amrut_path)
-            else:
-                # Replace original file with updated one
-                os.replace(temp_amrut_path, self.amrut_file_path)
+            # Update the metadata
+            if has_resurvey_data:
+                # Check if 'resurvey' key exists and is a list
+                if "resurvey" in metadata and isinstance(metadata["resurvey"], list):
+                    metadata["resurvey"].extend(self.resurvey)
+                else:
+                    metadata["resurvey"] = list(self.resurvey)
+
+            else: 
+                if qc_status != None:
+                    metadata["qc_status"] = qc_status  # Update QC status
+
+            if "resurvey" in metadata and len(metadata["resurvey"]) > 0 and set(metadata['layers_qc_completed']) == set(layer_names):
+                print(f"Layers : {layer_names}")
+                print(f"QC_Completed : {metadata['layers_qc_completed']}")
+                metadata.pop("qc_status", None)
+                metadata.pop("layers_qc_completed", None)
+
+            # The GeoJSON moves into the session journal, the archive is rewritten once for all
+            # the layers of the file. The resurvey rename happens with that rewrite.
+            session.record_layer(geojson_filename, geojson_file_path, metadata)
+            if self.qc_session is None:
+                session.commit()
 
             QgsMessageLog.logMessage(
-                f"GeoJSON file '{geojson_filename}' successfully replaced in the AMRUT file. QC Status: {qc_status}",
+                f"GeoJSON file '{geojson_filename}' recorded for the AMRUT file. QC Status: {qc_status}",
                 "AMRUT",
                 Qgis.Info
             )  